@@ -1,15 +1,30 @@
 import time
 import datetime
 import csv
-import json
 import os
+import sqlite3
 from decimal import Decimal
 from time import sleep
-from requests import get, RequestException
-
-# 禁用代理，避免代理连接问题（清空所有可能的代理环境变量）
-for key in ['http_proxy', 'https_proxy', 'HTTP_PROXY', 'HTTPS_PROXY', 'all_proxy', 'ALL_PROXY']:
-    os.environ.pop(key, None)  # 彻底删除而不是设置为空字符串
+from sina_quote import (fetch_quotes, fetch_quote_legs, http_get, build_remainder_day_url, OptionQuote, RequestError,
+                        TICK_DEADLINE)
+from option_cache import ExpiryCache, OptionChain, OptionChainCache, StrikeLadder, parse_expire_date
+from scheduler import TradingScheduler
+from csv_index import MasterCsvIndex
+from sqlite_store import TradeStore
+from tick_writer import TickWriter
+from month_manifest import MonthManifest, get_manifest_filename
+from state_journal import StateJournal
+from async_logger import AsyncFileLogger
+from tick_metrics import TickMetrics
+from trading_calendar import TradingCalendar, load_calendar
+from option_expiry import expire_day_for_month
+import trading_calendar
+import option_math
+
+# 导入本模块不做任何网络、文件或线程操作：日志器、调度器、CSV索引等都在首次使用时按当时的设置创建，
+# 工具脚本可以直接 import 其中的函数（validate_state、get_next_month、CSV相关函数等）；
+# 代理设置由 sina_quote 的共享Session忽略（trust_env=False），不修改进程的环境变量
+# 运行入口为 main()（单标的）和 multi_underlying.main()（多标的）
 
 # 设置CSV总表的开始日期，格式为YYYYMMDD
 # 这个变量控制CSV总表文件的命名，格式为"option_trading_YYYYMMDD.csv"
@@ -19,42 +34,87 @@ for key in ['http_proxy', 'https_proxy', 'HTTP_PROXY', 'HTTPS_PROXY', 'all_proxy
 # 3. 如果日期变更时程序已经在运行，需要重启程序才能生效
 CSV_START_DATE = "20250530"  # 例如：2025年5月30日
 
+# 数据存储后端：
+# - "csv"：每个采样时刻直接追加总表和月度分表CSV，状态单独保存为JSON文件（默认）
+# - "sqlite"：交易数据和状态在同一个事务中写入 option_trading_<CSV_START_DATE>.db（WAL模式），
+#   总表和月度分表CSV通过 sqlite_store.py 按需导出
+STORAGE_BACKEND = "csv"
+
+# CSV写入的刷新策略（仅 STORAGE_BACKEND = "csv" 时使用）：
+# 总表和月度分表在运行期间保持打开，累计 CSV_FLUSH_ROWS 行或距上次写入超过 CSV_FLUSH_SECONDS 秒时写入文件
+# CSV_FLUSH_ROWS = 1 表示每行立即写入；CSV_FLUSH_SECONDS = None 表示不按时间写入
+# 主循环休眠前若休眠期间会超过 CSV_FLUSH_SECONDS，或休眠到午后/次日开盘，先写入缓存的数据行
+CSV_FLUSH_ROWS = 1
+CSV_FLUSH_SECONDS = None
+
+# 日志设置：日志由后台线程写入 option_trading_YYYYMM.log，不占用采样时刻的时间
+# LOG_LEVEL：最低记录级别（DEBUG, INFO, WARNING, ERROR），低于该级别的日志直接丢弃
+# LOG_MAX_BYTES：单个日志文件的最大字节数，超过时轮转为带日期后缀的文件，None表示不按大小轮转
+# LOG_ROTATE_DAILY：是否每天轮转一次；LOG_COMPRESS_ROTATED：是否gzip压缩轮转出的文件
+LOG_LEVEL = "INFO"
+LOG_MAX_BYTES = 20 * 1024 * 1024
+LOG_ROTATE_DAILY = False
+LOG_COMPRESS_ROTATED = False
+
+# 耗时统计：METRICS_ENABLED 为 True 时按阶段统计耗时（采样时刻的各个步骤、各个行情请求、重试等待、日志），
+# 每隔 METRICS_INTERVAL 秒把 p50/p95/p99、次数和按异常类型的错误次数写入
+# <FILE_PREFIX>_metrics.prom（Prometheus文本格式）和 <FILE_PREFIX>_metrics.json；关闭时几乎没有额外开销
+METRICS_ENABLED = False
+METRICS_INTERVAL = 60
+
+# 到期日：按"到期月份第四个星期三，遇休市顺延"的规则在本地计算（休市安排见 HOLIDAY_FILE），
+# 接口可用时与接口返回的到期日相互校验（不一致时以接口为准并提示）；接口不可用且没有缓存时使用本地结果。
+# EXPIRY_OFFLINE 为 True 时不请求到期日接口，全部使用本地计算（离线恢复历史数据、回测）
+EXPIRY_OFFLINE = False
+
+# 标的设置：UNDERLYING 为本进程运行的标的（UNDERLYING_PROFILES 中的名称）
+# - code：标的代码，用于查询期权合约列表（OP_UP_/OP_DOWN_）
+# - etf_symbol：ETF行情代码
+# - cate：到期日接口（getRemainderDay）的品种
+# - file_prefix：数据文件名前缀，总表、月度分表、状态和日志文件均以此开头
+# - etf_price_range：ETF价格的有效范围（元），超出范围的行情视为异常
+# 在一个进程中同时运行多个标的时使用 multi_underlying.py
+UNDERLYING_PROFILES = {
+    "50ETF": {"code": "510050", "etf_symbol": "s_sh510050", "cate": "50ETF",
+              "file_prefix": "option_trading", "etf_price_range": (1, 5)},
+    "300ETF": {"code": "510300", "etf_symbol": "s_sh510300", "cate": "300ETF",
+               "file_prefix": "option_trading_300ETF", "etf_price_range": (2, 10)},
+    "500ETF": {"code": "510500", "etf_symbol": "s_sh510500", "cate": "500ETF",
+               "file_prefix": "option_trading_500ETF", "etf_price_range": (3, 15)},
+    # 上交所ETF期权到期日相同（到期月份第四个星期三），科创50按50ETF品种查询到期日
+    "Kechuang": {"code": "588000", "etf_symbol": "s_sh588000", "cate": "50ETF",
+                 "file_prefix": "option_trading_Kechuang", "etf_price_range": (0.3, 3)},
+}
+UNDERLYING = "50ETF"
+
+def select_underlying(name):
+    """选择运行的标的，设置标的代码、ETF行情代码、到期日品种和数据文件名前缀
+    Args:
+        name: UNDERLYING_PROFILES 中的标的名称
+    """
+    global UNDERLYING, UNDERLYING_CODE, ETF_SYMBOL, EXPIRY_CATE, FILE_PREFIX, ETF_PRICE_RANGE
+    profile = UNDERLYING_PROFILES[name]
+    UNDERLYING = name
+    UNDERLYING_CODE = profile["code"]
+    ETF_SYMBOL = profile["etf_symbol"]
+    EXPIRY_CATE = profile["cate"]
+    FILE_PREFIX = profile["file_prefix"]
+    ETF_PRICE_RANGE = profile["etf_price_range"]
+
+select_underlying(UNDERLYING)
+
 # Trading Hours (Morning + Afternoon)
 TRADING_HOURS = [
     (9, 40, 11, 30),  # 9:40 - 11:30
     (13, 10, 15, 00)  # 13:10 - 15:00
 ]
 
-Holiday = [
-    "2025-01-01",
-    "2025-01-28",
-    "2025-01-29",
-    "2025-01-30",
-    "2025-01-31",
-    "2025-02-01",
-    "2025-02-02",
-    "2025-02-03",
-    "2025-02-04",
-    "2025-04-04",
-    "2025-04-05",
-    "2025-04-06",
-    "2025-05-01",
-    "2025-05-02",
-    "2025-05-03",
-    "2025-05-04",
-    "2025-05-05",
-    "2025-05-31",
-    "2025-06-01",
-    "2025-06-02",
-    "2025-10-01",
-    "2025-10-02",
-    "2025-10-03",
-    "2025-10-04",
-    "2025-10-05",
-    "2025-10-06",
-    "2025-10-07",
-    "2025-10-08"        
-]
+# 交易时段内的采样间隔（秒），唤醒时刻按该间隔对齐
+SAMPLING_INTERVAL = 60
+
+# 休市安排（多个年份的节假日，以及仅供参考的调休上班日）的数据文件，由 trading_calendar.py 加载；
+# 交易所每年公布次年休市安排后在该文件中追加
+HOLIDAY_FILE = trading_calendar.HOLIDAY_FILE
 
 # Strategy Parameters
 MONTHLY_INVESTMENT = 1000  # Monthly Investment Amount
@@ -71,26 +131,44 @@ DAYS_BEFORE_EXPIRY_STOP = 1    # Stop recording 1 day before expiry
 CALL_OTM_LEVEL = 2      # Call期权虚值档数，默认虚2档
 PUT_OTM_LEVEL = 2       # Put期权虚值档数，默认虚2档
 
-# Sina API headers
-headers = {"Referer":"http://finance.sina.com.cn/",
-           "Connection":"close"}
-
 # Debug Mode: 0=Production, 1=Debug
 Debug_mode = 0
 
-def log_to_file(message, level="INFO"):
-    """Write log message to file
+_logger = None
+
+def get_logger():
+    """获取日志器（首次使用时按当时的日志设置创建）"""
+    global _logger
+    if (_logger is None):
+        _logger = AsyncFileLogger(lambda moment: f"{FILE_PREFIX}_{moment.strftime('%Y%m')}.log",
+                                  level=LOG_LEVEL, max_bytes=LOG_MAX_BYTES, rotate_daily=LOG_ROTATE_DAILY,
+                                  compress_rotated=LOG_COMPRESS_ROTATED)
+    return _logger
+
+# 耗时统计，在 initialize_strategy 中按 METRICS_ENABLED 启用
+_metrics = TickMetrics()
+
+def write_metrics(force=False):
+    """距上次写入超过 METRICS_INTERVAL 秒时写出耗时统计快照（未启用时不做任何事）
     Args:
-        message: Log message
-        level: Log level (INFO, WARNING, ERROR)
+        force: 是否立即写入
     """
     try:
-        current_month = datetime.datetime.now().strftime("%Y%m")
-        log_file = f"option_trading_{current_month}.log"
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(f"[{timestamp}] {level}: {message}\n")
-            f.flush()
+        _metrics.maybe_write(force)
+    except OSError as e:
+        print(f"写入耗时统计失败: {str(e)}", flush=True)
+        log_to_file(f"写入耗时统计失败: {str(e)}", "ERROR")
+
+@_metrics.timed("log")
+def log_to_file(message, level="INFO", *args):
+    """Write log message to file (queued and written by a background thread)
+    Args:
+        message: Log message, formatted as message % args when args are given
+        level: Log level (DEBUG, INFO, WARNING, ERROR)
+        args: Arguments formatted lazily, only if the level is enabled
+    """
+    try:
+        get_logger().log(message, level, *args)
     except Exception as e:
         print(f"Failed to write log: {str(e)}")
 
@@ -101,7 +179,7 @@ def get_previous_month_final_return():
     """
     try:
         csv_filename = get_csv_filename()
-        if not os.path.exists(csv_filename):
+        if (STORAGE_BACKEND == "csv" and not os.path.exists(csv_filename)):
             return 0
             
         current_month = datetime.datetime.now().strftime("%Y%m")
@@ -116,13 +194,11 @@ def get_previous_month_final_return():
         else:
             previous_month = f"{current_year}{current_month_num - 1:02d}"
         
-        # 读取CSV文件，找到上个月的最后一条记录
+        # 通过总表索引（或SQLite存储）直接读取上个月的最后一条记录
         last_previous_month_return = 0
-        with open(csv_filename, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['Month'] == previous_month:
-                    last_previous_month_return = int(float(row['Total Return']))
+        last_row = get_master_index().last_of_month(previous_month)
+        if last_row is not None:
+            last_previous_month_return = int(float(last_row['Total Return']))
         
         log_to_file(f"从CSV读取上月({previous_month})最终Total Return: {last_previous_month_return}")
         return last_previous_month_return
@@ -224,9 +300,9 @@ def cleanup_old_log_files():
         
         for file in os.listdir(current_dir):
             try:
-                if file.startswith('option_trading_') and file.endswith('.log'):
+                if file.startswith(f'{FILE_PREFIX}_') and file.endswith('.log'):
                     # Fix date extraction logic
-                    date_str = file.replace('option_trading_', '').replace('.log', '')
+                    date_str = file.replace(f'{FILE_PREFIX}_', '').replace('.log', '')
                     if len(date_str) == 6 and date_str.isdigit():  # Ensure date format is YYYYMM and contains only digits
                         file_month = datetime.datetime.strptime(date_str, '%Y%m')
                         months_diff = (current_date.year - file_month.year) * 12 + current_date.month - file_month.month
@@ -261,9 +337,9 @@ def cleanup_old_state_files():
         
         for file in os.listdir(current_dir):
             try:
-                if file.startswith('option_trading_state_') and file.endswith('.json'):
+                if file.startswith(f'{FILE_PREFIX}_state_') and file.endswith('.json'):
                     # Fix date extraction logic
-                    date_str = file.replace('option_trading_state_', '').replace('.json', '')
+                    date_str = file.replace(f'{FILE_PREFIX}_state_', '').replace('.json', '')
                     if len(date_str) == 6 and date_str.isdigit():  # Ensure date format is YYYYMM and contains only digits
                         file_month = datetime.datetime.strptime(date_str, '%Y%m')
                         months_diff = (current_date.year - file_month.year) * 12 + current_date.month - file_month.month
@@ -287,25 +363,49 @@ def cleanup_old_state_files():
             import traceback
             print(traceback.format_exc())
 
-def get_option_expire_day(date, cate='50ETF', exchange='null'):
+@_metrics.timed("fetch_expire_day")
+def fetch_option_expire_day(date, cate='50ETF', exchange='null'):
+    """从新浪接口获取期权到期日（网络请求，一般应通过get_option_expire_day使用缓存）"""
     try:
-        url = "http://stock.finance.sina.com.cn/futures/api/openapi.php/StockOptionService.getRemainderDay?" \
-              "exchange={exchange}&cate={cate}&date={year}-{month}"
-        url2 = url.format(year=date[:4], month=date[4:], cate=cate, exchange=exchange)
-        response = get(url2, timeout=10, proxies={'http': None, 'https': None})
+        response = http_get(build_remainder_day_url(date, cate, exchange))
         response.raise_for_status()  # Check response status
         data = response.json()['result']['data']
         if int(data['remainderDays']) < 0:
-            url2 = url.format(year=date[:4], month=date[4:], cate='XD' + cate, exchange=exchange)
-            response = get(url2, timeout=10, proxies={'http': None, 'https': None})
+            response = http_get(build_remainder_day_url(date, 'XD' + cate, exchange))
             response.raise_for_status()
             data = response.json()['result']['data']
         return data['expireDay'], int(data['remainderDays'])
-    except (RequestException, KeyError, ValueError) as e:
+    except (RequestError, KeyError, ValueError) as e:
+        _metrics.record_error("fetch_expire_day", e)
         print(f"Failed to get option expiry date: {str(e)}")
         time.sleep(5)  # Wait 5 seconds before retrying
         return None, None
 
+def local_option_expire_day(month):
+    """按到期规则和交易日历在本地计算到期日
+    Args:
+        month: 月份，格式YYYYMM
+    Returns:
+        str: 到期日 "YYYY-MM-DD"
+    """
+    return expire_day_for_month(month, get_trading_calendar())
+
+# 进程内共享的到期日缓存，按 (月份, 品种, 交易所) 缓存并持久化到磁盘，用本地计算结果校验和兜底
+_expiry_cache = ExpiryCache(fetch_option_expire_day, local_fn=local_option_expire_day)
+
+@_metrics.timed("expire_day")
+def get_option_expire_day(date, cate=None, exchange='null', as_of=None):
+    """获取期权到期日和剩余天数（优先使用缓存）
+    Args:
+        date: 月份，格式YYYYMM
+        cate: 品种，默认为当前标的的到期日品种
+        exchange: 交易所
+        as_of: 计算剩余天数的截至日期，默认今天
+    Returns:
+        tuple: (expire_day, remainder_days)，失败返回 (None, None)
+    """
+    return _expiry_cache.get(date, cate or EXPIRY_CATE, exchange, as_of, offline=EXPIRY_OFFLINE)
+
 # Calculate FIRST_RECORD_MONTH based on CSV_START_DATE and option expiry date
 def calculate_first_record_month():
     """根据CSV_START_DATE和期权到期日计算实际开始记录的月份"""
@@ -317,7 +417,8 @@ def calculate_first_record_month():
         try:
             expire_day, remainder_days = get_option_expire_day(start_month)
             if expire_day:
-                expire_date = datetime.datetime.strptime(f"{start_month[:4]}-{start_month[4:]}-{expire_day:02d}", "%Y-%m-%d").date()
+                # 接口返回 "YYYY-MM-DD"（旧格式为当月日期数字）
+                expire_date = parse_expire_date(start_month, expire_day)
                 
                 # 如果开始日期在当月期权到期日之后，则实际记录月份应该是下个月
                 if start_date > expire_date:
@@ -337,21 +438,19 @@ def calculate_first_record_month():
         # 如果出错，回退到简单截取
         return CSV_START_DATE[:6]
 
-# Update FIRST_RECORD_MONTH with calculated value
-FIRST_RECORD_MONTH = calculate_first_record_month()
+# 实际开始记录的月份，在 initialize_strategy 中按所选标的计算
+FIRST_RECORD_MONTH = None
 
+@_metrics.timed("fetch_option_codes")
 def get_option_codes(date, underlying):
     try:
-        url_up = ''.join(["http://hq.sinajs.cn/list=OP_UP_", underlying, str(date)[-4:]])
-        url_down = ''.join(["http://hq.sinajs.cn/list=OP_DOWN_", underlying, str(date)[-4:]])
-        response_up = get(url_up, headers=headers, timeout=10, proxies={'http': None, 'https': None})
-        response_down = get(url_down, headers=headers, timeout=10, proxies={'http': None, 'https': None})
-        response_up.raise_for_status()
-        response_down.raise_for_status()
-        
-        data_up = str(response_up.content).replace('"', ',').split(',')
+        symbol_up = ''.join(["OP_UP_", underlying, str(date)[-4:]])
+        symbol_down = ''.join(["OP_DOWN_", underlying, str(date)[-4:]])
+        # 看涨和看跌合约列表在同一次请求中获取
+        quotes = fetch_quotes([symbol_up, symbol_down])
+        data_up = quotes.get(symbol_up, [])
+        data_down = quotes.get(symbol_down, [])
         codes_up = [i[7:] for i in data_up if i.startswith('CON_OP_')]
-        data_down = str(response_down.content).replace('"', ',').split(',')
         codes_down = [i[7:] for i in data_down if i.startswith('CON_OP_')]
         
         if 1 == Debug_mode:
@@ -366,66 +465,94 @@ def get_option_codes(date, underlying):
             print(data_down)
             print("*************************")
         return codes_up, codes_down
-    except (RequestException, ValueError) as e:
+    except (RequestError, ValueError, UnicodeDecodeError) as e:
+        _metrics.record_error("fetch_option_codes", e)
         print(f"Failed to get option codes: {str(e)}")
         time.sleep(5)
         return [], []
 
-def get_option_price(code):
+@_metrics.timed("fetch_option_quotes")
+def get_option_quotes(codes):
+    """一次请求获取多个期权合约的行情
+    Args:
+        codes: 期权代码列表
+    Returns:
+        dict: {期权代码: OptionQuote}，获取失败返回空字典
+    """
     try:
-        url = "http://hq.sinajs.cn/list=CON_OP_{code}".format(code=code)
-        response = get(url, headers=headers, timeout=10, proxies={'http': None, 'https': None})
-        response.raise_for_status()
-        data = response.content.decode('gbk')
-        data = data[data.find('"') + 1: data.rfind('"')].split(',')
-        fields = ['Volume Bid', 'Price Bid', 'Latest Price', 'Price Ask', 'Volume Ask', 'Open Interest', 'Price Change',
-                 'Strike Price', 'Previous Close', 'Open', 'Upper Limit', 'Lower Limit', 'Ask Price 5', 'Ask Volume 5',
-                 'Ask Price 4', 'Ask Volume 4', 'Ask Price 3', 'Ask Volume 3', 'Ask Price 2', 'Ask Volume 2',
-                 'Ask Price 1', 'Ask Volume 1', 'Bid Price 1', 'Bid Volume 1', 'Bid Price 2', 'Bid Volume 2',
-                 'Bid Price 3', 'Bid Volume 3', 'Bid Price 4', 'Bid Volume 4', 'Bid Price 5', 'Bid Volume 5',
-                 'Quote Time', 'Main Contract', 'Status Code', 'Underlying Type', 'Underlying Stock',
-                 'Option Name', 'Amplitude', 'High', 'Low', 'Volume', 'Amount', 'Dividend Adjustment',
-                 'Previous Settlement', 'Option Type', 'Expiry Date', 'Days to Expiry', 'Moneyness',
-                 'Intrinsic Value', 'Time Value']
-        result = list(zip(fields, data))
+        quotes = fetch_quotes([f"CON_OP_{code}" for code in codes])
+        result = {}
+        for code in codes:
+            data = quotes.get(f"CON_OP_{code}")
+            if data:
+                result[code] = OptionQuote(data)
         return result
-    except (RequestException, ValueError, UnicodeDecodeError) as e:
+    except (RequestError, ValueError, UnicodeDecodeError) as e:
+        _metrics.record_error("fetch_option_quotes", e)
         print(f"Failed to get option price: {str(e)}")
         time.sleep(5)
-        return []
+        return {}
 
+def get_option_price(code):
+    return get_option_quotes([code]).get(code)
+
+@_metrics.timed("fetch_etf_price")
 def get_FitfyETF_price():
     try:
-        url = "http://hq.sinajs.cn/list=s_sh510050"
-        response = get(url, headers=headers, timeout=10, proxies={'http': None, 'https': None})
-        response.raise_for_status()
-        data = response.content.decode('gbk')
-        data = data[data.find('"') + 1:data.rfind('"')].split(',')
+        data = fetch_quotes([ETF_SYMBOL])[ETF_SYMBOL]
         return data[1]
-    except (RequestException, ValueError, UnicodeDecodeError, IndexError) as e:
-        print(f"Failed to get 50ETF price: {str(e)}")
+    except (RequestError, ValueError, UnicodeDecodeError, IndexError, KeyError) as e:
+        _metrics.record_error("fetch_etf_price", e)
+        print(f"Failed to get {UNDERLYING} price: {str(e)}")
         time.sleep(5)
         return None
 
-def get_option_greek_xingquanjia(code):
+@_metrics.timed("fetch_option_strikes")
+def get_option_strikes(codes):
+    """一次请求获取多个期权合约的行权价
+    Args:
+        codes: 期权代码列表
+    Returns:
+        dict: {期权代码: 行权价字符串}，缺少行权价的代码不包含在结果中
+    """
     try:
-        url = "http://hq.sinajs.cn/list=CON_SO_{code}".format(code=code)
-        response = get(url, headers=headers, timeout=10, proxies={'http': None, 'https': None})
-        response.raise_for_status()
-        data = response.content.decode('gbk')
-        data = data[data.find('"') + 1: data.rfind('"')].split(',')
-        return data[13]
-    except (RequestException, ValueError, UnicodeDecodeError, IndexError) as e:
+        quotes = fetch_quotes([f"CON_SO_{code}" for code in codes])
+        strikes = {}
+        for code in codes:
+            data = quotes.get(f"CON_SO_{code}", [])
+            if len(data) > 13 and data[13]:
+                strikes[code] = data[13]
+        return strikes
+    except (RequestError, ValueError, UnicodeDecodeError) as e:
+        _metrics.record_error("fetch_option_strikes", e)
         print(f"Failed to get strike price: {str(e)}")
         time.sleep(5)
-        return None
+        return {}
+
+def get_option_greek_xingquanjia(code):
+    return get_option_strikes([code]).get(code)
+
+# 按 标的+到期月份 缓存的期权链，只为新挂牌的合约请求行权价
+_chain_cache = OptionChainCache(get_option_strikes)
+
+def get_option_chain(month, call_codes, put_codes, underlying=None):
+    """获取期权链（已缓存合约的行权价直接取自缓存）
+    Args:
+        month: 到期月份，格式YYYYMM
+        call_codes: 当前Call期权代码列表
+        put_codes: 当前Put期权代码列表
+        underlying: 标的代码，默认为当前标的
+    Returns:
+        OptionChain: 期权链
+    """
+    return _chain_cache.get_chain(underlying or UNDERLYING_CODE, month, call_codes, put_codes)
 
 # 获取 Call 和 Put 期权价格
 def extract_price(option_data, key="Latest Price"):
-    """Extract price value from option data list
+    """Extract price value from option quote
     Args:
-        option_data: Option data list, e.g. [('Price Bid', '0.0095'), ('Latest Price', '0.0095'), ...]
-        key: Price type to extract, default "Latest Price"
+        option_data: OptionQuote record
+        key: Price field to extract, e.g. "Latest Price" or "最新价"
     Returns:
         str or None: Price value string or None if not found or invalid
     """
@@ -435,31 +562,17 @@ def extract_price(option_data, key="Latest Price"):
             log_to_file("期权数据为空", "ERROR")
             return None
 
-        # 创建key映射关系
-        key_mapping = {
-            "最新价": ["最新价", "Latest Price"],
-            "Latest Price": ["Latest Price", "最新价"]
-        }
-        
-        # 获取所有可能的key值
-        possible_keys = key_mapping.get(key, [key])
-        
-        # 打印调试信息
+        # 字段下标在 OPTION_QUOTE_FIELD_INDEX 中预先计算，O(1) 读取
+        value = option_data.get(key)
         if Debug_mode:
-            print(f"期权数据: {option_data}")
-            print(f"查找key: {possible_keys}")
-        
-        # 遍历所有可能的key
-        for search_key in possible_keys:
-            for item in option_data:
-                if item[0] == search_key and item[1]:
-                    if Debug_mode:
-                        print(f"找到匹配项: {item}")
-                    return item[1]
+            print(f"期权数据: {option_data.as_dict()}")
+            print(f"查找key: {key}, 结果: {value}")
+        if value:
+            return value
         
         # 如果找不到任何匹配项，记录错误
-        print(f"在期权数据中未找到价格，key={possible_keys}")
-        log_to_file(f"在期权数据中未找到价格，key={possible_keys}", "ERROR")
+        print(f"在期权数据中未找到价格，key={key}")
+        log_to_file(f"在期权数据中未找到价格，key={key}", "ERROR")
         return None
     except Exception as e:
         print(f"提取期权价格时出错: {str(e)}")
@@ -480,35 +593,39 @@ def is_weekend():
         return True
     return False
 
+# 交易日历：交易日和 TRADING_HOURS 记录时段的查询
+_trading_calendar = None
+
+def get_trading_calendar():
+    """获取交易日历（首次使用时从 HOLIDAY_FILE 加载，交易时段为 TRADING_HOURS）
+    数据文件无法读取时只按周一到周五判断交易日
+    """
+    global _trading_calendar
+    if (_trading_calendar is None):
+        try:
+            _trading_calendar = load_calendar(HOLIDAY_FILE, sessions=TRADING_HOURS)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"加载休市安排失败: {str(e)}，只按周一到周五判断交易日", flush=True)
+            log_to_file(f"加载休市安排失败: {str(e)}，只按周一到周五判断交易日", "ERROR")
+            _trading_calendar = TradingCalendar([], sessions=TRADING_HOURS)
+    return _trading_calendar
+
 #判断是否是交易日
 def is_dealday():
     """Check if current day is trading day
     Returns:
         bool: True if trading day, False if weekend or holiday
     """
-    now = datetime.datetime.now()
-    current_day = now.strftime("%Y-%m-%d")
-    if (1 == Debug_mode):    
-        print(current_day)
-        print("is_weekend()=", is_weekend())
-
-    if (is_weekend() != True):
-        if (1 == Debug_mode):    
-            print("enter this ...")
-
-        result = True
-        for day in Holiday:
-            if (1 == Debug_mode):    
-                print(day)
-            if (current_day == day):
-                if (1 == Debug_mode):    
-                    print("success")
-                result = False
-                break
-    else:
-        result = False
-    
-    return result
+    return get_trading_calendar().is_trading_day(datetime.date.today())
+
+def is_trading_date(date):
+    """判断指定日期是否为交易日（按 sse_holidays.json 中的休市安排）
+    Args:
+        date: datetime.date
+    Returns:
+        bool: 是否为交易日
+    """
+    return get_trading_calendar().is_trading_day(date)
 
 def validate_price(price, price_type='option'):
     """Validate price data
@@ -521,8 +638,9 @@ def validate_price(price, price_type='option'):
     try:
         price = float(price)
         if (price_type == 'etf'):
-            # ETF price usually between 2-4 yuan, set range to 1-5
-            return 1 < price < 5
+            # ETF price range depends on the underlying (see UNDERLYING_PROFILES)
+            low, high = ETF_PRICE_RANGE
+            return low < price < high
         else:
             # Option price must be positive and usually less than ETF price
             return 0.0001 <= price < 5
@@ -542,64 +660,74 @@ def validate_contracts(contracts):
     except (TypeError, ValueError):
         return False
 
+# 每个月份的状态存储（快照 <FILE_PREFIX>_state_YYYYMM.json + 日志 <FILE_PREFIX>_state_YYYYMM.journal）
+_state_journals = {}
+
+def get_state_journal(month):
+    """获取指定月份的状态存储
+    Args:
+        month: 月份，格式YYYYMM
+    Returns:
+        StateJournal: 状态存储
+    """
+    if (month not in _state_journals):
+        _state_journals[month] = StateJournal(f"{FILE_PREFIX}_state_{month}.json")
+    return _state_journals[month]
+
+@_metrics.timed("save_state")
 def save_state(state_data):
     """Save program state to file
+    只把变化的字段追加到状态日志并fsync，日志累计一定条数后压缩为快照
     Args:
         state_data: State data dictionary to save
     """
     current_month = datetime.datetime.now().strftime("%Y%m")
-    state_file = f"option_trading_state_{current_month}.json"
     try:
-        with open(state_file, 'w', encoding='utf-8') as f:
-            json.dump(state_data, f, indent=2)
+        if (STORAGE_BACKEND == "sqlite"):
+            get_trade_store().save_state(current_month, state_data)
+            return
+        get_state_journal(current_month).save(state_data)
     except Exception as e:
+        _metrics.record_error("save_state", e)
         print(f"Failed to save state file: {str(e)}")
 
-def validate_strike_prices_against_etf(call_strike, put_strike, etf_price):
-    """验证行权价是否与ETF价格匹配（虚2档）
+# 上交所ETF期权的理论标准行权价阶梯（没有期权链时校验行权价使用），首次使用时生成
+_standard_strike_ladder = None
+
+def get_standard_strike_ladder():
+    """生成分段的标准行权价阶梯：3元以下0.05元间隔（从0.05元开始，覆盖科创50等1元以下的ETF），
+    3-5元0.1元间隔，5-10元0.25元间隔"""
+    global _standard_strike_ladder
+    if (_standard_strike_ladder is None):
+        strikes = set()
+        for low, high, step in ((0.05, 3.0, 0.05), (3.0, 5.0, 0.1), (5.0, 10.0, 0.25)):
+            for i in range(int(round((high - low) / step)) + 1):
+                strikes.add(round(low + i * step, 2))
+        _standard_strike_ladder = StrikeLadder(strikes)
+    return _standard_strike_ladder
+
+def validate_strike_prices_against_etf(call_strike, put_strike, etf_price, chain=None):
+    """验证行权价是否与ETF价格匹配（Call虚CALL_OTM_LEVEL档，Put虚PUT_OTM_LEVEL档）
     Args:
         call_strike: Call期权行权价
         put_strike: Put期权行权价
         etf_price: ETF价格
+        chain: OptionChain，给出时按实际挂牌的行权价阶梯校验，否则按理论标准行权价阶梯校验
     Returns:
         bool: True if strike prices are correct for the ETF price
     """
     try:
-        # 生成分段的标准行权价列表
-        strikes = []
-
-        # 3元以下部分：0.05元间隔
-        price = 1.0
-        while price < 3.0:
-            strikes.append(round(price, 2))
-            price += 0.05
-
-        # 3-5元部分：0.1元间隔
-        price = 3.0
-        while price < 5.0:
-            strikes.append(round(price, 2))
-            price += 0.1
-
-        # 5元以上部分：0.25元间隔
-        price = 5.0
-        while price <= 10.0:  # 假设最高到10元
-            strikes.append(round(price, 2))
-            price += 0.25
-
-        # 去重并排序
-        strikes = sorted(list(set(strikes)))
-        
-        # 找到最接近ETF价格的标准行权价作为平值（ATM）
-        atm_strike = min(strikes, key=lambda x: abs(x - etf_price))
-        atm_index = strikes.index(atm_strike)
-        
-        # 计算正确的虚2档行权价
-        expected_call_strike = strikes[atm_index + CALL_OTM_LEVEL]
-        expected_put_strike = strikes[atm_index - PUT_OTM_LEVEL]
-        
-        # 检查是否匹配
-        call_match = abs(call_strike - expected_call_strike) < 0.01
-        put_match = abs(put_strike - expected_put_strike) < 0.01
+        if (chain is not None):
+            selection = chain.select_otm(etf_price, CALL_OTM_LEVEL, PUT_OTM_LEVEL)
+            expected_call_strike = selection.call[1] if selection.call else None
+            expected_put_strike = selection.put[1] if selection.put else None
+        else:
+            _, expected_call_strike, expected_put_strike = get_standard_strike_ladder().otm(
+                etf_price, CALL_OTM_LEVEL, PUT_OTM_LEVEL)
+
+        # 检查是否匹配（档位不足时视为不匹配）
+        call_match = expected_call_strike is not None and abs(call_strike - expected_call_strike) < 0.01
+        put_match = expected_put_strike is not None and abs(put_strike - expected_put_strike) < 0.01
         
         if not call_match or not put_match:
             log_to_file(f"行权价验证失败: ETF={etf_price}, 当前Call={call_strike}(期望{expected_call_strike}), 当前Put={put_strike}(期望{expected_put_strike})", "WARNING")
@@ -646,8 +774,15 @@ def validate_state(state):
             etf_price = state['start_of_month_etf_price']
             call_strike = state['selected_call_strike'][1]
             put_strike = state['selected_put_strike'][1]
+
+            # 按状态所在月份实际挂牌的期权链校验（除权后行权价不在理论阶梯上），取不到合约列表时按理论阶梯校验
+            chain = None
+            if (state.get('trading_month')):
+                call_codes, put_codes = get_option_codes(state['trading_month'], underlying=UNDERLYING_CODE)
+                if (call_codes and put_codes):
+                    chain = get_option_chain(state['trading_month'], call_codes, put_codes)
             
-            if not validate_strike_prices_against_etf(call_strike, put_strike, etf_price):
+            if not validate_strike_prices_against_etf(call_strike, put_strike, etf_price, chain):
                 print("❌ 状态文件中的行权价与ETF价格不匹配，将重新初始化")
                 log_to_file("状态文件中的行权价与ETF价格不匹配，将重新初始化", "WARNING")
                 return False
@@ -685,17 +820,24 @@ def load_state():
         dict: Loaded state data or None if failed
     """
     current_month = datetime.datetime.now().strftime("%Y%m")
-    state_file = f"option_trading_state_{current_month}.json"
     try:
-        if (os.path.exists(state_file)):
-            with open(state_file, 'r', encoding='utf-8') as f:
-                state = json.load(f)
+        if (STORAGE_BACKEND == "sqlite"):
+            state = get_trade_store().load_state(current_month)
+            if (state is not None):
                 if (validate_state(state)):
-                    print("✅ Successfully loaded valid state file")
+                    print("✅ Successfully loaded valid state from database")
                     return state
-                else:
-                    print("❌ State file validation failed, using initial values")
-                    return None
+                print("❌ State validation failed, using initial values")
+            return None
+        # 读取快照并重放状态日志
+        state = get_state_journal(current_month).load()
+        if (state is not None):
+            if (validate_state(state)):
+                print("✅ Successfully loaded valid state file")
+                return state
+            else:
+                print("❌ State file validation failed, using initial values")
+                return None
     except Exception as e:
         print(f"Failed to load state file: {str(e)}")
     return None
@@ -719,34 +861,24 @@ def get_next_month(current_month):
         return None
 
 def check_csv_data_exists(target_month):
-    """检查指定月份的CSV文件是否存在且包含数据
+    """检查指定月份是否已有交易数据（查询月份清单，SQLite存储时查询数据库）
     Args:
         target_month: 目标月份，格式为YYYYMM
     Returns:
         bool: True if CSV exists and contains data for the target month
     """
     try:
-        # 查找包含目标月份数据的CSV文件（排除备份文件）
-        current_dir = os.getcwd()
-        for file in os.listdir(current_dir):
-            if (file.startswith('option_trading_') and file.endswith('.csv') and 
-                'backup' not in file and 'fixed' not in file and 'old' not in file):
-                csv_file_path = os.path.join(current_dir, file)
-                try:
-                    # 检查文件是否为空
-                    if os.path.getsize(csv_file_path) == 0:
-                        continue
-                    
-                    # 读取文件最后几行，查找目标月份的数据
-                    with open(csv_file_path, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        # 检查最后100行是否包含目标月份的数据
-                        for line in lines[-100:]:
-                            if target_month in line:
-                                print(f"✅ 找到现有数据文件: {file}, 包含月份 {target_month} 的数据")
-                                return True
-                except Exception as e:
-                    continue
+        if (STORAGE_BACKEND == "sqlite"):
+            if (target_month in get_trade_store().months()):
+                print(f"✅ 找到现有数据库记录, 包含月份 {target_month} 的数据")
+                return True
+            return False
+
+        manifest = get_month_manifest()
+        if (manifest.has_month(target_month)):
+            files = ', '.join(manifest.get(target_month)['files'])
+            print(f"✅ 找到现有数据文件: {files}, 包含月份 {target_month} 的数据")
+            return True
         return False
     except Exception as e:
         print(f"检查CSV数据时出错: {str(e)}")
@@ -760,68 +892,35 @@ def recover_state_from_csv(target_month):
         dict: 恢复的状态信息，如果失败返回None
     """
     try:
-        current_dir = os.getcwd()
-        target_records = []
-        
-        # 查找所有包含目标月份数据的CSV文件（排除备份文件）
-        for file in os.listdir(current_dir):
-            if (file.startswith('option_trading_') and file.endswith('.csv') and 
-                'backup' not in file and 'fixed' not in file and 'old' not in file):
-                csv_file_path = os.path.join(current_dir, file)
-                try:
-                    if os.path.getsize(csv_file_path) == 0:
-                        continue
-                    
-                    with open(csv_file_path, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        for line in lines[1:]:  # 跳过表头
-                            if target_month in line and line.strip():
-                                target_records.append(line.strip().split(','))
-                except Exception as e:
-                    continue
-        
-        if not target_records:
+        # 读取目标月份在总表中的第一条和最后一条记录
+        if (STORAGE_BACKEND == "sqlite"):
+            store = get_trade_store()
+            first_row = store.first_of_month(target_month)
+            latest_row = store.last_of_month(target_month)
+            first_record = [first_row[h] for h in MASTER_CSV_HEADER] if first_row else None
+            latest_record = [latest_row[h] for h in MASTER_CSV_HEADER] if latest_row else None
+            record_count = store.row_count(target_month)
+        else:
+            month_rows = get_month_manifest().master_rows(target_month)
+            first_record, latest_record, record_count = month_rows if month_rows else (None, None, 0)
+
+        if (first_record is None or latest_record is None):
             print(f"❌ 未找到月份 {target_month} 的CSV数据")
             return None
         
-        # 按日期排序，确保获取正确的第一条和最后一条记录
-        target_records.sort(key=lambda x: x[0])  # 按日期排序
-        
-        first_record = target_records[0]
-        latest_record = target_records[-1]
-        
         # 解析CSV格式: Date,ETF Price,Call Strike,Put Strike,Call Price,Put Price,Call Qty,Put Qty,Remainder Cost,Total Cost,Total Return,Annual Return,Month
         try:
             # 获取当前可用的期权代码
-            call_codes, put_codes = get_option_codes(target_month, underlying='510050')
+            call_codes, put_codes = get_option_codes(target_month, underlying=UNDERLYING_CODE)
             
             # 从CSV恢复的行权价
             call_strike_from_csv = float(latest_record[2])
             put_strike_from_csv = float(latest_record[3])
             
-            # 查找匹配的真实期权代码
-            selected_call_strike = None
-            selected_put_strike = None
-            
-            if call_codes:
-                for code in call_codes:
-                    try:
-                        strike = float(get_option_greek_xingquanjia(code))
-                        if abs(strike - call_strike_from_csv) < 0.0001:  # 允许小的浮点误差
-                            selected_call_strike = [code, strike]
-                            break
-                    except:
-                        continue
-            
-            if put_codes:
-                for code in put_codes:
-                    try:
-                        strike = float(get_option_greek_xingquanjia(code))
-                        if abs(strike - put_strike_from_csv) < 0.0001:  # 允许小的浮点误差
-                            selected_put_strike = [code, strike]
-                            break
-                    except:
-                        continue
+            # 查找匹配的真实期权代码（在期权链的行权价阶梯上二分查找，允许小的浮点误差）
+            chain = get_option_chain(target_month, call_codes, put_codes)
+            selected_call_strike = chain.find(OptionChain.CALL, call_strike_from_csv)
+            selected_put_strike = chain.find(OptionChain.PUT, put_strike_from_csv)
             
             # 如果找不到匹配的期权代码，使用占位符
             if not selected_call_strike:
@@ -834,8 +933,8 @@ def recover_state_from_csv(target_month):
             
             recovered_state = {
                 "start_of_month_etf_price": float(first_record[1]),  # 第一条记录的ETF价格作为月初价格
-                "selected_call_strike": selected_call_strike,
-                "selected_put_strike": selected_put_strike,
+                "selected_call_strike": list(selected_call_strike),
+                "selected_put_strike": list(selected_put_strike),
                 "call_contracts": int(latest_record[6]),
                 "put_contracts": int(latest_record[7]),
                 "call_initial_price": float(first_record[4]),  # 第一条记录的Call期权价格作为初始基准价格
@@ -848,7 +947,7 @@ def recover_state_from_csv(target_month):
                 "start_date": first_record[0][:10]  # 提取日期部分 YYYY-MM-DD
             }
             
-            print(f"✅ 从CSV恢复状态成功 (共{len(target_records)}条记录):")
+            print(f"✅ 从CSV恢复状态成功 (共{record_count}条记录):")
             print(f"├─ 开始日期: {recovered_state['start_date']}")
             print(f"├─ ETF初始价格: {recovered_state['start_of_month_etf_price']}")
             print(f"├─ Call行权价: {recovered_state['selected_call_strike'][1]}")
@@ -864,7 +963,8 @@ def recover_state_from_csv(target_month):
             # 一致性校验：验证余数成本计算是否正确
             call_price_first = float(first_record[4])
             put_price_first = float(first_record[5])
-            calculated_remainder = int(MONTHLY_INVESTMENT - (recovered_state['call_contracts'] * call_price_first * 10000 + recovered_state['put_contracts'] * put_price_first * 10000))
+            calculated_remainder = int(option_math.remainder_cost(MONTHLY_INVESTMENT, recovered_state['call_contracts'], call_price_first,
+                                                                  recovered_state['put_contracts'], put_price_first))
             csv_remainder = recovered_state['monthly_remainder_cost']
             
             if abs(calculated_remainder - csv_remainder) > 1:  # 允许1元误差
@@ -1006,6 +1106,14 @@ def should_switch_to_next_month(current_remainder_days, next_remainder_days):
     
     return should_switch
 
+# 总表表头（英文，包含月份字段）和月度分表表头（中文，无月份字段）
+MASTER_CSV_HEADER = ["Date", "ETF Price", "Call Strike", "Put Strike",
+                     "Call Price", "Put Price", "Call Qty", "Put Qty",
+                     "Remainder Cost", "Total Cost", "Total Return", "Annual Return", "Month"]
+MONTHLY_CSV_HEADER = ["日期", "ETF 价格", "Call 行权价", "Put 行权价",
+                      "Call 价格", "Put 价格", "Call 数量", "Put 数量",
+                      "余数成本", "总成本", "总收益", "年化收益率"]
+
 def get_csv_filename():
     """获取当前CSV总表文件名
     
@@ -1014,9 +1122,151 @@ def get_csv_filename():
     程序会自动使用新的文件名存储交易数据，之前的数据将保持不变。
     
     Returns:
-        str: 当前使用的CSV总表文件名，格式为"option_trading_YYYYMMDD.csv"
+        str: 当前使用的CSV总表文件名，格式为"<FILE_PREFIX>_YYYYMMDD.csv"（50ETF为"option_trading_YYYYMMDD.csv"）
+    """
+    return f"{FILE_PREFIX}_{CSV_START_DATE}.csv"
+
+# 总表索引（按 月份 / 月份+剩余天数 / 交易日期 定位数据行）
+_master_index = None
+
+def _index_remainder_days(month, date_str):
+    """计算总表数据行写入时的剩余天数，用于为没有索引的旧数据补建索引"""
+    record_date = datetime.datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+    _, remainder_days = get_option_expire_day(month, as_of=record_date)
+    return remainder_days
+
+def get_master_index():
+    """获取当前CSV总表的索引，总表文件名变化（开始新的记录周期）时重新加载
+    使用SQLite存储时返回数据库存储，两者的查询接口一致
+    Returns:
+        MasterCsvIndex | TradeStore: 总表索引
+    """
+    global _master_index
+    if (STORAGE_BACKEND == "sqlite"):
+        return get_trade_store()
+    _flush_pending_ticks()
+    csv_filename = get_csv_filename()
+    if (_master_index is None or _master_index.csv_path != csv_filename):
+        _master_index = MasterCsvIndex(csv_filename, remainder_fn=_index_remainder_days).load()
+    return _master_index
+
+def _flush_pending_ticks():
+    """查询前把写入器缓存的数据行写入文件，写入后的回调会更新索引和月份清单"""
+    if (_tick_writer is not None and _tick_writer.pending_rows):
+        _tick_writer.flush()
+
+def flush_before_sleep(next_wakeup):
+    """主循环休眠前调用：休眠期间会超过 CSV_FLUSH_SECONDS，或休眠到午后/次日开盘时，先写入缓存的数据行
+    Args:
+        next_wakeup: 下一次唤醒时刻，None表示未知
+    """
+    if (_tick_writer is None):
+        return
+    idle_seconds = None
+    if (next_wakeup is not None):
+        idle_seconds = max((next_wakeup - datetime.datetime.now()).total_seconds(), 0)
+    try:
+        _tick_writer.flush_before_idle(idle_seconds)
+    except OSError as e:
+        print(f"写入缓存的数据行失败: {str(e)}", flush=True)
+        log_to_file(f"写入缓存的数据行失败: {str(e)}", "ERROR")
+
+# 月份清单（记录每个月份的数据文件、行位置和摘要字段）
+_month_manifest = None
+
+def get_month_manifest():
+    """获取当前CSV总表对应的月份清单，清单文件不存在或已失效时扫描现有数据文件重建
+    Returns:
+        MonthManifest: 月份清单
+    """
+    global _month_manifest
+    _flush_pending_ticks()
+    manifest_filename = get_manifest_filename(get_csv_filename())
+    if (_month_manifest is None or _month_manifest.path != manifest_filename):
+        _month_manifest = MonthManifest(manifest_filename)
+        if (not _month_manifest.exists() or not _month_manifest.load().verify()):
+            monthly_files = {}
+            for file in os.listdir(os.getcwd()):
+                month = file[len(f'{FILE_PREFIX}_'):-len('.csv')]
+                if (file.startswith(f'{FILE_PREFIX}_') and file.endswith('.csv') and
+                        len(month) == 6 and month.isdigit()):
+                    monthly_files[month] = file
+            print(f"ℹ️ 月份清单不存在或已失效，扫描数据文件重建: {manifest_filename}", flush=True)
+            _month_manifest.rebuild(get_csv_filename(), monthly_files)
+    return _month_manifest
+
+def _on_rows_flushed(flushed_rows):
+    """数据行写入文件后同步更新总表索引和月份清单
+    Args:
+        flushed_rows: [FlushedRow, ...]
+    """
+    try:
+        index = get_master_index()
+        for row in flushed_rows:
+            index.add(row.master_offset, row.master_length, row.master_row[0], row.month, row.meta)
+    except Exception as e:
+        # 索引写入失败不影响数据记录，下次加载时会为缺失的数据行补建索引
+        log_to_file(f"更新总表索引失败: {str(e)}", "ERROR")
+    try:
+        manifest = get_month_manifest()
+        for row in flushed_rows:
+            manifest.record(row.month, row.master_path, row.master_offset, row.master_length,
+                            row.master_row, is_master=True)
+            manifest.record(row.month, row.monthly_path, row.monthly_offset, row.monthly_length,
+                            row.monthly_row)
+        manifest.save()
+    except Exception as e:
+        log_to_file(f"更新月份清单失败: {str(e)}", "ERROR")
+
+# 总表和月度分表的长期写入器（STORAGE_BACKEND = "csv" 时使用）
+_tick_writer = None
+
+def get_tick_writer():
+    """获取CSV写入器，首次使用时打开文件并注册退出时的刷新
+    Returns:
+        TickWriter: CSV写入器
     """
-    return f"option_trading_{CSV_START_DATE}.csv"
+    global _tick_writer
+    if (_tick_writer is None):
+        _tick_writer = TickWriter(get_csv_filename(), MASTER_CSV_HEADER, MONTHLY_CSV_HEADER,
+                                  lambda month: f"{FILE_PREFIX}_{month}.csv",
+                                  flush_rows=CSV_FLUSH_ROWS, flush_seconds=CSV_FLUSH_SECONDS,
+                                  on_flush=_on_rows_flushed)
+        _tick_writer.install_shutdown_hooks()
+    return _tick_writer
+
+# SQLite交易数据存储（STORAGE_BACKEND = "sqlite" 时使用）
+_trade_store = None
+
+def get_trade_store():
+    """获取当前记录周期的SQLite存储，数据库文件名与总表一致（<FILE_PREFIX>_<CSV_START_DATE>.db）
+    Returns:
+        TradeStore: SQLite存储
+    """
+    global _trade_store
+    db_filename = f"{FILE_PREFIX}_{CSV_START_DATE}.db"
+    if (_trade_store is None or _trade_store.db_path != db_filename):
+        _trade_store = TradeStore(db_filename)
+    return _trade_store
+
+@_metrics.timed("record_row")
+def record_trade_row(master_row, monthly_row, remainder_days, state_data=None):
+    """记录一个采样时刻的交易数据（总表 + 月度分表）
+    Args:
+        master_row: 总表数据行（英文表头顺序，最后一列为月份）
+        monthly_row: 月度分表数据行（中文表头顺序，无月份字段）
+        remainder_days: 写入时的剩余天数
+        state_data: 程序状态，SQLite存储时与数据行在同一事务中提交；
+                    CSV存储时状态仍由 save_state 单独保存，此参数被忽略
+    """
+    if (STORAGE_BACKEND == "sqlite"):
+        get_trade_store().record_tick(master_row, monthly_row, remainder_days,
+                                      state=state_data, state_month=datetime.datetime.now().strftime("%Y%m"))
+        return
+
+    # 总表（英文表头，包含月份字段）和月度分表（中文表头，无月份字段）由写入器按刷新策略写入，写入后同步更新索引
+    get_tick_writer().write(master_row, monthly_row, str(master_row[-1]),
+                            meta=remainder_days, master_path=get_csv_filename())
 
 def create_csv_file(month=None):
     """Create or ensure CSV files exist with headers (both master file and monthly file)
@@ -1035,16 +1285,14 @@ def create_csv_file(month=None):
         month = datetime.datetime.now().strftime("%Y%m")
     
     # 月度分表文件名
-    monthly_csv_filename = f"option_trading_{month}.csv"
+    monthly_csv_filename = f"{FILE_PREFIX}_{month}.csv"
     
     # 1. 创建或确保总表文件存在
     try:
         with open(master_csv_filename, 'a', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
             if (file.tell() == 0):  # If new file, write headers
-                writer.writerow(["Date", "ETF Price", "Call Strike", "Put Strike", 
-                               "Call Price", "Put Price", "Call Qty", "Put Qty", 
-                               "Remainder Cost", "Total Cost", "Total Return", "Annual Return", "Month"])
+                writer.writerow(MASTER_CSV_HEADER)
                 file.flush()
                 print(f"✅ 创建了新的总表文件: {master_csv_filename}", flush=True)
                 log_to_file(f"创建了新的总表文件: {master_csv_filename}", "INFO")
@@ -1058,9 +1306,7 @@ def create_csv_file(month=None):
         with open(monthly_csv_filename, 'a', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
             if (file.tell() == 0):  # If new file, write headers
-                writer.writerow(["日期", "ETF 价格", "Call 行权价", "Put 行权价", 
-                               "Call 价格", "Put 价格", "Call 数量", "Put 数量", 
-                               "余数成本", "总成本", "总收益", "年化收益率"])
+                writer.writerow(MONTHLY_CSV_HEADER)
                 file.flush()
                 print(f"✅ 创建了月度分表文件: {monthly_csv_filename}", flush=True)
                 log_to_file(f"创建了月度分表文件: {monthly_csv_filename}", "INFO")
@@ -1071,6 +1317,11 @@ def create_csv_file(month=None):
     
     return success
 
+def retry_sleep(delay):
+    """重试前等待（计入耗时统计的 retry_sleep 阶段）"""
+    with _metrics.stage("retry_sleep"):
+        time.sleep(delay)
+
 def verify_and_get_option_prices(call_code, put_code, max_retries=3, retry_delay=2):
     """验证并获取期权价格，包含重试机制
     Args:
@@ -1083,20 +1334,23 @@ def verify_and_get_option_prices(call_code, put_code, max_retries=3, retry_delay
     """
     for attempt in range(max_retries):
         try:
+            # Call和Put期权数据在同一次请求中获取
+            option_quotes = get_option_quotes([call_code, put_code])
+
             # 获取Call期权数据
-            call_option_data = get_option_price(call_code)
+            call_option_data = option_quotes.get(call_code)
             if call_option_data is None:
                 print(f"获取Call期权数据失败 (重试 {attempt + 1}/{max_retries})")
                 log_to_file(f"获取Call期权数据失败 (重试 {attempt + 1}/{max_retries})", "ERROR")
-                time.sleep(retry_delay)
+                retry_sleep(retry_delay)
                 continue
 
             # 获取Put期权数据
-            put_option_data = get_option_price(put_code)
+            put_option_data = option_quotes.get(put_code)
             if put_option_data is None:
                 print(f"获取Put期权数据失败 (重试 {attempt + 1}/{max_retries})")
                 log_to_file(f"获取Put期权数据失败 (重试 {attempt + 1}/{max_retries})", "ERROR")
-                time.sleep(retry_delay)
+                retry_sleep(retry_delay)
                 continue
 
             # 提取价格
@@ -1106,7 +1360,7 @@ def verify_and_get_option_prices(call_code, put_code, max_retries=3, retry_delay
             if call_price is None or put_price is None:
                 print(f"提取期权价格失败 (重试 {attempt + 1}/{max_retries})")
                 log_to_file(f"提取期权价格失败 (重试 {attempt + 1}/{max_retries})", "ERROR")
-                time.sleep(retry_delay)
+                retry_sleep(retry_delay)
                 continue
 
             try:
@@ -1115,7 +1369,7 @@ def verify_and_get_option_prices(call_code, put_code, max_retries=3, retry_delay
             except ValueError as e:
                 print(f"期权价格格式无效 (重试 {attempt + 1}/{max_retries}): {str(e)}")
                 log_to_file(f"期权价格格式无效 (重试 {attempt + 1}/{max_retries}): {str(e)}", "ERROR")
-                time.sleep(retry_delay)
+                retry_sleep(retry_delay)
                 continue
             
             if validate_price(call_price) and validate_price(put_price):
@@ -1125,23 +1379,88 @@ def verify_and_get_option_prices(call_code, put_code, max_retries=3, retry_delay
             log_to_file(f"期权价格验证失败: Call={call_price}, Put={put_price} (重试 {attempt + 1}/{max_retries})", "ERROR")
             
         except Exception as e:
+            _metrics.record_error("verify_option_prices", e)
             print(f"获取期权价格时发生错误 (重试 {attempt + 1}/{max_retries}): {str(e)}")
             log_to_file(f"获取期权价格时发生错误 (重试 {attempt + 1}/{max_retries}): {str(e)}", "ERROR")
             if Debug_mode:
                 import traceback
                 print(traceback.format_exc())
         
-        time.sleep(retry_delay)
+        retry_sleep(retry_delay)
     
     return None, None
 
-def initialize_contracts(current_etf_price, call_codes, put_codes, max_retries=3):
+@_metrics.timed("fetch_tick_prices")
+def get_tick_prices(call_code, put_code, max_retries=3, retry_delay=2, deadline=TICK_DEADLINE):
+    """并发获取一个tick的Call、Put和ETF价格，三条腿同时发出请求
+    Args:
+        call_code: Call期权代码
+        put_code: Put期权代码
+        max_retries: 最大重试次数
+        retry_delay: 重试延迟秒数
+        deadline: 每次获取的截止时间（秒）
+    Returns:
+        tuple: (call_price, put_price, etf_price) 如果成功，(None, None, None) 如果失败
+    """
+    call_symbol = f"CON_OP_{call_code}"
+    put_symbol = f"CON_OP_{put_code}"
+    etf_symbol = ETF_SYMBOL
+    for attempt in range(max_retries):
+        try:
+            legs = fetch_quote_legs({'call': [call_symbol], 'put': [put_symbol], 'etf': [etf_symbol]}, deadline)
+            missing_legs = [leg for leg, quotes in legs.items() if quotes is None]
+            if missing_legs:
+                print(f"获取行情失败: {missing_legs} (重试 {attempt + 1}/{max_retries})")
+                log_to_file(f"获取行情失败: {missing_legs} (重试 {attempt + 1}/{max_retries})", "ERROR")
+                retry_sleep(retry_delay)
+                continue
+
+            call_price = OptionQuote(legs['call'].get(call_symbol, [])).latest_price
+            put_price = OptionQuote(legs['put'].get(put_symbol, [])).latest_price
+            etf_data = legs['etf'].get(etf_symbol, [])
+            etf_price = float(etf_data[1]) if len(etf_data) > 1 else None
+
+            if call_price is None or put_price is None or etf_price is None:
+                print(f"提取行情价格失败 (重试 {attempt + 1}/{max_retries})")
+                log_to_file(f"提取行情价格失败 (重试 {attempt + 1}/{max_retries})", "ERROR")
+                retry_sleep(retry_delay)
+                continue
+
+            if validate_price(call_price) and validate_price(put_price):
+                return call_price, put_price, etf_price
+
+            print(f"期权价格验证失败: Call={call_price}, Put={put_price} (重试 {attempt + 1}/{max_retries})")
+            log_to_file(f"期权价格验证失败: Call={call_price}, Put={put_price} (重试 {attempt + 1}/{max_retries})", "ERROR")
+        except ValueError as e:
+            _metrics.record_error("fetch_tick_prices", e)
+            print(f"行情价格格式无效 (重试 {attempt + 1}/{max_retries}): {str(e)}")
+            log_to_file(f"行情价格格式无效 (重试 {attempt + 1}/{max_retries}): {str(e)}", "ERROR")
+
+        retry_sleep(retry_delay)
+
+    return None, None, None
+
+def get_prefetch_symbols():
+    """获取下一个采样时刻需要的行情代码（在 initialize_strategy 之后调用），
+    多标的模式下各标的的代码合并为一次批量请求预取
+    Returns:
+        list: ETF行情代码，以及已选定合约的 CON_OP_ 代码
+    """
+    symbols = [ETF_SYMBOL]
+    for strike in (selected_call_strike, selected_put_strike):
+        if (strike):
+            symbols.append(f"CON_OP_{strike[0]}")
+    return symbols
+
+@_metrics.timed("initialize_contracts")
+def initialize_contracts(current_etf_price, call_codes, put_codes, max_retries=3, month=None):
     """初始化合约信息，包含重试机制
     Args:
         current_etf_price: 当前ETF价格
         call_codes: Call期权代码列表
         put_codes: Put期权代码列表
         max_retries: 最大重试次数
+        month: 合约到期月份，格式YYYYMM，默认当前月份
     Returns:
         tuple: (call_strike, put_strike, call_contracts, put_contracts, monthly_remainder_cost) 或 None
     """
@@ -1153,118 +1472,59 @@ def initialize_contracts(current_etf_price, call_codes, put_codes, max_retries=3
 
             log_to_file(f"开始初始化合约，ETF价格: {current_etf_price}")
                 
-            # 获取所有行权价
-            call_strike_prices = []
-            put_strike_prices = []
-            
-            for code in call_codes:
-                strike = get_option_greek_xingquanjia(code)
-                if (strike):
-                    strike_value = float(strike)
-                    call_strike_prices.append((code, strike_value))
-                    
-            for code in put_codes:
-                strike = get_option_greek_xingquanjia(code)
-                if (strike):
-                    strike_value = float(strike)
-                    put_strike_prices.append((code, strike_value))
-
-            if (not call_strike_prices or not put_strike_prices):
+            # 行权价取自期权链缓存，按行权价排序的阶梯在期权链中建立一次
+            if month is None:
+                month = datetime.datetime.now().strftime("%Y%m")
+            chain = get_option_chain(month, call_codes, put_codes)
+            call_ladder = chain.ladder(OptionChain.CALL)
+            put_ladder = chain.ladder(OptionChain.PUT)
+
+            if (not len(call_ladder) or not len(put_ladder)):
                 log_to_file(f"获取行权价失败 (重试 {attempt + 1}/{max_retries})", "ERROR")
                 time.sleep(2)
                 continue
 
-            log_to_file(f"获取到Call期权行权价数量: {len(call_strike_prices)}, Put期权行权价数量: {len(put_strike_prices)}")
+            log_to_file(f"获取到Call期权行权价数量: {len(call_ladder)}, Put期权行权价数量: {len(put_ladder)}")
 
-            # 筛选标准行权价（0.05为单位的行权价，非除权价格）
-            # 50ETF的标准行权价间隔为0.05，如2.65, 2.70, 2.75, 2.80, 2.85等
-            def is_standard_strike(price):
-                # 检查价格是否为标准行权价（以0.05为单位）
-                multiplier = price / 0.05
-                return abs(round(multiplier) - multiplier) < 0.0001  # 允许小误差
-            
-            # 分别筛选出看涨和看跌期权的标准行权价
-            standard_call_strikes = [(code, strike) for code, strike in call_strike_prices if is_standard_strike(strike)]
-            standard_put_strikes = [(code, strike) for code, strike in put_strike_prices if is_standard_strike(strike)]
-            
-            # 如果标准行权价数量太少，使用全部行权价
-            if len(standard_call_strikes) < 5 or len(standard_put_strikes) < 5:
+            # 平值和虚值档位按标准行权价（0.05的整数倍，非除权价格）计算，标准行权价数量太少时使用全部行权价
+            if (not chain.uses_standard_strikes()):
                 log_to_file("标准行权价数量不足，使用全部行权价", "WARNING")
-                standard_call_strikes = call_strike_prices
-                standard_put_strikes = put_strike_prices
-            
-            # 获取所有不同的标准行权价，并排序
-            unique_standard_strikes = sorted(set([strike for _, strike in standard_call_strikes] + 
-                                              [strike for _, strike in standard_put_strikes]))
-            
-            # 获取所有行权价用于日志输出
-            all_unique_strikes = sorted(set([strike for _, strike in call_strike_prices] + 
-                                         [strike for _, strike in put_strike_prices]))
-            
-            # 找到最接近ETF价格的标准行权价作为平值（ATM）
-            atm_strike = min(unique_standard_strikes, key=lambda x: abs(x - current_etf_price))
+            selection = chain.select_otm(current_etf_price, CALL_OTM_LEVEL, PUT_OTM_LEVEL)
+            ladder = chain.selection_ladder().strikes
+            atm_strike = selection.atm
             log_to_file(f"ETF价格: {current_etf_price}, 平值行权价为: {atm_strike}")
-            
+
             # 记录所有行权价和标准行权价用于调试
-            log_to_file(f"所有可用行权价: {all_unique_strikes}")
-            log_to_file(f"标准行权价: {unique_standard_strikes}")
-            
-            # 遍历获取实际存在的标准行权价（平值上下各五档）用于调试
-            atm_index = unique_standard_strikes.index(atm_strike)
-            available_strikes = []
-            
-            start_idx = max(0, atm_index - 5)
-            end_idx = min(len(unique_standard_strikes), atm_index + 6)
-            for i in range(start_idx, end_idx):
-                available_strikes.append(unique_standard_strikes[i])
-            
-            log_to_file(f"平值周围可用标准行权价: {available_strikes}")
-            
+            log_to_file(f"所有可用行权价: {sorted(set(call_ladder.strikes) | set(put_ladder.strikes))}")
+            log_to_file(f"标准行权价: {ladder}")
+            if (chain.xd_strikes()):
+                log_to_file(f"除权调整行权价: {chain.xd_strikes()}")
+
+            # 平值上下各五档用于调试
+            atm_index = chain.selection_ladder().nearest_index(current_etf_price)
+            log_to_file(f"平值周围可用标准行权价: {ladder[max(0, atm_index - 5):atm_index + 6]}")
+
             # 确定看涨期权虚值行权价：平值上方的第N个行权价
-            call_otm_index = atm_index + CALL_OTM_LEVEL
-            if call_otm_index >= len(unique_standard_strikes):
+            call_strike_target = selection.call_target
+            if call_strike_target is None:
                 log_to_file(f"没有足够的Call虚值期权，需要{CALL_OTM_LEVEL}档 (重试 {attempt + 1}/{max_retries})", "ERROR")
                 time.sleep(2)
                 continue
-            call_strike_target = unique_standard_strikes[call_otm_index]
-            
+
             # 确定看跌期权虚值行权价：平值下方的第N个行权价
-            put_otm_index = atm_index - PUT_OTM_LEVEL
-            if put_otm_index < 0:
+            put_strike_target = selection.put_target
+            if put_strike_target is None:
                 log_to_file(f"没有足够的Put虚值期权，需要{PUT_OTM_LEVEL}档 (重试 {attempt + 1}/{max_retries})", "ERROR")
                 time.sleep(2)
                 continue
-            put_strike_target = unique_standard_strikes[put_otm_index]
-            
+
             log_to_file(f"ETF价格: {current_etf_price}, 平值: {atm_strike}, "
                         f"Call虚{CALL_OTM_LEVEL}档目标行权价: {call_strike_target}, "
                         f"Put虚{PUT_OTM_LEVEL}档目标行权价: {put_strike_target}")
-            
-            # 找到最接近目标行权价的Call期权
-            selected_call_strike = None
-            min_call_diff = float('inf')
-            for code, strike in call_strike_prices:  # 这里使用所有期权，而不仅限于标准行权价的期权
-                if abs(strike - call_strike_target) < min_call_diff:
-                    min_call_diff = abs(strike - call_strike_target)
-                    selected_call_strike = (code, strike)
-            
-            # 找到最接近目标行权价的Put期权
-            selected_put_strike = None
-            min_put_diff = float('inf')
-            for code, strike in put_strike_prices:  # 这里使用所有期权，而不仅限于标准行权价的期权
-                if abs(strike - put_strike_target) < min_put_diff:
-                    min_put_diff = abs(strike - put_strike_target)
-                    selected_put_strike = (code, strike)
-            
-            if selected_call_strike is None:
-                log_to_file(f"找不到接近行权价{call_strike_target}的Call期权 (重试 {attempt + 1}/{max_retries})", "ERROR")
-                time.sleep(2)
-                continue
-                
-            if selected_put_strike is None:
-                log_to_file(f"找不到接近行权价{put_strike_target}的Put期权 (重试 {attempt + 1}/{max_retries})", "ERROR")
-                time.sleep(2)
-                continue
+
+            # 最接近目标行权价的Call和Put期权（在全部挂牌合约中选择，而不仅限于标准行权价的期权）
+            selected_call_strike = selection.call
+            selected_put_strike = selection.put
 
             # 检查选出的期权是否与目标行权价相差太大
             if abs(selected_call_strike[1] - call_strike_target) > 0.05:
@@ -1291,8 +1551,8 @@ def initialize_contracts(current_etf_price, call_codes, put_codes, max_retries=3
             log_to_file(f"获取期权价格 - Call: {call_price}, Put: {put_price}")
 
             # 计算合约数量
-            call_contracts = int(CALL_INVESTMENT // (call_price * 10000))
-            put_contracts = int(PUT_INVESTMENT // (put_price * 10000))
+            call_contracts = int(option_math.contract_count(CALL_INVESTMENT, call_price))
+            put_contracts = int(option_math.contract_count(PUT_INVESTMENT, put_price))
 
             if (not validate_contracts(call_contracts) or not validate_contracts(put_contracts)):
                 log_to_file(f"合约数量验证失败 - Call: {call_contracts}, Put: {put_contracts} (重试 {attempt + 1}/{max_retries})", "ERROR")
@@ -1300,7 +1560,7 @@ def initialize_contracts(current_etf_price, call_codes, put_codes, max_retries=3
                 continue
 
             # 计算余数成本
-            monthly_remainder_cost = int(MONTHLY_INVESTMENT - (call_contracts * call_price * 10000 + put_contracts * put_price * 10000))
+            monthly_remainder_cost = int(option_math.remainder_cost(MONTHLY_INVESTMENT, call_contracts, call_price, put_contracts, put_price))
 
             log_to_file(f"初始化完成 - Call合约: {call_contracts}, Put合约: {put_contracts}, 当月余数成本: {monthly_remainder_cost}")
 
@@ -1379,7 +1639,7 @@ def get_historical_values(current_month, target_days, max_retries=3):
         try:
             # 获取当前CSV总表文件名
             csv_filename = get_csv_filename()
-            if (not os.path.exists(csv_filename)):
+            if (STORAGE_BACKEND == "csv" and not os.path.exists(csv_filename)):
                 log_to_file(f"找不到历史记录文件: {csv_filename}", "WARNING")
                 return None
 
@@ -1387,80 +1647,50 @@ def get_historical_values(current_month, target_days, max_retries=3):
             tz_offset = datetime.datetime.now().astimezone().utcoffset()
             tz_hours = int(tz_offset.total_seconds() / 3600)
 
-            with open(csv_filename, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                rows = list(reader)
+            # 通过总表索引定位当月剩余天数为target_days的记录（按写入时间顺序）
+            index = get_master_index()
+            if (not index.months()):
+                log_to_file(f"CSV文件为空: {csv_filename}", "WARNING")
+                return None
 
-                if (not rows):
-                    log_to_file(f"CSV文件为空: {csv_filename}", "WARNING")
-                    return None                # 按日期时间排序，确保我们先处理早些的记录
+            for entry in index.entries_for_remainder(current_month, target_days):
                 try:
-                    rows.sort(key=lambda x: datetime.datetime.strptime(x['Date'], "%Y-%m-%d %H:%M:%S"))
-                except Exception as e:
-                    log_to_file(f"排序记录时出错: {str(e)}", "WARNING")
-
-                matching_records = []
-                # 从最早的记录开始查找
-                for row in rows:
-                    try:
-                        # 考虑时区因素处理日期
-                        record_date = datetime.datetime.strptime(row['Date'], "%Y-%m-%d %H:%M:%S")
-                        # 调整到当地时区
-                        record_date = record_date + datetime.timedelta(hours=tz_hours)
-                        
-                        # 获取记录的月份，优先使用Month列，如果有的话
-                        record_month = row.get('Month', record_date.strftime("%Y%m"))
-                        _, record_remainder_days = get_option_expire_day(record_month)
-                        
-                        if (record_remainder_days == target_days):
-                            # 检查是否在交易时段
-                            hour, minute = record_date.hour, record_date.minute
-                            is_trading_time = any(
-                                (start_h, start_m) <= (hour, minute) <= (end_h, end_m)
-                                for start_h, start_m, end_h, end_m in TRADING_HOURS
-                            )
-                            
-                            if (is_trading_time):
-                                data = {
-                                    'start_of_month_etf_price': float(row['ETF Price']),
-                                    'selected_call_strike': float(row['Call Strike']),
-                                    'selected_put_strike': float(row['Put Strike']),
-                                    'call_contracts': int(row['Call Qty']),                                    'put_contracts': int(row['Put Qty']),
-                                    'monthly_remainder_cost': int(row['Remainder Cost']),
-                                    'total_cost': int(row['Total Cost']),                                    'previous_month_final_return': float(row['Total Return']) if row.get('Total Return') else 0,
-                                    'record_date': record_date.strftime("%Y-%m-%d %H:%M:%S"),
-                                    'month': row.get('Month', record_date.strftime("%Y%m")),
-                                    'time_zone_offset': tz_hours,
-                                    'month': row.get('Month', record_date.strftime("%Y%m"))
-                                }
-                                
-                                if (verify_historical_data(data, current_month)):
-                                    matching_records.append(data)
-                                    # 如果是上午场的第一条记录，直接使用它
-                                    if (hour == TRADING_HOURS[0][0] and minute >= TRADING_HOURS[0][1]):
-                                        log_to_file(f"找到上午场第一条记录: {data['record_date']}")
-                                        return data
-                                    
-                    except (ValueError, KeyError, TypeError) as e:
-                        log_to_file(f"处理历史记录时出错: {str(e)}", "ERROR")
+                    # 记录时间即写入时的本地时间，检查是否在交易时段
+                    record_date = datetime.datetime.strptime(entry.date, "%Y-%m-%d %H:%M:%S")
+                    if (not get_trading_calendar().is_session_time(record_date)):
                         continue
 
-                # 如果找到了匹配的记录，返回最早的那条
-                if (matching_records):
-                    earliest_record = matching_records[0]
-                    log_to_file(f"使用最早的匹配记录: {earliest_record['record_date']}")
-                    return earliest_record
+                    row = index.read_row(entry)
+                    data = {
+                        'start_of_month_etf_price': float(row['ETF Price']),
+                        'selected_call_strike': float(row['Call Strike']),
+                        'selected_put_strike': float(row['Put Strike']),
+                        'call_contracts': int(row['Call Qty']),
+                        'put_contracts': int(row['Put Qty']),
+                        'monthly_remainder_cost': int(row['Remainder Cost']),
+                        'total_cost': int(row['Total Cost']),
+                        'previous_month_final_return': float(row['Total Return']) if row.get('Total Return') else 0,
+                        'record_date': entry.date,
+                        'month': entry.month,
+                        'time_zone_offset': tz_hours
+                    }
 
-            if (attempt < max_retries - 1):
-                log_to_file(f"重试获取历史数据 (第{attempt + 1}次)", "WARNING")
-                time.sleep(2)
-            else:
-                log_to_file(f"在历史记录中找不到剩余天数为{target_days}的有效数据", "WARNING")
-                return None
+                    # 返回当月该剩余天数最早的一条有效记录
+                    if (verify_historical_data(data, current_month)):
+                        log_to_file(f"使用最早的匹配记录: {data['record_date']}")
+                        return data
+
+                except (ValueError, KeyError, TypeError) as e:
+                    log_to_file(f"处理历史记录时出错: {str(e)}", "ERROR")
+                    continue
+
+            log_to_file(f"在历史记录中找不到剩余天数为{target_days}的有效数据", "WARNING")
+            return None
 
         except Exception as e:
             log_to_file(f"读取历史记录时出错: {str(e)}", "ERROR")
             if (attempt < max_retries - 1):
+                log_to_file(f"重试获取历史数据 (第{attempt + 1}次)", "WARNING")
                 time.sleep(2)
             else:
                 return None
@@ -1479,62 +1709,40 @@ def find_closest_historical_day(current_month, target_days):
     try:
         # 获取当前CSV总表文件名
         csv_filename = get_csv_filename()
-        if (not os.path.exists(csv_filename)):
+        if (STORAGE_BACKEND == "csv" and not os.path.exists(csv_filename)):
             log_to_file(f"找不到历史记录文件: {csv_filename}", "WARNING")
             return None
 
-        closest_data = None
+        # 对每一天，只使用第一条记录；剩余天数直接取自总表索引
+        index = get_master_index()
+        closest_entry = None
         min_days_diff = float('inf')
-        records_by_date = {}  # 用于按日期分组的记录
-
-        with open(csv_filename, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            rows = list(reader)            # 首先按日期分组
-            for row in rows:
-                try:
-                    record_date = datetime.datetime.strptime(row['Date'], "%Y-%m-%d %H:%M:%S")
-                    date_key = record_date.date()
-                    if (date_key not in records_by_date):
-                        records_by_date[date_key] = []
-                    records_by_date[date_key].append(row)
-                except Exception as e:
-                    log_to_file(f"处理记录时出错: {str(e)}", "ERROR")
-                    continue
+        for entry in index.daily_first_entries():
+            # 只考虑比目标天数大的记录
+            if (entry.remainder_days is not None and entry.remainder_days > target_days):
+                days_diff = entry.remainder_days - target_days
+                if (days_diff < min_days_diff):
+                    min_days_diff = days_diff
+                    closest_entry = entry
+
+        if (closest_entry is None):
+            return None
 
-            # 对每一天，只使用第一条记录
-            for date, daily_records in records_by_date.items():
-                try:
-                    # 按时间排序，获取当天最早的记录
-                    daily_records.sort(key=lambda x: datetime.datetime.strptime(x['Date'], "%Y-%m-%d %H:%M:%S"))
-                    first_record = daily_records[0]
-                    
-                    record_date = datetime.datetime.strptime(first_record['Date'], "%Y-%m-%d %H:%M:%S")
-                    # 获取记录的月份，优先使用Month列，如果有的话
-                    record_month = first_record.get('Month', record_date.strftime("%Y%m"))
-                    _, record_remainder_days = get_option_expire_day(record_month)
-                    
-                    # 只考虑比目标天数大的记录
-                    if (record_remainder_days > target_days):
-                        days_diff = record_remainder_days - target_days
-                        if (days_diff < min_days_diff):
-                            min_days_diff = days_diff
-                            closest_data = {
-                                'start_of_month_etf_price': float(first_record['ETF Price']),
-                                'selected_call_strike': float(first_record['Call Strike']),
-                                'selected_put_strike': float(first_record['Put Strike']),
-                                'call_contracts': int(first_record['Call Qty']),
-                                'put_contracts': int(first_record['Put Qty']),
-                                'monthly_remainder_cost': int(first_record['Remainder Cost']),
-                                'total_cost': int(first_record['Total Cost']),
-                                'previous_month_final_return': float(first_record['Total Return']) if first_record.get('Total Return') else 0,
-                                'actual_days': record_remainder_days,
-                                'month': first_record.get('Month', record_date.strftime("%Y%m"))
-                            }
-                except Exception as e:
-                    log_to_file(f"处理日期记录时出错: {str(e)}", "ERROR")
-                    continue
+        first_record = index.read_row(closest_entry)
+        closest_data = {
+            'start_of_month_etf_price': float(first_record['ETF Price']),
+            'selected_call_strike': float(first_record['Call Strike']),
+            'selected_put_strike': float(first_record['Put Strike']),
+            'call_contracts': int(first_record['Call Qty']),
+            'put_contracts': int(first_record['Put Qty']),
+            'monthly_remainder_cost': int(first_record['Remainder Cost']),
+            'total_cost': int(first_record['Total Cost']),
+            'previous_month_final_return': float(first_record['Total Return']) if first_record.get('Total Return') else 0,
+            'actual_days': closest_entry.remainder_days,
+            'month': closest_entry.month
+        }
 
-        if (closest_data and verify_historical_data(closest_data, current_month)):
+        if (verify_historical_data(closest_data, current_month)):
             log_to_file(f"找到最接近的历史记录，目标天数: {target_days}，实际天数: {closest_data['actual_days']}")
             return closest_data
 
@@ -1543,11 +1751,12 @@ def find_closest_historical_day(current_month, target_days):
         log_to_file(f"查找最接近历史记录时出错: {str(e)}", "ERROR")
         return None
 
-def verify_restored_data(historical_data, current_codes):
+def verify_restored_data(historical_data, current_codes, month=None):
     """验证恢复的历史数据在当前是否有效
     Args:
         historical_data: 历史数据
         current_codes: 当前可用的期权代码元组 (call_codes, put_codes)
+        month: 合约到期月份，格式YYYYMM，默认当前月份
     Returns:
         bool: 数据是否有效
     """
@@ -1558,26 +1767,17 @@ def verify_restored_data(historical_data, current_codes):
         call_strike = historical_data['selected_call_strike']
         put_strike = historical_data['selected_put_strike']
         
-        call_strikes_available = []
-        put_strikes_available = []
-        
-        # 获取当前所有可用的行权价
-        for code in call_codes:
-            strike = float(get_option_greek_xingquanjia(code))
-            if (strike):
-                call_strikes_available.append(float(strike))
-                
-        for code in put_codes:
-            strike = float(get_option_greek_xingquanjia(code))
-            if (strike):
-                put_strikes_available.append(float(strike))
-        
+        # 当前所有可用的行权价取自期权链缓存
+        if month is None:
+            month = datetime.datetime.now().strftime("%Y%m")
+        chain = get_option_chain(month, call_codes, put_codes)
+
         # 检查历史行权价是否仍然可用
-        if (not any(abs(strike - call_strike) < 0.0001 for strike in call_strikes_available)):
+        if (chain.find(OptionChain.CALL, call_strike) is None):
             log_to_file(f"历史Call行权价 {call_strike} 在当前期权中不可用", "ERROR")
             return False
             
-        if (not any(abs(strike - put_strike) < 0.0001 for strike in put_strikes_available)):
+        if (chain.find(OptionChain.PUT, put_strike) is None):
             log_to_file(f"历史Put行权价 {put_strike} 在当前期权中不可用", "ERROR")
             return False
             
@@ -1615,7 +1815,7 @@ def get_historical_data_with_fallback(current_month, remainder_days, target_days
         # 3. 如果找不到任何历史数据，尝试使用当前状态进行估算
         current_etf_price = float(get_FitfyETF_price())
         if (current_etf_price and validate_price(current_etf_price, 'etf')):
-            call_codes, put_codes = get_option_codes(current_month, underlying='510050')
+            call_codes, put_codes = get_option_codes(current_month, underlying=UNDERLYING_CODE)
             if (call_codes and put_codes):
                 # 使用当前ETF价格作为起始价格
                 estimated_data = {
@@ -1654,8 +1854,9 @@ def start_new_record_cycle(date_str=None):
     # 获取新的文件名
     new_filename = get_csv_filename()
     
-    # 创建新文件
-    create_csv_file()
+    # 创建新文件（SQLite存储时数据库按开始日期命名，首次写入时创建）
+    if (STORAGE_BACKEND == "csv"):
+        create_csv_file()
     
     # 记录日志
     msg = f"已开始新的数据记录周期，使用CSV文件: {new_filename} (开始日期: {CSV_START_DATE})"
@@ -1664,186 +1865,226 @@ def start_new_record_cycle(date_str=None):
     
     return new_filename
 
-# 获取当前月份（格式 YYYYMM）
-current_month = datetime.datetime.now().strftime("%Y%m")
+# 调度器：按交易日历计算下一次唤醒时间（下一个对齐的采样时刻或下一个开盘时刻）
+scheduler = None
+
+def get_scheduler():
+    """获取采样调度器（首次使用时按 TRADING_HOURS、SAMPLING_INTERVAL 创建）"""
+    global scheduler
+    if (scheduler is None):
+        scheduler = TradingScheduler(TRADING_HOURS, is_trading_date, interval=SAMPLING_INTERVAL)
+    return scheduler
+
+def initialize_strategy():
+    """程序启动时加载状态（状态文件无效时从CSV数据恢复），并创建CSV总表文件"""
+    global FIRST_RECORD_MONTH, current_month, csv_filename, previous_month_return_for_total
+    global start_of_month_etf_price, selected_call_strike, selected_put_strike, call_contracts, put_contracts
+    global call_initial_price, put_initial_price, monthly_remainder_cost, total_cost, previous_month_final_return
+    global trading_month, processed_today, start_date, month_switched, monthly_investment_added
+
+    # 按设置启用耗时统计，快照文件以标的的文件名前缀开头
+    _metrics.configure(enabled=METRICS_ENABLED, path_prefix=f"{FILE_PREFIX}_metrics", interval=METRICS_INTERVAL,
+                       labels={'underlying': UNDERLYING})
+
+    # 按所选标的的期权到期日计算实际开始记录的月份
+    FIRST_RECORD_MONTH = calculate_first_record_month()
+    # 获取当前月份（格式 YYYYMM）
+    current_month = datetime.datetime.now().strftime("%Y%m")
 
-# 清理旧状态文件
-# cleanup_old_state_files()  # 已禁用：保留所有历史数据
+    # 清理旧状态文件
+    # cleanup_old_state_files()  # 已禁用：保留所有历史数据
 
-# 清理旧日志文件
-# cleanup_old_log_files()  # 已禁用：保留所有历史数据
+    # 清理旧日志文件
+    # cleanup_old_log_files()  # 已禁用：保留所有历史数据
 
-# 在程序启动时添加日志
-log_to_file(f"程序启动，DAYS_BEFORE_EXPIRY_START={DAYS_BEFORE_EXPIRY_START}")
+    # 在程序启动时添加日志
+    log_to_file(f"程序启动，DAYS_BEFORE_EXPIRY_START={DAYS_BEFORE_EXPIRY_START}")
 
-# 初始化全局变量用于跨月收益计算
-previous_month_return_for_total = 0
-previous_month_final_return = 0  # 用于记录上个月的最终Total Return
+    # 初始化全局变量用于跨月收益计算
+    previous_month_return_for_total = 0
+    previous_month_final_return = 0  # 用于记录上个月的最终Total Return
 
-# 尝试加载上次保存的状态
-saved_state = load_state()
-if (saved_state):
-    try:
-        # 如果存在保存的状态，使用保存的值
-        start_of_month_etf_price = saved_state.get('start_of_month_etf_price')
-        selected_call_strike = tuple(saved_state.get('selected_call_strike')) if (saved_state.get('selected_call_strike')) else None
-        selected_put_strike = tuple(saved_state.get('selected_put_strike')) if (saved_state.get('selected_put_strike')) else None
-        call_contracts = saved_state.get('call_contracts')
-        put_contracts = saved_state.get('put_contracts')
-        call_initial_price = saved_state.get('call_initial_price')
-        put_initial_price = saved_state.get('put_initial_price')
-        monthly_remainder_cost = saved_state.get('monthly_remainder_cost', 0)
-        total_cost = saved_state.get('total_cost', 0)
-        previous_month_final_return = saved_state.get('previous_month_final_return', 0)
-        trading_month = saved_state.get('trading_month')
-        processed_today = saved_state.get('processed_today', False)
-        start_date = datetime.datetime.strptime(saved_state.get('start_date'), "%Y-%m-%d").date()
-        month_switched = False  # 状态文件有效，不需要强制重新选择行权价
-        monthly_investment_added = True  # 已有状态时，假设本月投资已添加
-        
-        print("✅ 已恢复保存的状态:", flush=True)
-        print(f"├─ ETF初始价格: {start_of_month_etf_price}", flush=True)
-        print(f"├─ Call行权价: {selected_call_strike[1] if (selected_call_strike) else None}", flush=True)
-        print(f"├─ Put行权价: {selected_put_strike[1] if (selected_put_strike) else None}", flush=True)
-        print(f"├─ Call合约数: {call_contracts}", flush=True)
-        print(f"├─ Put合约数: {put_contracts}", flush=True)
-        print(f"├─ 余数成本: {monthly_remainder_cost}", flush=True)
-        print(f"└─ 总成本: {total_cost}", flush=True)
-        print(f"└─ 上月基准收益: {previous_month_final_return}", flush=True)
-
-        # 检查是否为跨月情况：total_cost > MONTHLY_INVESTMENT说明已经是跨月了
-        if total_cost > MONTHLY_INVESTMENT:
-            # 跨月情况：从CSV文件读取上个月的最终Total Return
-            previous_month_final_return = get_previous_month_final_return()
-            log_to_file(f"检测到跨月情况，从CSV获取上月最终Total Return = {previous_month_final_return}")
-        
-        # 在状态加载后进行一致性校验
-        if check_csv_data_exists(current_month):
-            print("🔍 发现CSV数据，正在校验状态一致性...")
-            validation_result = validate_state_consistency(saved_state, current_month)
-
-            # 无论是否一致，都检查是否需要补充缺失的字段
-            if "csv_state" in validation_result and validation_result["csv_state"]:
-                csv_state = validation_result["csv_state"]
-
-                # 检查是否需要更新
-                need_update = False
-                update_reasons = []
-
-                # 检查收益相关更新（仅在不一致时）
-                if not validation_result["valid"] and abs(previous_month_final_return - csv_state.get('previous_month_final_return', 0)) > 100:
-                    print(f"🔧 自动更新上月基准收益: {previous_month_final_return} -> {csv_state['previous_month_final_return']}")
-                    previous_month_final_return = csv_state['previous_month_final_return']
-                    need_update = True
-                    update_reasons.append("上月基准收益")
-
-                # 始终检查初始价格是否缺失
-                if call_initial_price is None and csv_state.get('call_initial_price') is not None:
-                    print(f"🔧 自动补充Call初始价格: {csv_state['call_initial_price']}")
-                    call_initial_price = csv_state['call_initial_price']
-                    need_update = True
-                    update_reasons.append("Call初始价格")
-
-                if put_initial_price is None and csv_state.get('put_initial_price') is not None:
-                    print(f"🔧 自动补充Put初始价格: {csv_state['put_initial_price']}")
-                    put_initial_price = csv_state['put_initial_price']
-                    need_update = True
-                    update_reasons.append("Put初始价格")
-
-                # 如果需要更新，保存状态
-                if need_update:
-                    # 保存更新后的状态
-                    updated_state_data = {
-                        'start_of_month_etf_price': start_of_month_etf_price,
-                        'selected_call_strike': list(selected_call_strike) if selected_call_strike else None,
-                        'selected_put_strike': list(selected_put_strike) if selected_put_strike else None,
-                        'call_contracts': call_contracts,
-                        'put_contracts': put_contracts,
-                        'call_initial_price': call_initial_price,
-                        'put_initial_price': put_initial_price,
-                        'monthly_remainder_cost': monthly_remainder_cost,
-                        'total_cost': total_cost,
-                        'previous_month_final_return': previous_month_final_return,
-                        'trading_month': trading_month,
-                        'processed_today': processed_today,
-                        'start_date': start_date.strftime("%Y-%m-%d")
-                    }
-                    save_state(updated_state_data)
-                    print("✅ 状态文件已更新为最新数据")
-                    log_to_file(f"自动更新状态文件: {', '.join(update_reasons)}", "INFO")
-
-            # 显示一致性校验结果
-            if not validation_result["valid"]:
-                print(f"⚠️ 状态不一致: {validation_result['reason']}")
-                if "inconsistencies" in validation_result:
-                    for inconsistency in validation_result["inconsistencies"]:
-                        print(f"  - {inconsistency}")
-                log_to_file(f"状态不一致: {validation_result['reason']}", "WARNING")
-            else:
-                print("✅ 状态一致性校验通过")
-                log_to_file("状态一致性校验通过", "INFO")
-        
-        # 在状态加载后添加日志
-        log_to_file(f"已加载状态文件，当前月份={current_month}, ETF初始价格={start_of_month_etf_price}, " + 
-                    f"Call行权价={selected_call_strike[1] if (selected_call_strike) else None}, " +
-                    f"Put行权价={selected_put_strike[1] if (selected_put_strike) else None}")
-    except Exception as e:
-        print(f"❌ 恢复状态时出错: {str(e)}，将使用初始值")
-        saved_state = None
-        log_to_file(f"恢复状态时出错: {str(e)}，将使用初始值", "ERROR")
+    # 尝试加载上次保存的状态
+    saved_state = load_state()
+    if (saved_state):
+        try:
+            # 如果存在保存的状态，使用保存的值
+            start_of_month_etf_price = saved_state.get('start_of_month_etf_price')
+            selected_call_strike = tuple(saved_state.get('selected_call_strike')) if (saved_state.get('selected_call_strike')) else None
+            selected_put_strike = tuple(saved_state.get('selected_put_strike')) if (saved_state.get('selected_put_strike')) else None
+            call_contracts = saved_state.get('call_contracts')
+            put_contracts = saved_state.get('put_contracts')
+            call_initial_price = saved_state.get('call_initial_price')
+            put_initial_price = saved_state.get('put_initial_price')
+            monthly_remainder_cost = saved_state.get('monthly_remainder_cost', 0)
+            total_cost = saved_state.get('total_cost', 0)
+            previous_month_final_return = saved_state.get('previous_month_final_return', 0)
+            trading_month = saved_state.get('trading_month')
+            processed_today = saved_state.get('processed_today', False)
+            start_date = datetime.datetime.strptime(saved_state.get('start_date'), "%Y-%m-%d").date()
+            month_switched = False  # 状态文件有效，不需要强制重新选择行权价
+            monthly_investment_added = True  # 已有状态时，假设本月投资已添加
+
+            print("✅ 已恢复保存的状态:", flush=True)
+            print(f"├─ ETF初始价格: {start_of_month_etf_price}", flush=True)
+            print(f"├─ Call行权价: {selected_call_strike[1] if (selected_call_strike) else None}", flush=True)
+            print(f"├─ Put行权价: {selected_put_strike[1] if (selected_put_strike) else None}", flush=True)
+            print(f"├─ Call合约数: {call_contracts}", flush=True)
+            print(f"├─ Put合约数: {put_contracts}", flush=True)
+            print(f"├─ 余数成本: {monthly_remainder_cost}", flush=True)
+            print(f"└─ 总成本: {total_cost}", flush=True)
+            print(f"└─ 上月基准收益: {previous_month_final_return}", flush=True)
+
+            # 检查是否为跨月情况：total_cost > MONTHLY_INVESTMENT说明已经是跨月了
+            if total_cost > MONTHLY_INVESTMENT:
+                # 跨月情况：从CSV文件读取上个月的最终Total Return
+                previous_month_final_return = get_previous_month_final_return()
+                log_to_file(f"检测到跨月情况，从CSV获取上月最终Total Return = {previous_month_final_return}")
+
+            # 在状态加载后进行一致性校验
+            if check_csv_data_exists(current_month):
+                print("🔍 发现CSV数据，正在校验状态一致性...")
+                validation_result = validate_state_consistency(saved_state, current_month)
+
+                # 无论是否一致，都检查是否需要补充缺失的字段
+                if "csv_state" in validation_result and validation_result["csv_state"]:
+                    csv_state = validation_result["csv_state"]
+
+                    # 检查是否需要更新
+                    need_update = False
+                    update_reasons = []
+
+                    # 检查收益相关更新（仅在不一致时）
+                    if not validation_result["valid"] and abs(previous_month_final_return - csv_state.get('previous_month_final_return', 0)) > 100:
+                        print(f"🔧 自动更新上月基准收益: {previous_month_final_return} -> {csv_state['previous_month_final_return']}")
+                        previous_month_final_return = csv_state['previous_month_final_return']
+                        need_update = True
+                        update_reasons.append("上月基准收益")
+
+                    # 始终检查初始价格是否缺失
+                    if call_initial_price is None and csv_state.get('call_initial_price') is not None:
+                        print(f"🔧 自动补充Call初始价格: {csv_state['call_initial_price']}")
+                        call_initial_price = csv_state['call_initial_price']
+                        need_update = True
+                        update_reasons.append("Call初始价格")
+
+                    if put_initial_price is None and csv_state.get('put_initial_price') is not None:
+                        print(f"🔧 自动补充Put初始价格: {csv_state['put_initial_price']}")
+                        put_initial_price = csv_state['put_initial_price']
+                        need_update = True
+                        update_reasons.append("Put初始价格")
+
+                    # 如果需要更新，保存状态
+                    if need_update:
+                        # 保存更新后的状态
+                        updated_state_data = {
+                            'start_of_month_etf_price': start_of_month_etf_price,
+                            'selected_call_strike': list(selected_call_strike) if selected_call_strike else None,
+                            'selected_put_strike': list(selected_put_strike) if selected_put_strike else None,
+                            'call_contracts': call_contracts,
+                            'put_contracts': put_contracts,
+                            'call_initial_price': call_initial_price,
+                            'put_initial_price': put_initial_price,
+                            'monthly_remainder_cost': monthly_remainder_cost,
+                            'total_cost': total_cost,
+                            'previous_month_final_return': previous_month_final_return,
+                            'trading_month': trading_month,
+                            'processed_today': processed_today,
+                            'start_date': start_date.strftime("%Y-%m-%d")
+                        }
+                        save_state(updated_state_data)
+                        print("✅ 状态文件已更新为最新数据")
+                        log_to_file(f"自动更新状态文件: {', '.join(update_reasons)}", "INFO")
+
+                # 显示一致性校验结果
+                if not validation_result["valid"]:
+                    print(f"⚠️ 状态不一致: {validation_result['reason']}")
+                    if "inconsistencies" in validation_result:
+                        for inconsistency in validation_result["inconsistencies"]:
+                            print(f"  - {inconsistency}")
+                    log_to_file(f"状态不一致: {validation_result['reason']}", "WARNING")
+                else:
+                    print("✅ 状态一致性校验通过")
+                    log_to_file("状态一致性校验通过", "INFO")
 
-if (not saved_state):
-    # 如果没有保存的状态或状态无效，检查CSV数据是否存在
-    csv_data_exists = check_csv_data_exists(current_month)
-    
-    if csv_data_exists:
-        # 如果CSV中已有当前月份的数据，说明程序之前运行过，需要恢复状态而不是初始化
-        print(f"⚠️ 状态文件丢失但发现CSV中有当前月份 {current_month} 的数据")
-        print("程序将从CSV数据中恢复状态")
-        log_to_file(f"状态文件丢失但发现CSV中有当前月份 {current_month} 的数据，从CSV恢复", "WARNING")
-        
-        # 从CSV数据中恢复状态
-        csv_recovered_state = recover_state_from_csv(current_month)
-        if csv_recovered_state:
-            # 使用从CSV恢复的状态
-            start_of_month_etf_price = csv_recovered_state.get('start_of_month_etf_price')
-            selected_call_strike = tuple(csv_recovered_state.get('selected_call_strike')) if csv_recovered_state.get('selected_call_strike') else None
-            selected_put_strike = tuple(csv_recovered_state.get('selected_put_strike')) if csv_recovered_state.get('selected_put_strike') else None
-            call_contracts = csv_recovered_state.get('call_contracts')
-            put_contracts = csv_recovered_state.get('put_contracts')
-            monthly_remainder_cost = csv_recovered_state.get('monthly_remainder_cost', 0)
-            total_cost = csv_recovered_state.get('total_cost', 0)
-            previous_month_final_return = csv_recovered_state.get('previous_month_final_return', 0)
-            call_initial_price = csv_recovered_state.get('call_initial_price')  # 从CSV恢复的初始价格
-            put_initial_price = csv_recovered_state.get('put_initial_price')   # 从CSV恢复的初始价格
-            trading_month = current_month
-            processed_today = False
-            month_switched = False  # 不强制重新选择行权价
-            monthly_investment_added = True  # 假设已添加投资
-            start_date = datetime.datetime.strptime(csv_recovered_state.get('start_date'), "%Y-%m-%d").date()
-            
-            # 立即保存恢复的状态到JSON文件
-            recovered_state_data = {
-                'start_of_month_etf_price': start_of_month_etf_price,
-                'selected_call_strike': list(selected_call_strike) if selected_call_strike else None,
-                'selected_put_strike': list(selected_put_strike) if selected_put_strike else None,
-                'call_contracts': call_contracts,
-                'put_contracts': put_contracts,
-                'call_initial_price': call_initial_price,
-                'put_initial_price': put_initial_price,
-                'monthly_remainder_cost': monthly_remainder_cost,
-                'total_cost': total_cost,
-                'previous_month_final_return': previous_month_final_return,
-                'trading_month': trading_month,
-                'processed_today': processed_today,
-                'start_date': start_date.strftime("%Y-%m-%d")
-            }
-            save_state(recovered_state_data)
-            print(f"✅ 已从CSV数据恢复状态并保存JSON文件")
-            log_to_file("从CSV数据恢复状态并保存JSON文件成功", "INFO")
+            # 在状态加载后添加日志
+            log_to_file(f"已加载状态文件，当前月份={current_month}, ETF初始价格={start_of_month_etf_price}, " + 
+                        f"Call行权价={selected_call_strike[1] if (selected_call_strike) else None}, " +
+                        f"Put行权价={selected_put_strike[1] if (selected_put_strike) else None}")
+        except Exception as e:
+            print(f"❌ 恢复状态时出错: {str(e)}，将使用初始值")
+            saved_state = None
+            log_to_file(f"恢复状态时出错: {str(e)}，将使用初始值", "ERROR")
+
+    if (not saved_state):
+        # 如果没有保存的状态或状态无效，检查CSV数据是否存在
+        csv_data_exists = check_csv_data_exists(current_month)
+
+        if csv_data_exists:
+            # 如果CSV中已有当前月份的数据，说明程序之前运行过，需要恢复状态而不是初始化
+            print(f"⚠️ 状态文件丢失但发现CSV中有当前月份 {current_month} 的数据")
+            print("程序将从CSV数据中恢复状态")
+            log_to_file(f"状态文件丢失但发现CSV中有当前月份 {current_month} 的数据，从CSV恢复", "WARNING")
+
+            # 从CSV数据中恢复状态
+            csv_recovered_state = recover_state_from_csv(current_month)
+            if csv_recovered_state:
+                # 使用从CSV恢复的状态
+                start_of_month_etf_price = csv_recovered_state.get('start_of_month_etf_price')
+                selected_call_strike = tuple(csv_recovered_state.get('selected_call_strike')) if csv_recovered_state.get('selected_call_strike') else None
+                selected_put_strike = tuple(csv_recovered_state.get('selected_put_strike')) if csv_recovered_state.get('selected_put_strike') else None
+                call_contracts = csv_recovered_state.get('call_contracts')
+                put_contracts = csv_recovered_state.get('put_contracts')
+                monthly_remainder_cost = csv_recovered_state.get('monthly_remainder_cost', 0)
+                total_cost = csv_recovered_state.get('total_cost', 0)
+                previous_month_final_return = csv_recovered_state.get('previous_month_final_return', 0)
+                call_initial_price = csv_recovered_state.get('call_initial_price')  # 从CSV恢复的初始价格
+                put_initial_price = csv_recovered_state.get('put_initial_price')   # 从CSV恢复的初始价格
+                trading_month = current_month
+                processed_today = False
+                month_switched = False  # 不强制重新选择行权价
+                monthly_investment_added = True  # 假设已添加投资
+                start_date = datetime.datetime.strptime(csv_recovered_state.get('start_date'), "%Y-%m-%d").date()
+
+                # 立即保存恢复的状态到JSON文件
+                recovered_state_data = {
+                    'start_of_month_etf_price': start_of_month_etf_price,
+                    'selected_call_strike': list(selected_call_strike) if selected_call_strike else None,
+                    'selected_put_strike': list(selected_put_strike) if selected_put_strike else None,
+                    'call_contracts': call_contracts,
+                    'put_contracts': put_contracts,
+                    'call_initial_price': call_initial_price,
+                    'put_initial_price': put_initial_price,
+                    'monthly_remainder_cost': monthly_remainder_cost,
+                    'total_cost': total_cost,
+                    'previous_month_final_return': previous_month_final_return,
+                    'trading_month': trading_month,
+                    'processed_today': processed_today,
+                    'start_date': start_date.strftime("%Y-%m-%d")
+                }
+                save_state(recovered_state_data)
+                print(f"✅ 已从CSV数据恢复状态并保存JSON文件")
+                log_to_file("从CSV数据恢复状态并保存JSON文件成功", "INFO")
+            else:
+                # 恢复失败，使用保守设置
+                print(f"❌ 从CSV恢复状态失败，使用保守设置")
+                start_of_month_etf_price = None
+                selected_call_strike = None
+                selected_put_strike = None
+                call_contracts = None
+                put_contracts = None
+                call_initial_price = None
+                put_initial_price = None
+                monthly_remainder_cost = 0
+                total_cost = 0
+                previous_month_final_return = 0
+                trading_month = current_month
+                processed_today = False
+                month_switched = False
+                monthly_investment_added = True
+                start_date = datetime.datetime.now().date()
         else:
-            # 恢复失败，使用保守设置
-            print(f"❌ 从CSV恢复状态失败，使用保守设置")
+            # 如果没有保存的状态且CSV中也没有数据，使用初始值
             start_of_month_etf_price = None
             selected_call_strike = None
             selected_put_strike = None
@@ -1854,113 +2095,95 @@ if (not saved_state):
             monthly_remainder_cost = 0
             total_cost = 0
             previous_month_final_return = 0
-            trading_month = current_month
+            trading_month = None
             processed_today = False
-            month_switched = False
-            monthly_investment_added = True
+            month_switched = True   # 【修复】状态验证失败时，强制重新选择行权价，跳过历史数据恢复
+            monthly_investment_added = False  # 初始化月投资标记
             start_date = datetime.datetime.now().date()
-    else:
-        # 如果没有保存的状态且CSV中也没有数据，使用初始值
-        start_of_month_etf_price = None
-        selected_call_strike = None
-        selected_put_strike = None
-        call_contracts = None
-        put_contracts = None
-        call_initial_price = None
-        put_initial_price = None
-        monthly_remainder_cost = 0
-        total_cost = 0
-        previous_month_final_return = 0
-        trading_month = None
-        processed_today = False
-        month_switched = True   # 【修复】状态验证失败时，强制重新选择行权价，跳过历史数据恢复
-        monthly_investment_added = False  # 初始化月投资标记
-        start_date = datetime.datetime.now().date()
-    
-    # 【新增】如果不是第一个月份，检查是否需要从上个月恢复收益
-    # 计算上个月
-    try:
-        year = int(current_month[:4])
-        month = int(current_month[4:])
-        if month == 1:
-            previous_month_str = f"{year-1}12"
-        else:
-            previous_month_str = f"{year}{month-1:02d}"
-    except:
-        previous_month_str = None
-    
-    # 只有在当前月份没有CSV数据时才执行跨月恢复逻辑
-    csv_data_exists = check_csv_data_exists(current_month)
-    if previous_month_str and current_month != FIRST_RECORD_MONTH and not csv_data_exists:
-        #不是第一个记录月份且当前月份没有数据
-        print(f"🔍 检测到{current_month}启动，尝试从{previous_month_str}数据恢复收益...", flush=True)
-        log_to_file(f"检测到{current_month}启动，尝试从{previous_month_str}数据恢复收益", "INFO")
-        
-        # 尝试从CSV总表中获取上个月最后的收益
-        csv_filename = get_csv_filename()
-        if os.path.exists(csv_filename):
-            try:
-                with open(csv_filename, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    # 查找最后一条上个月的数据
-                    for line in reversed(lines):
-                        if previous_month_str in line:
-                            parts = line.strip().split(',')
-                            if len(parts) >= 11:
-                                prev_total_return = int(parts[10])  # Total Return
-                                prev_total_cost = int(parts[9])     # Total Cost
-                                # monthly_remainder_cost保持为0，将在后续计算中正确设置
-                                total_cost = prev_total_cost + MONTHLY_INVESTMENT  # 加上新月份投资
-                                monthly_investment_added = True  # 标记本月投资已添加
-                                previous_month_final_return = prev_total_return  # 保存上月最终收益作为基准
-                                print(f"✅ 从{previous_month_str}恢复收益: {prev_total_return}元, 新总投资: {total_cost}元", flush=True)
-                                log_to_file(f"从{previous_month_str}恢复收益: {prev_total_return}元, 新总投资: {total_cost}元", "INFO")
-                                break
-            except Exception as e:
-                print(f"从{previous_month_str}数据恢复收益失败: {str(e)}", flush=True)
-                log_to_file(f"从{previous_month_str}数据恢复收益失败: {str(e)}", "ERROR")
-    
-    print("⚠️ 使用初始值启动程序", flush=True)
-    log_to_file("未找到有效状态文件，使用初始值", "WARNING")
-
-# 确保 CSV 文件创建，并写入表头（如果文件为空）
-create_csv_file()
 
-# 在程序启动时记录使用的CSV文件名
-csv_filename = get_csv_filename()
-print(f"ℹ️ 使用CSV总表文件: {csv_filename} (开始日期: {CSV_START_DATE})", flush=True)
-log_to_file(f"使用CSV总表文件: {csv_filename} (开始日期: {CSV_START_DATE})", "INFO")
+        # 【新增】如果不是第一个月份，检查是否需要从上个月恢复收益
+        # 计算上个月
+        try:
+            year = int(current_month[:4])
+            month = int(current_month[4:])
+            if month == 1:
+                previous_month_str = f"{year-1}12"
+            else:
+                previous_month_str = f"{year}{month-1:02d}"
+        except:
+            previous_month_str = None
+
+        # 只有在当前月份没有CSV数据时才执行跨月恢复逻辑
+        csv_data_exists = check_csv_data_exists(current_month)
+        if previous_month_str and current_month != FIRST_RECORD_MONTH and not csv_data_exists:
+            #不是第一个记录月份且当前月份没有数据
+            print(f"🔍 检测到{current_month}启动，尝试从{previous_month_str}数据恢复收益...", flush=True)
+            log_to_file(f"检测到{current_month}启动，尝试从{previous_month_str}数据恢复收益", "INFO")
+
+            # 尝试从总表（CSV索引或SQLite存储）中获取上个月最后的收益
+            csv_filename = get_csv_filename()
+            if (STORAGE_BACKEND == "sqlite" or os.path.exists(csv_filename)):
+                try:
+                    last_row = get_master_index().last_of_month(previous_month_str)
+                    if last_row is not None:
+                        prev_total_return = int(float(last_row['Total Return']))
+                        prev_total_cost = int(float(last_row['Total Cost']))
+                        # monthly_remainder_cost保持为0，将在后续计算中正确设置
+                        total_cost = prev_total_cost + MONTHLY_INVESTMENT  # 加上新月份投资
+                        monthly_investment_added = True  # 标记本月投资已添加
+                        previous_month_final_return = prev_total_return  # 保存上月最终收益作为基准
+                        print(f"✅ 从{previous_month_str}恢复收益: {prev_total_return}元, 新总投资: {total_cost}元", flush=True)
+                        log_to_file(f"从{previous_month_str}恢复收益: {prev_total_return}元, 新总投资: {total_cost}元", "INFO")
+                except Exception as e:
+                    print(f"从{previous_month_str}数据恢复收益失败: {str(e)}", flush=True)
+                    log_to_file(f"从{previous_month_str}数据恢复收益失败: {str(e)}", "ERROR")
+
+        print("⚠️ 使用初始值启动程序", flush=True)
+        log_to_file("未找到有效状态文件，使用初始值", "WARNING")
+
+    # 确保 CSV 文件创建，并写入表头（如果文件为空）；SQLite存储时CSV按需导出，不创建
+    csv_filename = get_csv_filename()
+    if (STORAGE_BACKEND == "sqlite"):
+        db_filename = get_trade_store().db_path
+        print(f"ℹ️ 使用SQLite数据库: {db_filename} (开始日期: {CSV_START_DATE})", flush=True)
+        log_to_file(f"使用SQLite数据库: {db_filename} (开始日期: {CSV_START_DATE})", "INFO")
+    else:
+        create_csv_file()
+        print(f"ℹ️ 使用CSV总表文件: {csv_filename} (开始日期: {CSV_START_DATE})", flush=True)
+        log_to_file(f"使用CSV总表文件: {csv_filename} (开始日期: {CSV_START_DATE})", "INFO")
 
-# 无限循环，每隔 1 分钟运行一次
-while (True):
+@_metrics.timed("tick")
+def run_tick(now=None):
+    """处理一个采样时刻：判断交易时段、换月、初始化合约并记录交易数据
+    Args:
+        now: 本轮的采样时刻，默认取当前时间
+    Returns:
+        bool: 刚恢复或估算初始化了合约、需要立即再处理一次时返回True
+    """
+    global current_month, csv_filename
+    global start_of_month_etf_price, selected_call_strike, selected_put_strike, call_contracts, put_contracts
+    global call_initial_price, put_initial_price, monthly_remainder_cost, total_cost, previous_month_final_return
+    global trading_month, processed_today, month_switched, monthly_investment_added
     try:
-        # 获取当前时间
-        now = datetime.datetime.now()
+        # 获取当前时间（唤醒时刻已按采样间隔对齐）
+        if (now is None):
+            now = datetime.datetime.now()
         current_date = now.date()
-        current_hour, current_minute = now.hour, now.minute
+        calendar = get_trading_calendar()
 
-        # **判断是否为交易日**
-        weekday = now.weekday()  # 0=周一, 6=周日
-        is_holiday = now.strftime("%Y-%m-%d") in Holiday
-        is_trading_day = weekday < 5 and not is_holiday  # 周一到周五 & 非节假日
-
-        if (not is_trading_day):
-            print(f"📅 {current_date} 不是交易日，程序休眠 1 小时...", flush=True)
-            log_to_file(f"{current_date} 不是交易日，程序休眠 1 小时...", "INFO")
-            time.sleep(3600)  # 休眠 1 小时，直到进入交易日
-            continue  # 跳过本次循环
+        # **判断是否为交易日**（周一到周五且不在休市安排中）
+        if (not calendar.is_trading_day(now)):
+            next_open = get_scheduler().next_session_open(now)
+            print(f"📅 {current_date} 不是交易日，程序休眠至下一个开盘时刻 {next_open}...", flush=True)
+            log_to_file(f"{current_date} 不是交易日，程序休眠至下一个开盘时刻 {next_open}...", "INFO")
+            return False  # 由调用方休眠到下一个交易日开盘
 
         # **检查是否在交易时段**
-        is_trading_time = any(
-            (start_h, start_m) <= (current_hour, current_minute) <= (end_h, end_m)
-            for start_h, start_m, end_h, end_m in TRADING_HOURS
-        )
-
-        if (not is_trading_time):
-            print(f"⏳ 当前时间 {now.strftime('%H:%M:%S')} 不在交易时段，等待中...", flush=True)
-            log_to_file(f"当前时间 {now.strftime('%H:%M:%S')} 不在交易时段，等待中...", "INFO")
-            time.sleep(60)  # 休眠 1 分钟，直到进入交易时段
-            continue  # 跳过本次循环
+        if (not calendar.is_session_time(now)):
+            next_open = get_scheduler().next_session_open(now)
+            print(f"⏳ 当前时间 {now.strftime('%H:%M:%S')} 不在交易时段，休眠至 {next_open}...", flush=True)
+            log_to_file(f"当前时间 {now.strftime('%H:%M:%S')} 不在交易时段，休眠至 {next_open}...", "INFO")
+            return False  # 由调用方休眠到下一个交易时段开盘
 
         # 计算程序运行天数
         # 总表使用CSV开始日期作为基准
@@ -1976,8 +2199,7 @@ while (True):
         if (next_month is None):
             print("无法计算下一月份，等待重试...")
             log_to_file("无法计算下一月份，等待重试...", "ERROR")
-            time.sleep(60)
-            continue
+            return False
 
         # **每天 00:00 重置 processed_today，确保新一天可以进入分支**
         if (current_date != start_date):
@@ -2018,8 +2240,7 @@ while (True):
         if (remainder_days is None and next_month_remainder_days is None):
             print("获取期权到期日失败，等待下一次重试...", flush=True)
             log_to_file("获取期权到期日失败，等待下一次重试...", "ERROR")
-            time.sleep(60)
-            continue
+            return False
 
         # 确定是否开始和停止记录
         start_recording = should_start_recording(remainder_days, next_month_remainder_days)
@@ -2154,16 +2375,15 @@ while (True):
                 
                 if (historical_data):
                     # 获取当前可用的期权代码
-                    call_codes, put_codes = get_option_codes(current_month, underlying='510050')
+                    call_codes, put_codes = get_option_codes(current_month, underlying=UNDERLYING_CODE)
                     if (not call_codes or not put_codes):
                         log_to_file("获取期权代码失败", "ERROR")
                         print("获取期权代码失败，等待下一次重试...", flush=True)
-                        time.sleep(60)
-                        continue
+                        return False
                         
                     if (data_type in ['exact', 'closest']):
                         # 验证恢复的数据在当前是否有效
-                        if (verify_restored_data(historical_data, (call_codes, put_codes))):
+                        if (verify_restored_data(historical_data, (call_codes, put_codes), current_month)):
                             # 使用历史数据
                             start_of_month_etf_price = historical_data['start_of_month_etf_price']
                             
@@ -2171,21 +2391,10 @@ while (True):
                             call_strike_target = historical_data['selected_call_strike']
                             put_strike_target = historical_data['selected_put_strike']
                             
-                            selected_call_strike = None
-                            selected_put_strike = None
-                            
-                            # 查找对应的期权代码
-                            for code in call_codes:
-                                strike = float(get_option_greek_xingquanjia(code))
-                                if (abs(strike - call_strike_target) < 0.0001):
-                                    selected_call_strike = (code, strike)
-                                    break
-                            
-                            for code in put_codes:
-                                strike = float(get_option_greek_xingquanjia(code))
-                                if (abs(strike - put_strike_target) < 0.0001):
-                                    selected_put_strike = (code, strike)
-                                    break
+                            # 查找对应的期权代码（行权价取自期权链缓存）
+                            chain = get_option_chain(current_month, call_codes, put_codes)
+                            selected_call_strike = chain.find(OptionChain.CALL, call_strike_target)
+                            selected_put_strike = chain.find(OptionChain.PUT, put_strike_target)
                             
                             if (selected_call_strike and selected_put_strike):
                                 call_contracts = historical_data['call_contracts']
@@ -2218,7 +2427,7 @@ while (True):
                                     'data_source': data_type
                                 }
                                 save_state(state_data)
-                                continue  # 跳过后续的初始化逻辑
+                                return True  # 跳过后续的初始化逻辑，立即按恢复的合约记录
                             
                     elif (data_type == 'estimated'):
                         log_to_file("使用估算数据初始化合约")
@@ -2226,7 +2435,8 @@ while (True):
                         result = initialize_contracts(
                             historical_data['start_of_month_etf_price'],
                             call_codes,
-                            put_codes
+                            put_codes,
+                            month=current_month
                         )
                         if (result):
                             selected_call_strike, selected_put_strike, call_contracts, put_contracts, monthly_remainder_cost = result
@@ -2263,56 +2473,35 @@ while (True):
                                 
                                 if call_price is not None and put_price is not None:
                                     # 计算初始总收益
-                                    initial_total_return = int((call_contracts * call_price * 10000) + 
-                                                            (put_contracts * put_price * 10000) + 
-                                                            monthly_remainder_cost)
+                                    initial_total_return = int(option_math.position_value(call_contracts, call_price, put_contracts, put_price) +
+                                                               monthly_remainder_cost)
                                     
                                     # 计算初始年化收益率（使用总运行天数）
                                     initial_annual_return = 0.0
                                     if total_cost > 0 and total_days_running > 0:
-                                        initial_annual_return = round(((initial_total_return / total_cost - 1) / total_days_running * 365) * 100, 4)
+                                        initial_annual_return = round(option_math.annualized_return(initial_total_return, total_cost, total_days_running), 4)
                                       # 将初始化数据同时写入总表和月度分表
                                     current_datetime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                    current_month_csv = f"option_trading_{current_month}.csv"
+                                    current_month_csv = f"{FILE_PREFIX}_{current_month}.csv"
                                     
-                                    # 1. 写入总表数据（英文表头，包含月份字段）
-                                    with open(csv_filename, 'a', newline='', encoding='utf-8') as file:
-                                        writer = csv.writer(file)
-                                        writer.writerow([
-                                            current_datetime,
-                                            start_of_month_etf_price,
-                                            selected_call_strike[1],
-                                            selected_put_strike[1],
-                                            call_price,
-                                            put_price,
-                                            call_contracts,
-                                            put_contracts,
-                                            monthly_remainder_cost,
-                                            total_cost,
-                                            initial_total_return,
-                                            f"{initial_annual_return}%",
-                                            current_month
-                                        ])
-                                        file.flush()
-                                    
-                                    # 2. 写入月度分表数据（中文表头，无月份字段）
-                                    with open(current_month_csv, 'a', newline='', encoding='utf-8') as file:
-                                        writer = csv.writer(file)
-                                        writer.writerow([
-                                            current_datetime,
-                                            start_of_month_etf_price,
-                                            selected_call_strike[1],
-                                            selected_put_strike[1],
-                                            call_price,
-                                            put_price,
-                                            call_contracts,
-                                            put_contracts,
-                                            monthly_remainder_cost,
-                                            total_cost,
-                                            initial_total_return,
-                                            f"{initial_annual_return}%"
-                                        ])
-                                        file.flush()
+                                    # 1. 写入总表数据（英文表头，包含月份字段），同步更新索引
+                                    initial_values = [
+                                        current_datetime,
+                                        start_of_month_etf_price,
+                                        selected_call_strike[1],
+                                        selected_put_strike[1],
+                                        call_price,
+                                        put_price,
+                                        call_contracts,
+                                        put_contracts,
+                                        monthly_remainder_cost,
+                                        total_cost,
+                                        initial_total_return,
+                                        f"{initial_annual_return}%"
+                                    ]
+                                    # 总表（英文表头，包含月份字段）和月度分表（中文表头，无月份字段）
+                                    record_trade_row(initial_values + [current_month], initial_values,
+                                                     remainder_days, state_data)
                                     
                                     log_to_file(f"已将初始化数据同时写入总表和月度分表: {csv_filename} 和 {current_month_csv}", "INFO")
                             except Exception as e:
@@ -2323,7 +2512,7 @@ while (True):
                             print(f"├─ Call 合约数: {call_contracts}, Put 合约数: {put_contracts}", flush=True)
                         print(f"├─ 余数成本: {monthly_remainder_cost}", flush=True)
                         print(f"└─ 总成本: {total_cost}", flush=True)
-                        continue
+                        return True
             
                 log_to_file("无法恢复或估算历史数据，将使用正常初始化流程", "WARNING")
 
@@ -2337,8 +2526,7 @@ while (True):
             if (current_etf_price is None):
                 log_to_file("获取ETF价格失败", "ERROR")
                 print("获取ETF价格失败，等待下一次重试...", flush=True)
-                time.sleep(60)
-                continue
+                return False
 
             # 如果是在DAYS_BEFORE_EXPIRY_START之后启动，使用当前ETF价格
             if (start_of_month_etf_price is None):
@@ -2346,20 +2534,18 @@ while (True):
                 log_to_file(f"使用当前ETF价格 {start_of_month_etf_price} 作为初始价格")
 
             # 获取期权代码
-            call_codes, put_codes = get_option_codes(current_month, underlying='510050')
+            call_codes, put_codes = get_option_codes(current_month, underlying=UNDERLYING_CODE)
             if (not call_codes or not put_codes):
                 log_to_file("获取期权代码失败", "ERROR")
                 print("获取期权代码失败，等待下一次重试...", flush=True)
-                time.sleep(60)
-                continue
+                return False
 
             # 初始化合约信息
-            result = initialize_contracts(start_of_month_etf_price, call_codes, put_codes)
+            result = initialize_contracts(start_of_month_etf_price, call_codes, put_codes, month=current_month)
             if (result is None):
                 log_to_file("初始化合约信息失败", "ERROR")
                 print("初始化合约信息失败，等待下一次重试...", flush=True)
-                time.sleep(60)
-                continue
+                return False
 
             selected_call_strike, selected_put_strike, call_contracts, put_contracts, new_monthly_remainder_cost = result
             
@@ -2406,8 +2592,13 @@ while (True):
                 log_to_file("换月初始化完成，重置换月标志", "INFO")
 
         # **在 `DAYS_BEFORE_EXPIRY_START` 这天，记录 ETF 价格**
+        # 已选定行权价时使用本轮并发获取的ETF价格，否则在选择行权价时获取
+        start_etf_from_tick = False
         if (remainder_days == DAYS_BEFORE_EXPIRY_START and not processed_today):
-            start_of_month_etf_price = float(get_FitfyETF_price())  # 记录本月初 ETF 价格
+            if (selected_call_strike is None):
+                start_of_month_etf_price = None
+            else:
+                start_etf_from_tick = True
             processed_today = True # 标记当天已处理
             is_first_run_today = True  # 标记今天第一次运行    
 
@@ -2421,36 +2612,29 @@ while (True):
             print("---- 开始记录交易数据 ----", flush=True)
             log_to_file("开始记录交易数据", "INFO")
 
-            # 获取 ETF 价格，添加错误处理
-            etf_price = get_FitfyETF_price()
-            if (etf_price is None):
-                log_to_file("获取ETF价格失败", "ERROR")
-                print("获取ETF价格失败，等待下一次重试...", flush=True)
-                time.sleep(60)
-                continue
-            etf_price = float(etf_price)
-
             # **确保 `selected_call_strike` 始终有值**
             if (selected_call_strike is None):
                 if (start_of_month_etf_price is None):
-                    start_of_month_etf_price = etf_price  # **如果 `start_of_month_etf_price` 还没有记录，则用当前 ETF 价格**
+                    # **如果 `start_of_month_etf_price` 还没有记录，则用当前 ETF 价格**
+                    # （只在需要选择行权价时单独请求ETF价格，平时ETF价格随期权价格一起并发获取）
+                    etf_price = get_FitfyETF_price()
+                    if (etf_price is None):
+                        log_to_file("获取ETF价格失败", "ERROR")
+                        print("获取ETF价格失败，等待下一次重试...", flush=True)
+                        return False
+                    start_of_month_etf_price = float(etf_price)
                 etf_price = start_of_month_etf_price  # **使用 `DAYS_BEFORE_EXPIRY_START` 记录的 ETF 价格**
 
-                # **重新计算虚两档行权价**
-                call_codes, put_codes = get_option_codes(current_month, underlying='510050')
-
-                call_strike_prices = [(code, float(get_option_greek_xingquanjia(code))) for code in call_codes]
-                put_strike_prices = [(code, float(get_option_greek_xingquanjia(code))) for code in put_codes]
-
-                # 找到最接近 ETF 价格的 ATM 行权价
-                atm_call = min(call_strike_prices, key=lambda x: abs(x[1] - etf_price))
-                atm_put = min(put_strike_prices, key=lambda x: abs(x[1] - etf_price))
-
-                # 选择 ATM 之上的第二档 Call 期权（虚两档）
-                selected_call_strike = sorted([s for s in call_strike_prices if s[1] > atm_call[1]], key=lambda x: x[1])[1]
-
-                # 选择 ATM 之下的第二档 Put 期权（虚两档）
-                selected_put_strike = sorted([s for s in put_strike_prices if s[1] < atm_put[1]], key=lambda x: -x[1])[1]
+                # **重新计算虚值行权价**（与 initialize_contracts 使用同一个期权链阶梯）
+                call_codes, put_codes = get_option_codes(current_month, underlying=UNDERLYING_CODE)
+                selection = get_option_chain(current_month, call_codes, put_codes).select_otm(
+                    etf_price, CALL_OTM_LEVEL, PUT_OTM_LEVEL)
+                if (selection.call is None or selection.put is None):
+                    log_to_file(f"选择虚值行权价失败: ETF={etf_price}, 平值={selection.atm}", "ERROR")
+                    print("选择虚值行权价失败，等待下一次重试...", flush=True)
+                    return False
+                selected_call_strike = selection.call
+                selected_put_strike = selection.put
 
                 # 保存状态到文件
                 state_data = {
@@ -2470,27 +2654,40 @@ while (True):
                 }
                 save_state(state_data)
 
+            # **每一分钟使用固定行权价，并发获取最新的Call、Put和ETF价格**
+            # 三条腿同时请求，记录的价格时间上更接近；多标的模式下由预取的批量请求提供
+            call_option_price, put_option_price, etf_price = get_tick_prices(
+                selected_call_strike[0],
+                selected_put_strike[0]
+            )
+
+            if call_option_price is None or put_option_price is None:
+                print("获取最新期权价格失败，等待下一次重试...", flush=True)
+                log_to_file("获取最新期权价格失败，等待下一次重试...", "ERROR")
+                return False
+
             # **确保 `DAYS_BEFORE_EXPIRY_START` 这天重新计算合约数量**
             if (is_first_run_today):
-                # **计算并固定合约数量**
-                call_price_at_start, put_price_at_start = verify_and_get_option_prices(
-                    selected_call_strike[0],
-                    selected_put_strike[0],
-                    max_retries=5,  # 增加重试次数
-                    retry_delay=3   # 增加重试延迟
-                )
-
-                if call_price_at_start is None or put_price_at_start is None:
+                # **按本轮获取的价格计算并固定合约数量**，不再单独请求期权价格
+                call_price_at_start, put_price_at_start = call_option_price, put_option_price
+                if (not validate_price(call_price_at_start) or not validate_price(put_price_at_start)):
                     print("获取期权初始价格失败，等待下一次重试...", flush=True)
                     log_to_file("获取期权初始价格失败，等待下一次重试...", "ERROR")
-                    time.sleep(60)
-                    continue
+                    return False
+
+                if (start_etf_from_tick):
+                    if (not validate_price(etf_price, price_type='etf')):
+                        print(f"ETF价格数据异常: {etf_price}，等待下一次重试...", flush=True)
+                        log_to_file(f"ETF价格数据异常: {etf_price}，等待下一次重试...", "ERROR")
+                        return False
+                    start_of_month_etf_price = float(etf_price)  # 记录本月初 ETF 价格
 
-                call_contracts = int(CALL_INVESTMENT // (call_price_at_start * 10000))
-                put_contracts = int(PUT_INVESTMENT // (put_price_at_start * 10000))
+                call_contracts = int(option_math.contract_count(CALL_INVESTMENT, call_price_at_start))
+                put_contracts = int(option_math.contract_count(PUT_INVESTMENT, put_price_at_start))
 
                 # **计算当月余数成本（整数）**
-                current_month_remainder = int(MONTHLY_INVESTMENT - (call_contracts * call_price_at_start * 10000 + put_contracts * put_price_at_start * 10000))
+                current_month_remainder = int(option_math.remainder_cost(MONTHLY_INVESTMENT, call_contracts, call_price_at_start,
+                                                                         put_contracts, put_price_at_start))
 
                 if monthly_remainder_cost == 0:  # 新程序启动
                     monthly_remainder_cost = current_month_remainder
@@ -2528,51 +2725,33 @@ while (True):
                 }
                 save_state(state_data)
 
-            # **之后的每一分钟，使用固定行权价和合约数量，仅更新最新期权价格**
-            call_option_price, put_option_price = verify_and_get_option_prices(
-                selected_call_strike[0],
-                selected_put_strike[0]
-            )
-
-            if call_option_price is None or put_option_price is None:
-                print("获取最新期权价格失败，等待下一次重试...", flush=True)
-                log_to_file("获取最新期权价格失败，等待下一次重试...", "ERROR")
-                time.sleep(60)
-                continue
-
-            # 获取 ETF 最新价格(ETF价格有可能被修改，这里需要刷新)
-            etf_price = float(get_FitfyETF_price()) 
-
-            # 验证ETF价格
-            if (not validate_price(etf_price, price_type='etf')):
-                print(f"ETF价格数据异常: {etf_price}，等待下一次重试...", flush=True)
-                log_to_file(f"ETF价格数据异常: {etf_price}，等待下一次重试...", "ERROR")
-                time.sleep(60)
-                continue
-
-            # 验证期权价格
-            if (not validate_price(call_option_price) or not validate_price(put_option_price)):
-                print(f"期权价格数据异常: Call={call_option_price}, Put={put_option_price}，等待下一次重试...", flush=True)
-                log_to_file(f"期权价格数据异常: Call={call_option_price}, Put={put_option_price}，等待下一次重试...", "ERROR")
-                time.sleep(60)
-                continue
-
-            # 验证合约数量
-            if (not validate_contracts(call_contracts) or not validate_contracts(put_contracts)):
-                print(f"合约数量异常: Call={call_contracts}, Put={put_contracts}，等待下一次重试...", flush=True)
-                log_to_file(f"合约数量异常: Call={call_contracts}, Put={put_contracts}，等待下一次重试...", "ERROR")
-                time.sleep(60)
-                continue
-
-            # 验证成本和收益
-            if (total_cost <= 0 or previous_month_final_return < 0):
-                print(f"成本或收益数据异常: 成本={total_cost}, 上月基准收益={previous_month_final_return}，等待下一次重试...", flush=True)
-                log_to_file(f"成本或收益数据异常: 成本={total_cost}, 上月基准收益={previous_month_final_return}，等待下一次重试...", "ERROR")
-                time.sleep(60)
-                continue
+            with _metrics.stage("validate"):
+                # 验证ETF价格
+                if (not validate_price(etf_price, price_type='etf')):
+                    print(f"ETF价格数据异常: {etf_price}，等待下一次重试...", flush=True)
+                    log_to_file(f"ETF价格数据异常: {etf_price}，等待下一次重试...", "ERROR")
+                    return False
+
+                # 验证期权价格
+                if (not validate_price(call_option_price) or not validate_price(put_option_price)):
+                    print(f"期权价格数据异常: Call={call_option_price}, Put={put_option_price}，等待下一次重试...", flush=True)
+                    log_to_file(f"期权价格数据异常: Call={call_option_price}, Put={put_option_price}，等待下一次重试...", "ERROR")
+                    return False
+
+                # 验证合约数量
+                if (not validate_contracts(call_contracts) or not validate_contracts(put_contracts)):
+                    print(f"合约数量异常: Call={call_contracts}, Put={put_contracts}，等待下一次重试...", flush=True)
+                    log_to_file(f"合约数量异常: Call={call_contracts}, Put={put_contracts}，等待下一次重试...", "ERROR")
+                    return False
+
+                # 验证成本和收益
+                if (total_cost <= 0 or previous_month_final_return < 0):
+                    print(f"成本或收益数据异常: 成本={total_cost}, 上月基准收益={previous_month_final_return}，等待下一次重试...", flush=True)
+                    log_to_file(f"成本或收益数据异常: 成本={total_cost}, 上月基准收益={previous_month_final_return}，等待下一次重试...", "ERROR")
+                    return False
 
             # 计算当前期权价值
-            current_option_value = int((call_contracts * call_option_price * 10000) + (put_contracts * put_option_price * 10000))
+            current_option_value = int(option_math.position_value(call_contracts, call_option_price, put_contracts, put_option_price))
 
             # 当月余数成本使用状态文件中的固定值，不重新计算
             # monthly_remainder_cost 已经从状态文件中读取，保持不变
@@ -2586,45 +2765,54 @@ while (True):
 
             # 计算总表年化收益率（按总天数计算，百分比显示）
             if (total_cost > 0 and total_days_running > 0):
-                annualized_return = round(((master_total_return / total_cost - 1) / total_days_running * 365) * 100, 4)
+                annualized_return = round(option_math.annualized_return(master_total_return, total_cost, total_days_running), 4)
             else:
                 annualized_return = 0.0
 
             # 计算当月年化收益率（按当月天数计算，百分比显示）
             # current_month_days 已在前面计算
             if (MONTHLY_INVESTMENT > 0 and current_month_days > 0):
-                monthly_annualized_return = round(((monthly_total_return / MONTHLY_INVESTMENT - 1) / current_month_days * 365) * 100, 4)
+                monthly_annualized_return = round(option_math.annualized_return(monthly_total_return, MONTHLY_INVESTMENT, current_month_days), 4)
             else:
                 monthly_annualized_return = 0.0
             
             # 获取当前CSV总表文件名
             csv_filename = get_csv_filename()            
-            # 记录数据 - 同时写入总表和月度分表
-            current_datetime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            current_month_csv = f"option_trading_{current_month}.csv"
+            # 记录数据 - 同时写入总表和月度分表（使用本轮的采样时刻作为时间戳）
+            current_datetime = now.strftime("%Y-%m-%d %H:%M:%S")
+            current_month_csv = f"{FILE_PREFIX}_{current_month}.csv"
             
             try:
-                # 1. 写入总表数据（英文表头，包含月份字段）
-                with open(csv_filename, 'a', newline='', encoding='utf-8') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([current_datetime, etf_price, selected_call_strike[1], selected_put_strike[1],
-                                     call_option_price, put_option_price, call_contracts, put_contracts, 
-                                     monthly_remainder_cost, total_cost, master_total_return, f"{annualized_return}%", current_month])
-                    file.flush()  # 立即写入文件
-                
-                # 2. 写入月度分表数据（中文表头，无月份字段）
                 # 单月CSV中使用当月投资成本和当月年化收益率
                 monthly_total_cost = MONTHLY_INVESTMENT
-                with open(current_month_csv, 'a', newline='', encoding='utf-8') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([current_datetime, etf_price, selected_call_strike[1], selected_put_strike[1],
-                                     call_option_price, put_option_price, call_contracts, put_contracts, 
-                                     monthly_remainder_cost, monthly_total_cost, monthly_total_return, f"{monthly_annualized_return}%"])
-                    file.flush()  # 立即写入文件
+                tick_values = [current_datetime, etf_price, selected_call_strike[1], selected_put_strike[1],
+                               call_option_price, put_option_price, call_contracts, put_contracts, monthly_remainder_cost]
+                # 当前状态快照，SQLite存储时与数据行在同一事务中提交
+                state_data = {
+                    'start_of_month_etf_price': start_of_month_etf_price,
+                    'selected_call_strike': selected_call_strike,
+                    'selected_put_strike': selected_put_strike,
+                    'call_contracts': call_contracts,
+                    'put_contracts': put_contracts,
+                    'call_initial_price': call_initial_price,
+                    'put_initial_price': put_initial_price,
+                    'monthly_remainder_cost': monthly_remainder_cost,
+                    'total_cost': total_cost,
+                    'previous_month_final_return': previous_month_final_return,
+                    'trading_month': trading_month,
+                    'processed_today': processed_today,
+                    'start_date': start_date.strftime("%Y-%m-%d")
+                }
+                record_trade_row(
+                    tick_values + [total_cost, master_total_return, f"{annualized_return}%", current_month],
+                    tick_values + [monthly_total_cost, monthly_total_return, f"{monthly_annualized_return}%"],
+                    remainder_days, state_data)
                 
                 print(f"✅ 交易数据已同时写入总表和月度分表 - Call: {call_option_price}, Put: {put_option_price}, 总表年化收益率: {round(annualized_return, 4)}, 当月年化收益率: {round(monthly_annualized_return, 4)}", flush=True)
-                log_to_file(f"交易数据已同时写入 {csv_filename} 和 {current_month_csv} - Call: {call_option_price}, Put: {put_option_price}, 总表年化收益率: {round(annualized_return, 4)}, 当月年化收益率: {round(monthly_annualized_return, 4)}", "INFO")
-            except (IOError, OSError) as e:
+                log_to_file("交易数据已同时写入 %s 和 %s - Call: %s, Put: %s, 总表年化收益率: %s, 当月年化收益率: %s", "INFO",
+                            csv_filename, current_month_csv, call_option_price, put_option_price,
+                            round(annualized_return, 4), round(monthly_annualized_return, 4))
+            except (IOError, OSError, sqlite3.Error) as e:
                 print(f"写入CSV文件失败: {str(e)}", flush=True)
                 log_to_file(f"写入CSV文件失败: {str(e)}", "ERROR")
                 time.sleep(5)  # 失败后等待5秒
@@ -2634,11 +2822,28 @@ while (True):
             log_to_file("到达期权到期前一天，停止记录交易数据", "WARNING")
 
     except Exception as e:
+        _metrics.record_error("tick", e)
         print(f"程序运行出错: {str(e)}", flush=True)
         log_to_file(f"程序运行出错: {str(e)}", "ERROR")
-        time.sleep(60)  # 发生错误后等待1分钟再重试
 
-    print("🔄 程序休眠 1 分钟...", flush=True)
-    log_to_file("程序休眠 1 分钟...", "INFO")
-    time.sleep(60)  # 休眠 1 分钟（60 秒）
+    return False
+
+def main():
+    """单标的运行入口：初始化后在每个采样时刻处理一次"""
+    initialize_strategy()
+
+    # 无限循环，每个采样时刻运行一次
+    while (True):
+        if (run_tick()):
+            continue
+        write_metrics()
+
+        # 休眠到下一个采样时刻（按整点对齐，扣除本轮处理耗时）
+        next_wakeup, wakeup_reason = get_scheduler().next_wakeup()
+        print(f"🔄 程序休眠至 {next_wakeup} ({wakeup_reason})...", flush=True)
+        log_to_file("程序休眠至 %s (%s)...", "INFO", next_wakeup, wakeup_reason)
+        flush_before_sleep(next_wakeup)
+        get_scheduler().wait_next()
 
+if __name__ == "__main__":
+    main()
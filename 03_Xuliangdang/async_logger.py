@@ -0,0 +1,214 @@
+"""
+后台线程日志写入器
+
+调用方只把 (时间戳, 级别, 消息, 参数) 放入队列就返回，格式化和写文件都在后台线程中完成：
+- 级别过滤：低于设定级别的日志在入队前直接丢弃，不做任何字符串格式化
+- 批量写入：后台线程一次取出队列中的全部日志合并写入
+- 文件轮转：按大小（max_bytes）或按天（rotate_daily）把当前文件改名为带时间后缀的文件，可选gzip压缩
+"""
+import atexit
+import datetime
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+# 后台线程等待新日志的最长时间（秒），超时后也会检查按天轮转
+FLUSH_INTERVAL = 1.0
+
+# 单次批量写入的最大条数
+BATCH_SIZE = 500
+
+_STOP = object()
+
+
+class AsyncFileLogger:
+    """通过队列交给后台线程写入的日志器"""
+
+    def __init__(self, filename_fn, level="INFO", max_bytes=None, rotate_daily=False,
+                 compress_rotated=False, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        """
+        Args:
+            filename_fn: 根据日志时间生成日志文件名的函数 filename_fn(datetime) -> str
+            level: 最低记录级别
+            max_bytes: 单个日志文件的最大字节数，超过时轮转，None表示不按大小轮转
+            rotate_daily: 是否每天轮转一次
+            compress_rotated: 是否gzip压缩轮转出的文件
+            batch_size: 单次批量写入的最大条数
+            flush_interval: 后台线程等待新日志的最长时间（秒）
+        """
+        self.filename_fn = filename_fn
+        self.level = LEVELS.get(level, LEVELS["INFO"])
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress_rotated = compress_rotated
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # SimpleQueue 的 put 不经过条件变量，不会阻塞调用方
+        self.queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._day = None
+        self._size = 0
+
+    def set_level(self, level):
+        self.level = LEVELS.get(level, self.level)
+
+    def enabled(self, level):
+        """判断该级别的日志是否会被记录"""
+        return LEVELS.get(level, LEVELS["INFO"]) >= self.level
+
+    def log(self, message, level="INFO", *args):
+        """记录一条日志，args 不为空时在后台线程中按 message % args 格式化
+        Args:
+            message: 日志消息
+            level: 日志级别 (DEBUG, INFO, WARNING, ERROR)
+            args: 延迟格式化的参数
+        """
+        if LEVELS.get(level, LEVELS["INFO"]) < self.level:
+            return
+        if self._thread is None:
+            self._start()
+        self.queue.put((time.time(), level, message, args))
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="AsyncFileLogger", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def flush(self, timeout=5):
+        """等待队列中已有的日志写入文件
+        Returns:
+            bool: 是否在超时前写完
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        """写完队列中的日志并停止后台线程"""
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                items = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                items = []
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = []
+            events = []
+            stop = False
+            for item in items:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    records.append(item)
+            try:
+                self._write(records)
+            except Exception as e:
+                print(f"Failed to write log: {str(e)}")
+            for event in events:
+                event.set()
+            if stop:
+                self._close_file()
+                return
+
+    def _format(self, record):
+        timestamp, level, message, args = record
+        if args:
+            try:
+                message = message % args
+            except (TypeError, ValueError):
+                message = f"{message} {args}"
+        moment = datetime.datetime.fromtimestamp(timestamp)
+        return moment, f"[{moment.strftime('%Y-%m-%d %H:%M:%S')}] {level}: {message}\n"
+
+    def _write(self, records):
+        """格式化并批量写入一批日志，需要时先轮转文件"""
+        if not records:
+            # 空闲时也检查按天轮转
+            if self.rotate_daily and self._file is not None and datetime.date.today() != self._day:
+                self._rotate()
+            return
+        pending = []
+        pending_size = 0
+        for record in records:
+            moment, line = self._format(record)
+            data = line.encode('utf-8')
+            path = self.filename_fn(moment)
+            if self._file is not None:
+                written = self._size + pending_size
+                need_rotate = ((self.rotate_daily and moment.date() != self._day) or
+                               (self.max_bytes and written > 0 and written + len(data) > self.max_bytes))
+                if path != self._path or need_rotate:
+                    self._write_pending(pending)
+                    pending_size = 0
+                    if path == self._path:
+                        self._rotate()
+                    else:
+                        self._close_file()
+            if self._file is None:
+                self._open(path, moment)
+            pending.append(data)
+            pending_size += len(data)
+        self._write_pending(pending)
+
+    def _write_pending(self, pending):
+        if pending and self._file is not None:
+            data = b''.join(pending)
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            pending.clear()
+
+    def _open(self, path, moment):
+        self._file = open(path, 'ab')
+        self._path = path
+        self._day = moment.date()
+        self._size = self._file.tell()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        """把当前日志文件改名为带日期后缀的文件（同一天多次轮转时再加序号），可选gzip压缩"""
+        path = self._path
+        day = self._day or datetime.date.today()
+        self._close_file()
+        if not path or not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+        base = f"{path}.{day.strftime('%Y%m%d')}"
+        rotated = base
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(f"{rotated}.gz"):
+            rotated = f"{base}_{suffix}"
+            suffix += 1
+        os.replace(path, rotated)
+        if self.compress_rotated:
+            with open(rotated, 'rb') as src, gzip.open(f"{rotated}.gz", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
@@ -0,0 +1,263 @@
+"""
+月度虚值宽跨式策略的向量化回测
+
+按 XuTwo.py 的实时逻辑回放历史行情：
+- 到期前 DAYS_BEFORE_EXPIRY_START 天（剩余天数 <= 该值）的第一个采样时刻，按当时的ETF价格选择
+  平值之上第 CALL_OTM_LEVEL 档的Call和平值之下第 PUT_OTM_LEVEL 档的Put，
+  按 投资金额 // (价格 * 10000) 固定合约数，剩余金额为当月余数成本
+- 记录期内（剩余天数 >= DAYS_BEFORE_EXPIRY_STOP）每个采样时刻按最新价格计算持仓市值、
+  总收益（含之前各月的最终收益）和年化收益率
+
+所有月份的选行权价、合约数和逐分钟收益都以NumPy数组一次计算，公式来自 option_math.py。
+
+行情数据（MarketData，各数组按时间排序）：
+- times: 采样时刻 datetime64[m]，形状 (N,)
+- months: 该时刻对应的合约月份 YYYYMM（整数），形状 (N,)
+- etf_prices: ETF价格，形状 (N,)
+- strikes: 行权价（升序），形状 (K,)
+- call_prices / put_prices: 各行权价的期权价格，形状 (N, K)，未挂牌或无行情为NaN
+- remainder_days: 距合约到期日的剩余天数，形状 (N,)；数据文件中没有时按到期规则在本地计算（见 option_expiry.py）
+
+用法：python backtest.py <行情数据.npz>
+"""
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+import option_expiry
+import option_math
+from option_cache import MIN_STANDARD_STRIKES, STANDARD_STRIKE_STEP, STRIKE_TOLERANCE
+
+MarketData = namedtuple('MarketData', ['times', 'months', 'etf_prices', 'strikes',
+                                       'call_prices', 'put_prices', 'remainder_days'])
+
+# 策略参数，默认值与 XuTwo.py 一致
+StrategyParams = namedtuple('StrategyParams', ['monthly_investment', 'call_investment', 'put_investment',
+                                               'days_before_expiry_start', 'days_before_expiry_stop',
+                                               'call_otm_level', 'put_otm_level'],
+                            defaults=(1000, 500, 500, 19, 1, 2, 2))
+
+# rows: 逐采样时刻的结果 {列名: 数组}；months: 每个交易月份的结果 {列名: 数组}；
+# skipped_months: 无法选出行权价或买入价格无效而跳过的月份
+BacktestResult = namedtuple('BacktestResult', ['rows', 'months', 'skipped_months'])
+
+# 有效期权价格的范围，与 XuTwo.validate_price 一致
+MIN_OPTION_PRICE = 0.0001
+MAX_OPTION_PRICE = 5
+
+
+def save_market_data(path, data):
+    """保存行情数据为 .npz 文件"""
+    np.savez_compressed(path, **data._asdict())
+
+
+def fill_remainder_days(data, calendar=None):
+    """按到期规则重新计算各采样时刻的剩余天数（不需要网络）
+    Args:
+        data: MarketData
+        calendar: TradingCalendar，默认为 sse_holidays.json 的交易日历
+    Returns:
+        MarketData: 替换了 remainder_days 的行情数据
+    """
+    return data._replace(remainder_days=option_expiry.remainder_days_array(data.times, data.months, calendar))
+
+
+def load_market_data(path):
+    """读取 save_market_data 保存的行情数据，没有 remainder_days 时在本地计算
+    Returns:
+        MarketData: 行情数据
+    """
+    with np.load(path) as archive:
+        fields = {field: archive[field] for field in MarketData._fields if field in archive}
+    if 'remainder_days' not in fields:
+        fields['remainder_days'] = None
+        return fill_remainder_days(MarketData(**fields))
+    return MarketData(**fields)
+
+
+def _valid_price(prices):
+    return np.isfinite(prices) & (prices >= MIN_OPTION_PRICE) & (prices < MAX_OPTION_PRICE)
+
+
+def _nearest_listed(prices, strikes, targets):
+    """在每行有行情的行权价中找最接近目标行权价的列（相同距离取较低的行权价）"""
+    distance = np.where(np.isnan(prices), np.inf, np.abs(strikes[None, :] - targets[:, None]))
+    return distance.argmin(axis=1)
+
+
+def select_strikes(data, rows, params):
+    """在选定的采样时刻按ETF价格选择虚值行权价（OptionChain.select_otm 的向量化版本，规则相同）
+    Args:
+        data: MarketData
+        rows: 每个月份选择行权价的采样时刻下标，形状 (M,)
+        params: StrategyParams
+    Returns:
+        tuple: (call列下标, put列下标, 是否选出)，形状均为 (M,)
+    """
+    strikes = data.strikes
+    etf = data.etf_prices[rows]
+    call = data.call_prices[rows]
+    put = data.put_prices[rows]
+
+    multiple = strikes / STANDARD_STRIKE_STEP
+    standard = np.abs(np.round(multiple) - multiple) < STRIKE_TOLERANCE
+    listed = ~np.isnan(call) | ~np.isnan(put)
+    # 标准行权价数量不足时使用全部行权价
+    use_standard = (((~np.isnan(call) & standard).sum(axis=1) >= MIN_STANDARD_STRIKES) &
+                    ((~np.isnan(put) & standard).sum(axis=1) >= MIN_STANDARD_STRIKES))
+    ladder = np.where(use_standard[:, None], listed & standard, listed)
+
+    # 平值：最接近ETF价格的行权价；按行权价阶梯上的位置向上/向下数N档
+    distance = np.where(ladder, np.abs(strikes[None, :] - etf[:, None]), np.inf)
+    atm = distance.argmin(axis=1)
+    position = ladder.cumsum(axis=1) - 1
+    atm_position = position[np.arange(len(rows)), atm]
+    call_position = atm_position + params.call_otm_level
+    put_position = atm_position - params.put_otm_level
+    selected = ladder.any(axis=1) & (call_position < ladder.sum(axis=1)) & (put_position >= 0)
+
+    call_target = strikes[(ladder & (position == call_position[:, None])).argmax(axis=1)]
+    put_target = strikes[(ladder & (position == put_position[:, None])).argmax(axis=1)]
+    return _nearest_listed(call, strikes, call_target), _nearest_listed(put, strikes, put_target), selected
+
+
+def run_backtest(data, params=StrategyParams(), start_date=None, calendar=None):
+    """回放行情数据
+    Args:
+        data: MarketData
+        params: StrategyParams
+        start_date: 计算总运行天数的开始日期（对应 CSV_START_DATE），默认为第一条行情的日期
+        calendar: TradingCalendar，给出时只回放交易日交易时段内的行情（与实时程序一致）
+    Returns:
+        BacktestResult: 回测结果
+    """
+    times = np.asarray(data.times, dtype='datetime64[m]')
+    dates = times.astype('datetime64[D]')
+    remainder_days = np.asarray(data.remainder_days)
+    recording = ((remainder_days <= params.days_before_expiry_start) &
+                 (remainder_days >= params.days_before_expiry_stop))
+    if (calendar is not None):
+        recording &= calendar.is_session_open_array(times)
+
+    # 每个月份进入记录期的第一个采样时刻：选择行权价、固定合约数
+    month_values, month_index = np.unique(data.months, return_inverse=True)
+    recording_rows = np.flatnonzero(recording)
+    traded, first = np.unique(month_index[recording_rows], return_index=True)
+    entry_rows = recording_rows[first]
+    call_col, put_col, selected = select_strikes(data, entry_rows, params)
+
+    call_entry = data.call_prices[entry_rows, call_col]
+    put_entry = data.put_prices[entry_rows, put_col]
+    selected &= _valid_price(call_entry) & _valid_price(put_entry)
+    skipped_months = [int(month) for month in month_values[traded[~selected]]]
+
+    traded, entry_rows = traded[selected], entry_rows[selected]
+    call_col, put_col = call_col[selected], put_col[selected]
+    call_entry, put_entry = call_entry[selected], put_entry[selected]
+    call_contracts = np.trunc(option_math.contract_count(params.call_investment, call_entry))
+    put_contracts = np.trunc(option_math.contract_count(params.put_investment, put_entry))
+    remainder = np.trunc(option_math.remainder_cost(params.monthly_investment, call_contracts, call_entry,
+                                                    put_contracts, put_entry))
+
+    # 记录期内的采样时刻，按所属月份取该月固定的行权价和合约数
+    month_position = np.full(len(month_values), -1)
+    month_position[traded] = np.arange(len(traded))
+    rows = recording_rows[month_position[month_index[recording_rows]] >= 0]
+    position = month_position[month_index[rows]]
+    call_price = data.call_prices[rows, call_col[position]]
+    put_price = data.put_prices[rows, put_col[position]]
+    # 价格无效的采样时刻不记录（实时程序中等待下一次重试）
+    valid = _valid_price(call_price) & _valid_price(put_price)
+    rows, position, call_price, put_price = rows[valid], position[valid], call_price[valid], put_price[valid]
+
+    value = np.trunc(option_math.position_value(call_contracts[position], call_price,
+                                                put_contracts[position], put_price))
+    monthly_total_return = value + remainder[position]
+
+    # 总收益 = 当月收益 + 之前各月最终收益之和
+    last = np.flatnonzero(np.r_[position[1:] != position[:-1], True]) if len(rows) else np.array([], dtype=int)
+    month_final_return = np.zeros(len(traded))
+    month_final_return[position[last]] = monthly_total_return[last]
+    previous_months_return = np.r_[0, np.cumsum(month_final_return)[:-1]]
+    total_return = monthly_total_return + previous_months_return[position]
+    total_cost = (position + 1) * params.monthly_investment
+
+    if start_date is None:
+        start_date = dates[0] if len(dates) else np.datetime64('today', 'D')
+    total_days = np.maximum((dates[rows] - np.datetime64(start_date, 'D')).astype(int) + 1, 1)
+    month_days = np.maximum((dates[rows] - dates[entry_rows][position]).astype(int) + 1, 1)
+    annual_return = np.round(option_math.annualized_return(total_return, total_cost, total_days), 4)
+    monthly_annual_return = np.round(option_math.annualized_return(monthly_total_return, params.monthly_investment,
+                                                                   month_days), 4)
+
+    strikes = data.strikes
+    result_rows = {
+        'time': times[rows],
+        'month': month_values[traded][position],
+        'etf_price': data.etf_prices[rows],
+        'call_strike': strikes[call_col][position],
+        'put_strike': strikes[put_col][position],
+        'call_price': call_price,
+        'put_price': put_price,
+        'call_contracts': call_contracts[position],
+        'put_contracts': put_contracts[position],
+        'remainder_cost': remainder[position],
+        'total_cost': total_cost,
+        'total_return': total_return,
+        'annual_return': annual_return,
+        'monthly_total_return': monthly_total_return,
+        'monthly_annual_return': monthly_annual_return,
+    }
+    final_annual_return = np.full(len(traded), np.nan)
+    final_annual_return[position[last]] = annual_return[last]
+    result_months = {
+        'month': month_values[traded],
+        'call_strike': strikes[call_col],
+        'put_strike': strikes[put_col],
+        'call_contracts': call_contracts,
+        'put_contracts': put_contracts,
+        'remainder_cost': remainder,
+        'final_monthly_return': month_final_return,
+        'final_annual_return': final_annual_return,
+        'rows': np.bincount(position, minlength=len(traded)),
+    }
+    return BacktestResult(result_rows, result_months, skipped_months)
+
+
+def summarize(result, params=StrategyParams()):
+    """汇总回测结果
+    Returns:
+        dict: 交易月数、总成本、最终总收益、最终年化收益率、单月最大亏损（负数）或最小盈利
+    """
+    rows = result.rows
+    if len(rows['time']) == 0:
+        return {'months': 0, 'total_cost': 0, 'total_return': 0, 'annual_return': 0.0, 'worst_month_profit': 0}
+    return {
+        'months': len(result.months['month']),
+        'total_cost': int(rows['total_cost'][-1]),
+        'total_return': int(rows['total_return'][-1]),
+        'annual_return': float(rows['annual_return'][-1]),
+        'worst_month_profit': int(result.months['final_monthly_return'].min() - params.monthly_investment),
+    }
+
+
+def main(path):
+    result = run_backtest(load_market_data(path))
+    months = result.months
+    print("月份    Call行权价 Put行权价 Call数量 Put数量 余数成本 月末收益 年化收益率")
+    for i, month in enumerate(months['month']):
+        print(f"{month}  {months['call_strike'][i]:>9} {months['put_strike'][i]:>8} "
+              f"{int(months['call_contracts'][i]):>8} {int(months['put_contracts'][i]):>7} "
+              f"{int(months['remainder_cost'][i]):>8} {int(months['final_monthly_return'][i]):>8} "
+              f"{months['final_annual_return'][i]:>9}%")
+    if result.skipped_months:
+        print(f"⚠️ 跳过的月份: {result.skipped_months}")
+    print(summarize(result))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("用法: python backtest.py <行情数据.npz>")
+        sys.exit(1)
+    main(sys.argv[1])
@@ -0,0 +1,345 @@
+"""
+XuTwo 热点路径基准测试
+
+在临时目录中生成指定行数的合成总表（含月度分表、总表索引和月份清单），行情接口指向本地模拟服务器
+（sina_stub_server.py），测量以下操作的单次耗时：
+- 与数据量无关：行情解析（parse_quote_response + OptionQuote + extract_price）、
+  initialize_contracts 选择行权价、save_state、load_state
+- 与总表行数有关：重启后加载总表索引和月份清单、追加交易数据行（record_trade_row）、
+  get_historical_values、find_closest_historical_day、recover_state_from_csv
+
+结果写入 benchmark_results.json，并与基准文件 benchmark_baseline.json 比较，
+耗时超过基准 (1 + 阈值) 倍的项目视为性能退化，退出码为1。
+
+用法：
+    python benchmark.py                              # 10k、100k、1M 行
+    python benchmark.py --sizes 10000 100000         # 指定行数
+    python benchmark.py --save-baseline              # 把本次结果保存为基准
+    python benchmark.py --threshold 0.3              # 退化阈值（默认0.2，即慢20%）
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import sina_quote
+from month_manifest import MonthManifest, get_manifest_filename
+from multi_underlying import load_strategy
+from option_expiry import expiry_date
+from sina_quote import OptionQuote, build_quote_url, http_get, parse_quote_response
+from sina_stub_server import QuoteBook, SinaStubServer
+from sqlite_store import MASTER_HEADER, MONTHLY_HEADER
+from tick_writer import encode_csv_row
+from trading_calendar import load_calendar
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "benchmark_baseline.json")
+RESULTS_FILE = os.path.join(BENCHMARK_DIR, "benchmark_results.json")
+
+# 默认的总表行数
+BENCHMARK_SIZES = [10000, 100000, 1000000]
+
+# 耗时超过基准的比例阈值
+REGRESSION_THRESHOLD = 0.2
+
+# 每项测量重复的轮数，取中位数
+REPEAT = 5
+
+# 合成数据的CSV开始日期，以及每天记录的时段（与 XuTwo.TRADING_HOURS 一致）
+CSV_START_DATE = "20250530"
+RECORD_HOURS = [(9, 40, 11, 30), (13, 10, 15, 0)]
+
+
+def _month_iter(start_month):
+    year, month = int(start_month[:4]), int(start_month[4:])
+    while True:
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _day_times(day):
+    for start_h, start_m, end_h, end_m in RECORD_HOURS:
+        moment = datetime.datetime.combine(day, datetime.time(start_h, start_m))
+        end = datetime.datetime.combine(day, datetime.time(end_h, end_m))
+        while moment <= end:
+            yield moment
+            moment += datetime.timedelta(minutes=1)
+
+
+def generate_data(directory, rows, prefix="option_trading", start_date=CSV_START_DATE):
+    """生成合成的总表、月度分表、总表索引和月份清单
+    Args:
+        directory: 输出目录
+        rows: 总表数据行数
+        prefix: 文件名前缀
+        start_date: CSV开始日期 YYYYMMDD
+    Returns:
+        list: 生成的月份列表（按时间顺序）
+    每月从开始日期（或1号）记录到到期日，只记录交易日
+    """
+    master_path = os.path.join(directory, f"{prefix}_{start_date}.csv")
+    manifest = MonthManifest(get_manifest_filename(master_path))
+    calendar = load_calendar()
+    months = []
+    written = 0
+    previous_month_final_return = 0
+    with open(master_path, 'wb') as master, open(f"{master_path}.idx", 'w', encoding='utf-8') as index:
+        master.write(encode_csv_row(MASTER_HEADER))
+        offset = master.tell()
+        for year, month_number in _month_iter(start_date[:6]):
+            if written >= rows:
+                break
+            month = f"{year}{month_number:02d}"
+            expire = expiry_date(year, month_number, calendar)
+            first_day = int(start_date[6:]) if month == start_date[:6] else 1
+            if (first_day > expire.day):
+                continue
+            months.append(month)
+            total_cost = len(months) * 1000
+            monthly_path = os.path.join(directory, f"{prefix}_{month}.csv")
+            with open(monthly_path, 'wb') as monthly:
+                monthly.write(encode_csv_row(MONTHLY_HEADER))
+                monthly_offset = monthly.tell()
+                monthly_total_return = 0
+                for day_number in range(first_day, expire.day + 1):
+                    day = datetime.date(year, month_number, day_number)
+                    if (not calendar.is_trading_day(day)):
+                        continue
+                    for moment in _day_times(day):
+                        if written >= rows:
+                            break
+                        step = (written % 97) / 10000
+                        call_price, put_price = round(0.0120 + step, 4), round(0.0160 - step / 2, 4)
+                        value = int(4 * call_price * 10000 + 3 * put_price * 10000)
+                        monthly_total_return = value + 40
+                        date_str = moment.strftime("%Y-%m-%d %H:%M:%S")
+                        values = [date_str, 2.9, 3.0, 2.8, call_price, put_price, 4, 3, 40]
+                        master_row = values + [total_cost, monthly_total_return + previous_month_final_return,
+                                               "1.2345%", month]
+                        monthly_row = values + [1000, monthly_total_return, "1.2345%"]
+                        line = encode_csv_row(master_row)
+                        master.write(line)
+                        index.write(f"{offset},{len(line)},{date_str},{month},{(expire - day).days}\n")
+                        manifest.record(month, master_path, offset, len(line), master_row, is_master=True)
+                        offset += len(line)
+                        monthly_line = encode_csv_row(monthly_row)
+                        monthly.write(monthly_line)
+                        manifest.record(month, monthly_path, monthly_offset, len(monthly_line), monthly_row)
+                        monthly_offset += len(monthly_line)
+                        written += 1
+            previous_month_final_return += monthly_total_return
+    manifest.save()
+    return months
+
+
+def measure(fn, number=1, repeat=REPEAT, setup=None):
+    """测量函数的单次耗时
+    Args:
+        fn: 被测函数
+        number: 每轮调用次数
+        repeat: 轮数
+        setup: 每轮开始前调用的函数（不计时）
+    Returns:
+        dict: {'seconds': 单次耗时中位数, 'best': 单次耗时最小值, 'number': 每轮次数, 'repeat': 轮数}
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            elapsed = time.perf_counter() - started
+        timings.append(elapsed / number)
+    return {'seconds': statistics.median(timings), 'best': min(timings), 'number': number, 'repeat': repeat}
+
+
+@contextlib.contextmanager
+def benchmark_environment(directory):
+    """切换到数据目录，启动模拟服务器并把行情接口指向它，加载一份独立的策略实例
+    Yields:
+        module: XuTwo 模块实例
+    """
+    previous_dir = os.getcwd()
+    server = SinaStubServer(book=QuoteBook(clock=lambda: 0)).start()
+    original_urls = (sina_quote.HQ_BASE_URL, sina_quote.OPTION_API_BASE_URL)
+    sina_quote.HQ_BASE_URL, sina_quote.OPTION_API_BASE_URL = server.hq_base_url, server.option_api_url
+    os.chdir(directory)
+    strategy = None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            strategy = load_strategy("50ETF")
+        strategy.CSV_START_DATE = CSV_START_DATE
+        yield strategy
+    finally:
+        if strategy is not None:
+            if strategy._tick_writer is not None:
+                strategy._tick_writer.close()
+            if strategy._logger is not None:
+                strategy._logger.close()
+        os.chdir(previous_dir)
+        sina_quote.HQ_BASE_URL, sina_quote.OPTION_API_BASE_URL = original_urls
+        sina_quote.close_session()
+        server.stop()
+
+
+def run_fixed_benchmarks(strategy):
+    """与数据量无关的项目"""
+    month = datetime.datetime.now().strftime("%Y%m")
+    with contextlib.redirect_stdout(io.StringIO()):
+        calls, puts = strategy.get_option_codes(month, strategy.UNDERLYING_CODE)
+    # 一次取回整条期权链的原始响应，只测量解析
+    response = http_get(build_quote_url([f"CON_OP_{code}" for code in calls + puts])).content.decode('gbk')
+
+    def parse_quotes():
+        for values in parse_quote_response(response).values():
+            strategy.extract_price(OptionQuote(values), key="最新价")
+
+    state = {
+        'start_of_month_etf_price': 2.9, 'selected_call_strike': [calls[8], 3.0],
+        'selected_put_strike': [puts[4], 2.8], 'call_contracts': 4, 'put_contracts': 3,
+        'call_initial_price': 0.0123, 'put_initial_price': 0.0156, 'monthly_remainder_cost': 40,
+        'total_cost': 1000, 'previous_month_final_return': 0, 'trading_month': month,
+        'processed_today': False, 'start_date': datetime.date.today().strftime("%Y-%m-%d"),
+    }
+    counter = iter(range(10 ** 9))
+
+    def save_state():
+        state['processed_today'] = next(counter) % 2 == 0
+        strategy.save_state(state)
+
+    return {
+        'quote_parse': measure(parse_quotes, number=200),
+        'strike_selection': measure(lambda: strategy.initialize_contracts(2.9, calls, puts, month=month), number=20),
+        'save_state': measure(save_state, number=200),
+        'load_state': measure(strategy.load_state, number=200),
+    }
+
+
+def run_size_benchmarks(strategy, months):
+    """与总表行数有关的项目"""
+    month = months[-1]
+
+    def reset_index():
+        strategy._master_index = None
+
+    def reset_manifest():
+        strategy._month_manifest = None
+
+    results = {
+        'index_load': measure(strategy.get_master_index, setup=reset_index),
+        'manifest_load': measure(strategy.get_month_manifest, setup=reset_manifest),
+        'historical_values': measure(lambda: strategy.get_historical_values(month, 10), number=20),
+        'closest_historical_day': measure(lambda: strategy.find_closest_historical_day(month, 5), number=5),
+        'recover_state_from_csv': measure(lambda: strategy.recover_state_from_csv(month), number=5),
+    }
+
+    appended = iter(range(10 ** 9))
+
+    def append_row():
+        i = next(appended)
+        date_str = f"{month[:4]}-{month[4:]}-28 10:{i // 60 % 60:02d}:{i % 60:02d}"
+        values = [date_str, 2.9, 3.0, 2.8, 0.0125, 0.0150, 4, 3, 40]
+        strategy.record_trade_row(values + [1000, 1000, "0.0%", month], values + [1000, 1000, "0.0%"], 0)
+
+    results['tick_append'] = measure(append_row, number=100)
+    return results
+
+
+def run_benchmarks(sizes, fixed=True):
+    """运行全部基准测试
+    Args:
+        sizes: 总表行数列表
+        fixed: 是否运行与数据量无关的项目
+    Returns:
+        dict: {'fixed' 或 行数: {项目: 测量结果}}
+    """
+    results = {}
+    if fixed:
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark_environment(directory) as strategy:
+                results['fixed'] = run_fixed_benchmarks(strategy)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            started = time.perf_counter()
+            months = generate_data(directory, size)
+            print(f"🔄 已生成 {size} 行合成数据（{len(months)} 个月，{time.perf_counter() - started:.1f}秒）",
+                  flush=True)
+            with benchmark_environment(directory) as strategy:
+                results[str(size)] = run_size_benchmarks(strategy, months)
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """与基准比较
+    Args:
+        results: run_benchmarks 的结果
+        baseline: 基准结果（同样的格式）
+        threshold: 退化阈值
+    Returns:
+        list: [(分组, 项目, 基准耗时, 本次耗时)]，只包含超过阈值的项目
+    """
+    regressions = []
+    for group, items in results.items():
+        for name, result in items.items():
+            previous = baseline.get(group, {}).get(name)
+            if previous and result['seconds'] > previous['seconds'] * (1 + threshold):
+                regressions.append((group, name, previous['seconds'], result['seconds']))
+    return regressions
+
+
+def print_results(results, baseline):
+    print(f"{'分组':>8} {'项目':<24} {'单次耗时(ms)':>12} {'基准(ms)':>10} {'变化':>8}")
+    for group, items in results.items():
+        for name, result in items.items():
+            previous = baseline.get(group, {}).get(name)
+            line = f"{group:>8} {name:<24} {result['seconds'] * 1000:>12.3f}"
+            if previous:
+                change = result['seconds'] / previous['seconds'] - 1
+                line += f" {previous['seconds'] * 1000:>10.3f} {change:>+8.1%}"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="XuTwo 热点路径基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=BENCHMARK_SIZES, help="总表行数")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="退化阈值")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="基准文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基准")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+    print_results(results, baseline)
+
+    report = {'python': platform.python_version(), 'machine': platform.machine(),
+              'created_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'results': results}
+    with open(RESULTS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 已保存基准: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for group, name, previous, current in regressions:
+        print(f"❌ 性能退化: {group} {name} {previous * 1000:.3f}ms -> {current * 1000:.3f}ms")
+    if not regressions:
+        print("✅ 没有超过阈值的性能退化" if baseline else "ℹ️ 没有基准文件，使用 --save-baseline 保存")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
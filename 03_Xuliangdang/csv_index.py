@@ -0,0 +1,188 @@
+"""
+CSV总表索引
+
+在总表旁维护一个索引文件（<总表文件名>.idx），每行记录一条数据行的
+字节偏移、长度、日期、月份和剩余天数。每次追加数据行时同步追加索引，
+历史查询只需按索引定位并读取命中的数据行，不再解析整个总表。
+
+索引文件格式（每行一条）：offset,length,date,month,remainder_days
+"""
+import csv
+import io
+import os
+from collections import namedtuple
+
+IndexEntry = namedtuple('IndexEntry', ['offset', 'length', 'date', 'month', 'remainder_days'])
+
+
+def get_index_filename(csv_path):
+    """获取总表对应的索引文件名"""
+    return f"{csv_path}.idx"
+
+
+class MasterCsvIndex:
+    """总表CSV的内存索引，按 月份 / 月份+剩余天数 / 交易日期 分组"""
+
+    def __init__(self, csv_path, remainder_fn=None, index_path=None):
+        """
+        Args:
+            csv_path: 总表CSV文件路径
+            remainder_fn: 计算剩余天数的函数 remainder_fn(month, date_str) -> int或None，
+                          用于补建索引时计算未记录剩余天数的数据行
+            index_path: 索引文件路径，默认为 <csv_path>.idx
+        """
+        self.csv_path = csv_path
+        self.index_path = index_path or get_index_filename(csv_path)
+        self.remainder_fn = remainder_fn
+        self.header = None
+        self.entries = []
+        self.covered_size = 0  # 已建立索引的总表字节数
+        self._by_month = {}
+        self._by_month_remainder = {}
+        self._by_date = {}
+
+    def _register(self, entry):
+        """把一条索引加入内存分组"""
+        position = len(self.entries)
+        self.entries.append(entry)
+        self._by_month.setdefault(entry.month, []).append(position)
+        self._by_month_remainder.setdefault((entry.month, entry.remainder_days), []).append(position)
+        self._by_date.setdefault(entry.date[:10], []).append(position)
+        self.covered_size = max(self.covered_size, entry.offset + entry.length)
+
+    def _reset(self):
+        self.entries = []
+        self.covered_size = 0
+        self._by_month = {}
+        self._by_month_remainder = {}
+        self._by_date = {}
+
+    def _write_entries(self, entries, mode):
+        with open(self.index_path, mode, encoding='utf-8', newline='') as f:
+            for entry in entries:
+                remainder = '' if entry.remainder_days is None else entry.remainder_days
+                f.write(f"{entry.offset},{entry.length},{entry.date},{entry.month},{remainder}\n")
+
+    def _read_header(self):
+        """读取总表表头，已建立索引的范围至少覆盖表头行"""
+        with open(self.csv_path, 'rb') as f:
+            header_line = f.readline()
+        self.header = next(csv.reader([header_line.decode('utf-8').strip()]), None)
+        self.covered_size = max(self.covered_size, len(header_line))
+
+    def _entry_matches(self, entry):
+        """检查索引位置上的数据行是否仍是建立索引时的那一行"""
+        with open(self.csv_path, 'rb') as f:
+            f.seek(entry.offset)
+            line = f.read(entry.length)
+        return line.startswith(entry.date.encode('utf-8')) and line.endswith(b'\n')
+
+    def load(self):
+        """加载索引文件，并为索引之后新追加的数据行补建索引；总表被重写时重建索引
+        Returns:
+            MasterCsvIndex: self
+        """
+        self._reset()
+        if not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0:
+            return self
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split(',')
+                    if len(parts) != 5:
+                        continue
+                    remainder = int(parts[4]) if parts[4] else None
+                    self._register(IndexEntry(int(parts[0]), int(parts[1]), parts[2], parts[3], remainder))
+
+        csv_size = os.path.getsize(self.csv_path)
+        if self.entries and (self.covered_size > csv_size or not self._entry_matches(self.entries[-1])):
+            # 总表被修复脚本重写过，索引失效
+            print(f"总表索引已失效，重建索引: {self.index_path}")
+            self._reset()
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+        self._read_header()
+        if self.covered_size < csv_size:
+            self._index_tail()
+        return self
+
+    def _index_tail(self):
+        """为 covered_size 之后的数据行建立索引"""
+        new_entries = []
+        with open(self.csv_path, 'rb') as f:
+            f.seek(self.covered_size)
+            offset = self.covered_size
+            for raw_line in f:
+                length = len(raw_line)
+                if not raw_line.endswith(b'\n'):
+                    # 最后一行尚未写完整，下次再建立索引
+                    break
+                line = raw_line.decode('utf-8').strip()
+                if line:
+                    row = next(csv.reader([line]))
+                    date_str = row[0]
+                    month = row[12] if len(row) > 12 and row[12] else date_str[:7].replace('-', '')
+                    remainder = self.remainder_fn(month, date_str) if self.remainder_fn else None
+                    entry = IndexEntry(offset, length, date_str, month, remainder)
+                    new_entries.append(entry)
+                    self._register(entry)
+                offset += length
+        self.covered_size = max(self.covered_size, offset)
+        if new_entries:
+            self._write_entries(new_entries, 'a')
+
+    def add(self, offset, length, date_str, month, remainder_days):
+        """追加数据行后同步追加索引
+        Args:
+            offset: 数据行在总表中的字节偏移
+            length: 数据行字节长度（含换行）
+            date_str: 数据行日期 "YYYY-MM-DD HH:MM:SS"
+            month: 数据行月份 YYYYMM
+            remainder_days: 写入时的剩余天数
+        """
+        if self.header is None:
+            self._read_header()
+        if offset > self.covered_size:
+            # 中间有未建立索引的数据行（例如其它程序追加），补建时会一并包含本行
+            self._index_tail()
+        if offset < self.covered_size:
+            return
+        entry = IndexEntry(offset, length, date_str, month, remainder_days)
+        self._register(entry)
+        self._write_entries([entry], 'a')
+
+    def read_row(self, entry):
+        """读取索引对应的数据行
+        Args:
+            entry: IndexEntry
+        Returns:
+            dict: 以总表表头为键的数据行
+        """
+        with open(self.csv_path, 'rb') as f:
+            f.seek(entry.offset)
+            line = f.read(entry.length).decode('utf-8')
+        values = next(csv.reader(io.StringIO(line)))
+        return dict(zip(self.header, values))
+
+    def entries_for_remainder(self, month, remainder_days):
+        """获取某月某剩余天数的全部索引（按写入顺序）"""
+        return [self.entries[i] for i in self._by_month_remainder.get((month, remainder_days), [])]
+
+    def first_of_month(self, month):
+        """获取某月第一条数据行，没有时返回None"""
+        positions = self._by_month.get(month)
+        return self.read_row(self.entries[positions[0]]) if positions else None
+
+    def last_of_month(self, month):
+        """获取某月最后一条数据行，没有时返回None"""
+        positions = self._by_month.get(month)
+        return self.read_row(self.entries[positions[-1]]) if positions else None
+
+    def daily_first_entries(self):
+        """获取每个交易日的第一条索引（按日期排序）"""
+        return [self.entries[min(positions, key=lambda i: self.entries[i].date)]
+                for _, positions in sorted(self._by_date.items())]
+
+    def months(self):
+        """获取已索引的全部月份（按时间排序）"""
+        return sorted(self._by_month)
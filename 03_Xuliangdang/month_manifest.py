@@ -0,0 +1,186 @@
+"""
+月份清单
+
+记录每个月份的数据在哪些CSV文件中、行数、第一行和最后一行的字节位置，
+以及恢复状态需要的摘要字段（月初ETF价格、初始期权价格、最终Total Return等）。
+每次写入数据行后更新，查询某月是否有数据或恢复状态时只需读取清单和需要的几行。
+
+清单格式：
+{
+    "202506": {
+        "files": {
+            "option_trading_20250530.csv": {"rows": 1200, "first": [offset, length], "last": [offset, length]},
+            "option_trading_202506.csv": {...}
+        },
+        "master_file": "option_trading_20250530.csv",
+        "first_date": "2025-06-06 09:40:00",
+        "last_date": "2025-06-24 15:00:00",
+        "start_of_month_etf_price": 2.8, "call_initial_price": 0.0123, "put_initial_price": 0.0156,
+        "initial_remainder_cost": 52, "final_total_cost": 2000, "final_total_return": 2013
+    }
+}
+"""
+import csv
+import io
+import json
+import os
+
+# 总表列位置：Date,ETF Price,Call Strike,Put Strike,Call Price,Put Price,Call Qty,Put Qty,Remainder Cost,Total Cost,Total Return,Annual Return,Month
+DATE, ETF_PRICE, CALL_PRICE, PUT_PRICE, REMAINDER_COST, TOTAL_COST, TOTAL_RETURN, MONTH = 0, 1, 4, 5, 8, 9, 10, 12
+
+
+def get_manifest_filename(master_csv_path):
+    """获取总表对应的月份清单文件名"""
+    return f"{os.path.splitext(master_csv_path)[0]}_manifest.json"
+
+
+def _to_number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+class MonthManifest:
+    """按月份记录数据文件位置和摘要的清单"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 清单文件路径
+        """
+        self.path = path
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        self.months = {}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """加载清单文件，文件不存在或损坏时为空清单
+        Returns:
+            MonthManifest: self
+        """
+        self.months = {}
+        if self.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.months = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取月份清单失败: {str(e)}")
+                self.months = {}
+        return self
+
+    def save(self):
+        """写入临时文件后替换，避免写到一半时损坏清单"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.months, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def record(self, month, file_path, offset, length, row, is_master=False):
+        """记录一行写入的数据
+        Args:
+            month: 数据行所属月份 YYYYMM
+            file_path: 数据文件路径
+            offset: 数据行字节偏移
+            length: 数据行字节长度
+            row: 数据行
+            is_master: 是否为总表数据行，总表数据行用于更新摘要字段
+        """
+        entry = self.months.setdefault(month, {'files': {}})
+        file_info = entry['files'].setdefault(os.path.basename(file_path), {'rows': 0, 'first': None, 'last': None})
+        file_info['rows'] += 1
+        if file_info['first'] is None:
+            file_info['first'] = [offset, length]
+        file_info['last'] = [offset, length]
+
+        if not is_master:
+            return
+        if entry.get('master_file') != os.path.basename(file_path):
+            # 新的总表文件（开始新的记录周期），摘要从该文件的第一行重新开始
+            entry['master_file'] = os.path.basename(file_path)
+            entry['first_date'] = str(row[DATE])
+            entry['start_of_month_etf_price'] = _to_number(row[ETF_PRICE])
+            entry['call_initial_price'] = _to_number(row[CALL_PRICE])
+            entry['put_initial_price'] = _to_number(row[PUT_PRICE])
+            entry['initial_remainder_cost'] = _to_number(row[REMAINDER_COST])
+        entry['last_date'] = str(row[DATE])
+        entry['final_total_cost'] = _to_number(row[TOTAL_COST])
+        entry['final_total_return'] = _to_number(row[TOTAL_RETURN])
+
+    def verify(self):
+        """检查清单记录的位置是否仍然有效（数据文件被修复脚本重写后位置会失效）
+        Returns:
+            bool: 每个月份在总表中的最后一行都与清单记录的日期一致时返回True
+        """
+        try:
+            for entry in self.months.values():
+                if entry.get('master_file'):
+                    last = self.read_row(entry['master_file'], entry['files'][entry['master_file']]['last'])
+                    if not last or last[DATE] != entry['last_date']:
+                        return False
+        except (OSError, KeyError, StopIteration, UnicodeDecodeError):
+            return False
+        return True
+
+    def has_month(self, month):
+        """判断某月是否有数据"""
+        entry = self.months.get(month)
+        return bool(entry) and any(info['rows'] > 0 for info in entry['files'].values())
+
+    def get(self, month):
+        """获取某月的清单条目，没有时返回None"""
+        return self.months.get(month)
+
+    def read_row(self, file_name, span):
+        """读取清单中记录位置的数据行
+        Args:
+            file_name: 数据文件名
+            span: [offset, length]
+        Returns:
+            list: 解析后的数据行
+        """
+        offset, length = span
+        with open(os.path.join(self.base_dir, file_name), 'rb') as f:
+            f.seek(offset)
+            line = f.read(length).decode('utf-8')
+        return next(csv.reader(io.StringIO(line)))
+
+    def master_rows(self, month):
+        """读取某月在总表中的第一行和最后一行
+        Returns:
+            tuple: (第一行, 最后一行, 行数)，没有总表数据时返回None
+        """
+        entry = self.months.get(month)
+        if not entry or not entry.get('master_file'):
+            return None
+        file_info = entry['files'][entry['master_file']]
+        return (self.read_row(entry['master_file'], file_info['first']),
+                self.read_row(entry['master_file'], file_info['last']),
+                file_info['rows'])
+
+    def rebuild(self, master_path, monthly_paths):
+        """扫描现有数据文件重建清单（清单文件不存在或已失效时执行）
+        Args:
+            master_path: 总表文件路径，月份取自Month列
+            monthly_paths: {月份: 月度分表文件路径}
+        """
+        self.months = {}
+        sources = [(master_path, None)] + sorted((path, month) for month, path in monthly_paths.items())
+        for path, file_month in sources:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                offset = len(f.readline())  # 跳过表头
+                for raw_line in f:
+                    line = raw_line.decode('utf-8').strip()
+                    if line:
+                        row = next(csv.reader([line]))
+                        month = file_month or (row[MONTH] if len(row) > MONTH else None)
+                        if month:
+                            self.record(month, path, offset, len(raw_line), row, is_master=file_month is None)
+                    offset += len(raw_line)
+        self.save()
+        return self
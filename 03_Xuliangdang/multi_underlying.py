@@ -0,0 +1,91 @@
+"""
+多标的运行模式
+
+在一个进程中同时运行多个标的（50ETF、300ETF、500ETF、科创50）的策略：
+- 每个标的加载一份独立的 XuTwo 模块实例（select_underlying 选择标的），
+  拥有各自的总表、月度分表、状态和日志文件（文件名前缀见 UNDERLYING_PROFILES）
+- 所有标的共用一个调度器和一个行情连接池，每个采样时刻先用一次批量请求预取全部标的需要的行情，
+  再依次处理各标的
+
+用法：
+    python multi_underlying.py                  # 运行全部标的
+    python multi_underlying.py 50ETF 300ETF     # 只运行指定标的
+"""
+import datetime
+import importlib.util
+import os
+import sys
+
+from scheduler import TradingScheduler
+from sina_quote import prefetch_quotes, clear_prefetched
+
+XUTWO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "XuTwo.py")
+
+
+def load_strategy(name):
+    """加载一份独立的策略模块实例
+    Args:
+        name: 标的名称（XuTwo.UNDERLYING_PROFILES 中的名称）
+    Returns:
+        module: 已选择标的的 XuTwo 模块实例
+    """
+    spec = importlib.util.spec_from_file_location(f"XuTwo_{name}", XUTWO_PATH)
+    strategy = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(strategy)
+    if (name not in strategy.UNDERLYING_PROFILES):
+        raise ValueError(f"未知标的: {name}，可选: {', '.join(strategy.UNDERLYING_PROFILES)}")
+    strategy.select_underlying(name)
+    return strategy
+
+
+def run_tick(strategies, now, prefetch=True):
+    """处理一个采样时刻：一次请求预取全部标的的行情，再依次处理各标的
+    Args:
+        strategies: {标的名称: 策略模块实例}
+        now: 本轮的采样时刻
+        prefetch: 是否预取行情（不在交易时段时不需要）
+    """
+    try:
+        if (prefetch):
+            symbols = []
+            for strategy in strategies.values():
+                symbols.extend(strategy.get_prefetch_symbols())
+            prefetch_quotes(symbols)
+        for name, strategy in strategies.items():
+            print(f"===== {name} =====", flush=True)
+            if (strategy.run_tick(now)):
+                # 刚恢复或估算初始化了合约，立即按新合约再处理一次
+                strategy.run_tick(now)
+            strategy.write_metrics()
+    finally:
+        clear_prefetched()
+
+
+def main(names=None):
+    """多标的运行入口
+    Args:
+        names: 标的名称列表，默认运行全部标的
+    """
+    strategies = {}
+    for name in names or ["50ETF", "300ETF", "500ETF", "Kechuang"]:
+        strategies[name] = load_strategy(name)
+    for name, strategy in strategies.items():
+        print(f"===== {name} 初始化 =====", flush=True)
+        strategy.initialize_strategy()
+
+    base = next(iter(strategies.values()))
+    scheduler = TradingScheduler(base.TRADING_HOURS, base.is_trading_date, interval=base.SAMPLING_INTERVAL)
+
+    # 无限循环，每个采样时刻处理一次全部标的
+    while (True):
+        now = datetime.datetime.now()
+        run_tick(strategies, now, prefetch=scheduler.in_session(now))
+        next_wakeup, wakeup_reason = scheduler.next_wakeup()
+        print(f"🔄 程序休眠至 {next_wakeup} ({wakeup_reason})...", flush=True)
+        for strategy in strategies.values():
+            strategy.flush_before_sleep(next_wakeup)
+        scheduler.wait_next()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
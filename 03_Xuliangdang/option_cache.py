@@ -0,0 +1,511 @@
+"""
+期权元数据缓存
+
+到期日缓存：按 (月份, 品种, 交易所) 缓存期权到期日并持久化到磁盘，剩余天数在本地根据
+"截至日期"计算，历史数据恢复时每个月份最多只需一次网络请求。给出本地计算函数（option_expiry.py）时，
+接口返回的到期日与本地规则相互校验，接口不可用（或 offline=True）时直接使用本地计算的到期日。
+
+期权链缓存：按 标的+到期月份 缓存 代码 -> 行权价 -> 类型，只为新挂牌的合约请求行权价。
+已上市合约在到期前行权价不变，只有分红除权（XD）时会调整，因此已缓存的合约按
+CHAIN_REFRESH_AGE 定期重新校验一次。
+
+选择行权价：期权链在首次查询时按类型建立行权价升序的阶梯（StrikeLadder），并标记标准行权价和除权调整后的行权价，
+平值用二分查找，"虚N档"按下标直接读取；合约变化时重建。开仓、换月和恢复历史数据都通过 OptionChain.select_otm /
+OptionChain.find 选择，结果一致。
+"""
+import bisect
+import datetime
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+# 到期日缓存文件
+EXPIRY_CACHE_FILE = "option_expiry_cache.json"
+
+# 到期日缓存有效期（秒），超过后重新从网络刷新；刷新失败时继续使用旧值
+EXPIRY_CACHE_TTL = 12 * 3600
+
+# 到期日接口请求失败后，同一月份在该时间（秒）内不再请求，期间使用旧值或本地计算的到期日
+EXPIRY_RETRY_INTERVAL = 300
+
+# 期权链缓存文件
+CHAIN_CACHE_FILE = "option_chain_cache.json"
+
+# 已缓存合约的重新校验间隔（秒），用于发现除权后调整的行权价
+CHAIN_REFRESH_AGE = 24 * 3600
+
+# 标准行权价间隔（非除权调整的行权价都是0.05的整数倍）
+STANDARD_STRIKE_STEP = 0.05
+
+# Call或Put的标准行权价少于该数量时，平值和虚值档位按全部行权价计算
+MIN_STANDARD_STRIKES = 5
+
+# 按行权价匹配合约时允许的误差
+STRIKE_TOLERANCE = 0.0001
+
+
+def parse_expire_date(month, expire_day):
+    """把接口返回的到期日转换为日期
+    Args:
+        month: 月份，格式YYYYMM
+        expire_day: 接口返回的到期日，"YYYY-MM-DD" 或当月日期数字
+    Returns:
+        date: 到期日期
+    """
+    expire_day = str(expire_day)
+    if '-' in expire_day:
+        return datetime.datetime.strptime(expire_day[:10], "%Y-%m-%d").date()
+    return datetime.date(int(month[:4]), int(month[4:6]), int(expire_day))
+
+
+def remainder_days_until(expire_date, as_of=None):
+    """计算截至某日距离到期日的剩余自然日
+    Args:
+        expire_date: 到期日期
+        as_of: 截至日期（date或datetime），默认今天
+    Returns:
+        int: 剩余天数，已过期时为负数
+    """
+    if as_of is None:
+        as_of = datetime.date.today()
+    elif isinstance(as_of, datetime.datetime):
+        as_of = as_of.date()
+    return (expire_date - as_of).days
+
+
+class ExpiryCache:
+    """进程内共享的期权到期日缓存（带磁盘持久化和TTL刷新）"""
+
+    def __init__(self, fetcher, cache_file=EXPIRY_CACHE_FILE, ttl=EXPIRY_CACHE_TTL, local_fn=None,
+                 retry_interval=EXPIRY_RETRY_INTERVAL):
+        """
+        Args:
+            fetcher: 网络获取函数 fetcher(month, cate, exchange) -> (expire_day, remainder_days)
+            cache_file: 缓存文件路径
+            ttl: 缓存有效期（秒）
+            local_fn: 本地计算函数 local_fn(month) -> "YYYY-MM-DD"，None表示只使用接口
+            retry_interval: 请求失败后同一月份再次请求的间隔（秒）
+        """
+        self.fetcher = fetcher
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.local_fn = local_fn
+        self.retry_interval = retry_interval
+        self.mismatches = {}  # 缓存键 -> (接口到期日, 本地到期日)
+        self._retry_at = {}  # 缓存键 -> 请求失败后允许再次请求的时间
+        self._entries = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(month, cate, exchange):
+        return f"{month}|{cate}|{exchange}"
+
+    def _load(self):
+        """首次使用时从磁盘加载缓存"""
+        if self._entries is not None:
+            return
+        self._entries = {}
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load expiry cache: {str(e)}")
+            self._entries = {}
+
+    def _save(self, merge=True):
+        """把缓存写回磁盘（先写临时文件再替换，避免写入中断损坏文件）
+        Args:
+            merge: 是否先合并磁盘上其他缓存实例（例如多标的模式下的其他标的）写入的条目
+        """
+        try:
+            if merge and os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, 'r', encoding='utf-8') as f:
+                        entries = json.load(f)
+                    entries.update(self._entries)
+                    self._entries = entries
+                except ValueError:
+                    pass
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            print(f"Failed to save expiry cache: {str(e)}")
+
+    def _local_expire_day(self, month):
+        if self.local_fn is None:
+            return None
+        try:
+            return self.local_fn(month)
+        except (OSError, ValueError) as e:
+            print(f"Failed to compute expiry date locally: {str(e)}")
+            return None
+
+    def _check_local(self, key, month, expire_day):
+        """用本地规则校验接口返回的到期日，不一致时记录并提示（以接口为准）"""
+        local_day = self._local_expire_day(month)
+        if local_day is None:
+            return
+        if parse_expire_date(month, expire_day) != parse_expire_date(month, local_day):
+            self.mismatches[key] = (expire_day, local_day)
+            print(f"⚠️ 到期日校验不一致: {key} 接口={expire_day} 本地={local_day}，以接口为准", flush=True)
+        else:
+            self.mismatches.pop(key, None)
+
+    def get(self, month, cate='50ETF', exchange='null', as_of=None, offline=False):
+        """获取到期日和截至as_of的剩余天数
+        Args:
+            month: 月份，格式YYYYMM
+            cate: 品种
+            exchange: 交易所
+            as_of: 截至日期，默认今天
+            offline: 不请求接口，没有缓存时直接使用本地计算的到期日
+        Returns:
+            tuple: (expire_day, remainder_days)，无法获取时返回 (None, None)
+        """
+        with self._lock:
+            self._load()
+            key = self._key(month, cate, exchange)
+            entry = self._entries.get(key)
+            now = time.time()
+            if (not offline and (entry is None or now - entry['fetched_at'] > self.ttl)
+                    and now >= self._retry_at.get(key, 0)):
+                expire_day, _ = self.fetcher(month, cate, exchange)
+                if expire_day:
+                    self._check_local(key, month, expire_day)
+                    entry = {'expire_day': expire_day, 'fetched_at': time.time()}
+                    self._entries[key] = entry
+                    self._retry_at.pop(key, None)
+                    self._save()
+                else:
+                    # 请求失败：retry_interval 内不再请求该月份，继续使用旧值或本地计算的到期日
+                    self._retry_at[key] = time.time() + self.retry_interval
+            if entry is None:
+                # 接口不可用且没有缓存：使用本地计算的到期日（不写入缓存，接口恢复后再校验）
+                expire_day = self._local_expire_day(month)
+                if expire_day is None:
+                    return None, None
+                entry = {'expire_day': expire_day}
+            expire_day = entry['expire_day']
+            return expire_day, remainder_days_until(parse_expire_date(month, expire_day), as_of)
+
+    def clear(self):
+        """清空缓存（内存和磁盘）"""
+        with self._lock:
+            self._entries = {}
+            self._save(merge=False)
+
+
+def is_standard_strike(strike):
+    """是否为标准行权价（STANDARD_STRIKE_STEP 的整数倍），否则为分红除权调整后的行权价"""
+    multiple = strike / STANDARD_STRIKE_STEP
+    return abs(round(multiple) - multiple) < STRIKE_TOLERANCE
+
+
+# select_otm 的结果：atm / call_target / put_target 为行权价阶梯上的平值和虚N档目标行权价，
+# call / put 为最接近目标行权价的挂牌合约 (代码, 行权价)，档位不足时为None；standard 表示阶梯是否只含标准行权价
+OtmSelection = namedtuple('OtmSelection', ['atm', 'call_target', 'put_target', 'call', 'put', 'standard'])
+
+
+class StrikeLadder:
+    """按行权价升序排列的行权价阶梯：二分查找平值和最接近的行权价，按下标取虚N档"""
+
+    __slots__ = ('strikes', 'codes')
+
+    def __init__(self, strikes, codes=None):
+        """
+        Args:
+            strikes: 行权价列表
+            codes: 对应的合约代码列表，None表示只有行权价（例如合并了Call和Put的阶梯）
+        """
+        if codes is None:
+            self.strikes = sorted(strikes)
+            self.codes = [None] * len(self.strikes)
+        else:
+            pairs = sorted(zip(strikes, codes))
+            self.strikes = [strike for strike, _ in pairs]
+            self.codes = [code for _, code in pairs]
+
+    def __len__(self):
+        return len(self.strikes)
+
+    def nearest_index(self, price):
+        """最接近 price 的下标（距离相同时取较低的行权价），阶梯为空时返回None"""
+        strikes = self.strikes
+        if not strikes:
+            return None
+        i = bisect.bisect_left(strikes, price)
+        if i == 0:
+            return 0
+        if i == len(strikes):
+            return i - 1
+        return i - 1 if price - strikes[i - 1] <= strikes[i] - price else i
+
+    def strike_at(self, index):
+        """下标对应的行权价，超出阶梯范围时返回None"""
+        if 0 <= index < len(self.strikes):
+            return self.strikes[index]
+        return None
+
+    def nearest(self, price):
+        """最接近 price 的 (代码, 行权价)，阶梯为空时返回None"""
+        i = self.nearest_index(price)
+        return None if i is None else (self.codes[i], self.strikes[i])
+
+    def find(self, strike, tolerance=STRIKE_TOLERANCE):
+        """行权价等于 strike（误差在 tolerance 内）的 (代码, 行权价)，没有时返回None"""
+        i = bisect.bisect_left(self.strikes, strike - tolerance)
+        if i < len(self.strikes) and abs(self.strikes[i] - strike) < tolerance:
+            return self.codes[i], self.strikes[i]
+        return None
+
+    def otm(self, price, call_level, put_level):
+        """平值和虚值档位
+        Args:
+            price: 标的价格
+            call_level: 平值之上的档数
+            put_level: 平值之下的档数
+        Returns:
+            tuple: (平值, 之上第call_level档, 之下第put_level档)，档位不足时对应项为None
+        """
+        i = self.nearest_index(price)
+        if i is None:
+            return None, None, None
+        return self.strikes[i], self.strike_at(i + call_level), self.strike_at(i - put_level)
+
+
+class OptionChain:
+    """某个标的、某个到期月份的期权链：代码 -> (行权价, 类型)"""
+
+    CALL = 'C'
+    PUT = 'P'
+
+    def __init__(self, underlying, month, contracts=None):
+        """
+        Args:
+            underlying: 标的代码，例如 '510050'
+            month: 到期月份，格式YYYYMM
+            contracts: {代码: [行权价, 类型, 校验时间]}
+        """
+        self.underlying = underlying
+        self.month = month
+        self.contracts = contracts if contracts is not None else {}
+        self._ladders = None
+
+    def strikes(self, option_type):
+        """获取某类型期权的 (代码, 行权价) 列表
+        Args:
+            option_type: OptionChain.CALL 或 OptionChain.PUT
+        Returns:
+            list: [(code, strike), ...]，按挂牌顺序
+        """
+        return [(code, info[0]) for code, info in self.contracts.items() if info[1] == option_type]
+
+    def _build_ladders(self):
+        """按类型建立行权价阶梯，以及选择平值使用的合并阶梯（Call和Put的不同行权价）"""
+        by_type = {self.CALL: ([], []), self.PUT: ([], [])}
+        for code, info in self.contracts.items():
+            strikes, codes = by_type[info[1]]
+            strikes.append(info[0])
+            codes.append(code)
+        ladders = {option_type: StrikeLadder(strikes, codes) for option_type, (strikes, codes) in by_type.items()}
+        standard = {option_type: [strike for strike in ladder.strikes if is_standard_strike(strike)]
+                    for option_type, ladder in ladders.items()}
+        # 除权后标准行权价数量不足时按全部行权价计算档位
+        use_standard = all(len(strikes) >= MIN_STANDARD_STRIKES for strikes in standard.values())
+        if use_standard:
+            selection = set(standard[self.CALL]) | set(standard[self.PUT])
+        else:
+            selection = set(ladders[self.CALL].strikes) | set(ladders[self.PUT].strikes)
+        ladders['selection'] = StrikeLadder(selection)
+        ladders['standard'] = use_standard
+        return ladders
+
+    def _ladder(self, key):
+        ladders = self._ladders
+        if ladders is None:
+            ladders = self._ladders = self._build_ladders()
+        return ladders[key]
+
+    def ladder(self, option_type):
+        """某类型期权按行权价升序的阶梯
+        Args:
+            option_type: OptionChain.CALL 或 OptionChain.PUT
+        Returns:
+            StrikeLadder: 行权价阶梯
+        """
+        return self._ladder(option_type)
+
+    def selection_ladder(self):
+        """选择平值和虚值档位使用的阶梯：Call和Put的标准行权价（数量不足时为全部行权价）"""
+        return self._ladder('selection')
+
+    def uses_standard_strikes(self):
+        """selection_ladder 是否只含标准行权价"""
+        return self._ladder('standard')
+
+    def xd_strikes(self):
+        """分红除权调整后的（非标准）行权价，升序"""
+        return sorted({info[0] for info in self.contracts.values() if not is_standard_strike(info[0])})
+
+    def find(self, option_type, strike, tolerance=STRIKE_TOLERANCE):
+        """按行权价查找合约
+        Returns:
+            tuple: (代码, 行权价)，没有该行权价的合约时返回None
+        """
+        return self.ladder(option_type).find(strike, tolerance)
+
+    def select_otm(self, price, call_level, put_level):
+        """按标的价格选择虚值合约
+        平值为 selection_ladder 上最接近标的价格的行权价，目标行权价为平值之上第call_level档和之下第put_level档，
+        再从全部挂牌合约（含除权调整的合约）中选出最接近目标行权价的Call和Put。
+        Args:
+            price: 标的价格
+            call_level: Call虚值档数
+            put_level: Put虚值档数
+        Returns:
+            OtmSelection: 选择结果
+        """
+        atm, call_target, put_target = self.selection_ladder().otm(price, call_level, put_level)
+        call = self.ladder(self.CALL).nearest(call_target) if call_target is not None else None
+        put = self.ladder(self.PUT).nearest(put_target) if put_target is not None else None
+        return OtmSelection(atm, call_target, put_target, call, put, self.uses_standard_strikes())
+
+    def strike_map(self):
+        """获取 {代码: 行权价} 映射"""
+        return {code: info[0] for code, info in self.contracts.items()}
+
+    def strike_of(self, code):
+        """获取合约行权价，未缓存时返回None"""
+        info = self.contracts.get(code)
+        return info[0] if info else None
+
+    def update(self, call_codes, put_codes, strike_fetcher, max_age=CHAIN_REFRESH_AGE):
+        """按当前挂牌合约列表更新期权链
+        新挂牌和超过 max_age 未校验的合约一次性批量获取行权价，已摘牌的合约被移除。
+        Args:
+            call_codes: 当前Call期权代码列表
+            put_codes: 当前Put期权代码列表
+            strike_fetcher: 批量获取行权价的函数 strike_fetcher(codes) -> {code: strike}
+            max_age: 已缓存合约的重新校验间隔（秒）
+        Returns:
+            int: 本次请求行权价的合约数量（0表示完全命中缓存）
+        """
+        if not call_codes and not put_codes:
+            # 合约列表获取失败时保留现有缓存
+            return 0
+
+        now = time.time()
+        listed = {code: self.CALL for code in call_codes}
+        listed.update({code: self.PUT for code in put_codes})
+
+        # 移除已摘牌的合约
+        for code in list(self.contracts):
+            if code not in listed:
+                del self.contracts[code]
+                self._ladders = None
+
+        stale_codes = [code for code in listed
+                       if code not in self.contracts or now - self.contracts[code][2] > max_age]
+        if not stale_codes:
+            return 0
+
+        fetched = strike_fetcher(stale_codes)
+        for code in stale_codes:
+            strike = fetched.get(code)
+            if strike:
+                self.contracts[code] = [float(strike), listed[code], now]
+        self._ladders = None
+        return len(stale_codes)
+
+    def to_compact(self):
+        """转换为紧凑的可序列化结构"""
+        return {code: [info[0], info[1], int(info[2])] for code, info in self.contracts.items()}
+
+    @classmethod
+    def from_compact(cls, underlying, month, data):
+        """从紧凑结构恢复期权链"""
+        return cls(underlying, month, {code: list(info) for code, info in data.items()})
+
+
+class OptionChainCache:
+    """按 标的+到期月份 缓存期权链并持久化为紧凑的JSON文件"""
+
+    def __init__(self, strike_fetcher, cache_file=CHAIN_CACHE_FILE, max_age=CHAIN_REFRESH_AGE):
+        """
+        Args:
+            strike_fetcher: 批量获取行权价的函数 strike_fetcher(codes) -> {code: strike}
+            cache_file: 缓存文件路径
+            max_age: 已缓存合约的重新校验间隔（秒）
+        """
+        self.strike_fetcher = strike_fetcher
+        self.cache_file = cache_file
+        self.max_age = max_age
+        self._chains = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(underlying, month):
+        return f"{underlying}|{month}"
+
+    def _load(self):
+        """首次使用时从磁盘加载缓存"""
+        if self._chains is not None:
+            return
+        self._chains = {}
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    for key, data in json.load(f).items():
+                        underlying, month = key.split('|')
+                        self._chains[key] = OptionChain.from_compact(underlying, month, data)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load option chain cache: {str(e)}")
+            self._chains = {}
+
+    def _save(self):
+        """把缓存写回磁盘（先写临时文件再替换）
+        先合并磁盘上其他缓存实例（例如多标的模式下的其他标的）写入的期权链，本实例的期权链优先
+        """
+        try:
+            if os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, 'r', encoding='utf-8') as f:
+                        for key, data in json.load(f).items():
+                            if key not in self._chains:
+                                underlying, month = key.split('|')
+                                self._chains[key] = OptionChain.from_compact(underlying, month, data)
+                except ValueError:
+                    pass
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({key: chain.to_compact() for key, chain in self._chains.items()},
+                          f, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            print(f"Failed to save option chain cache: {str(e)}")
+
+    def get_chain(self, underlying, month, call_codes, put_codes):
+        """获取与当前挂牌合约一致的期权链
+        Args:
+            underlying: 标的代码
+            month: 到期月份，格式YYYYMM
+            call_codes: 当前Call期权代码列表
+            put_codes: 当前Put期权代码列表
+        Returns:
+            OptionChain: 期权链
+        """
+        with self._lock:
+            self._load()
+            key = self._key(underlying, month)
+            chain = self._chains.get(key)
+            if chain is None:
+                chain = OptionChain(underlying, month)
+                self._chains[key] = chain
+            if chain.update(call_codes, put_codes, self.strike_fetcher, self.max_age):
+                self._save()
+            return chain
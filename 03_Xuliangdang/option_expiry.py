@@ -0,0 +1,93 @@
+"""
+期权到期日的本地计算
+
+上交所ETF期权的到期日为到期月份的第四个星期三，遇休市顺延至下一个交易日（休市安排见 trading_calendar.py）。
+不需要网络即可计算任意月份的到期日和剩余天数：
+- expiry_date / expire_day_for_month：单个月份的到期日
+- expiry_dates_array / remainder_days_array：对整列月份和采样时刻一次计算（NumPy），用于回测和历史数据处理
+
+剩余天数与新浪 getRemainderDay 接口一致，为到期日与当天相差的自然日数。
+option_cache.ExpiryCache 用本地结果与接口返回的到期日相互校验，接口不可用时直接使用本地结果。
+"""
+import datetime
+
+from trading_calendar import load_calendar
+
+# 到期日为当月第几个星期三
+EXPIRY_WEEK = 4
+WEDNESDAY = 2
+
+_default_calendar = None
+
+
+def get_default_calendar():
+    """默认交易日历（首次使用时从 sse_holidays.json 加载）"""
+    global _default_calendar
+    if (_default_calendar is None):
+        _default_calendar = load_calendar()
+    return _default_calendar
+
+
+def fourth_wednesday(year, month):
+    """到期月份的第四个星期三（未按休市顺延）"""
+    first = datetime.date(year, month, 1)
+    return first + datetime.timedelta(days=(WEDNESDAY - first.weekday()) % 7 + 7 * (EXPIRY_WEEK - 1))
+
+
+def expiry_date(year, month, calendar=None):
+    """到期日：第四个星期三，遇休市顺延至下一个交易日
+    Args:
+        year: 年
+        month: 月
+        calendar: TradingCalendar，默认为 sse_holidays.json 的交易日历
+    Returns:
+        date: 到期日
+    """
+    calendar = calendar or get_default_calendar()
+    return calendar.next_trading_day(fourth_wednesday(year, month), inclusive=True)
+
+
+def expire_day_for_month(month, calendar=None):
+    """按 getRemainderDay 接口的格式返回某月份的到期日
+    Args:
+        month: 月份，格式YYYYMM
+        calendar: TradingCalendar
+    Returns:
+        str: 到期日 "YYYY-MM-DD"
+    """
+    return expiry_date(int(month[:4]), int(month[4:6]), calendar).strftime("%Y-%m-%d")
+
+
+def expiry_dates_array(months, calendar=None):
+    """expiry_date 的向量化版本
+    Args:
+        months: 月份数组，YYYYMM 整数（或可转换为整数的字符串）
+        calendar: TradingCalendar
+    Returns:
+        ndarray: 到期日 datetime64[D]
+    """
+    import numpy as np
+    calendar = calendar or get_default_calendar()
+    months = np.asarray(months).astype(np.int64)
+    first = ((months // 100 - 1970) * 12 + months % 100 - 1).astype('datetime64[M]').astype('datetime64[D]')
+    wednesdays = np.busday_offset(first, EXPIRY_WEEK - 1, roll='forward', weekmask='0010000')
+    # 第四个星期三及之后的第一个交易日
+    return calendar.next_trading_day_array(wednesdays - np.timedelta64(1, 'D'))
+
+
+def remainder_days_array(times, months, calendar=None):
+    """各采样时刻距所属合约月份到期日的剩余自然日
+    Args:
+        times: 采样时刻 datetime64 数组
+        months: 对应的合约月份数组，YYYYMM 整数
+        calendar: TradingCalendar
+    Returns:
+        ndarray: 剩余天数（整数，已过期为负数）
+    """
+    import numpy as np
+    dates = np.asarray(times).astype('datetime64[D]')
+    months = np.asarray(months)
+    # 同一月份只计算一次到期日
+    unique_months, inverse = np.unique(months, return_inverse=True)
+    expiries = expiry_dates_array(unique_months, calendar)
+    return (expiries[inverse] - dates).astype(np.int64)
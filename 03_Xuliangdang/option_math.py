@@ -0,0 +1,59 @@
+"""
+策略计算公式
+
+实时记录（XuTwo.py）、回测（backtest.py）和历史数据重算共用的公式，
+参数既可以是数值也可以是NumPy数组（按元素计算），保证各处的计算结果一致。
+"""
+
+# 每张ETF期权合约对应的标的份数
+CONTRACT_MULTIPLIER = 10000
+
+
+def contract_count(investment, price):
+    """按投资金额和期权价格计算可买入的合约数（向下取整，结果为浮点数，调用方按需转换为整数）
+    Args:
+        investment: 投资金额
+        price: 期权价格
+    Returns:
+        合约数
+    """
+    return investment // (price * CONTRACT_MULTIPLIER)
+
+
+def position_value(call_contracts, call_price, put_contracts, put_price):
+    """计算Call和Put持仓的市值
+    Args:
+        call_contracts: Call合约数
+        call_price: Call价格
+        put_contracts: Put合约数
+        put_price: Put价格
+    Returns:
+        持仓市值
+    """
+    return (call_contracts * call_price * CONTRACT_MULTIPLIER) + (put_contracts * put_price * CONTRACT_MULTIPLIER)
+
+
+def remainder_cost(monthly_investment, call_contracts, call_price, put_contracts, put_price):
+    """计算当月投资买入合约后剩余的金额（余数成本）
+    Args:
+        monthly_investment: 当月投资金额
+        call_contracts: Call合约数
+        call_price: Call买入价格
+        put_contracts: Put合约数
+        put_price: Put买入价格
+    Returns:
+        余数成本
+    """
+    return monthly_investment - position_value(call_contracts, call_price, put_contracts, put_price)
+
+
+def annualized_return(total_return, total_cost, days):
+    """计算年化收益率（百分比）：((总收益 / 总成本 - 1) / 天数 * 365) * 100
+    Args:
+        total_return: 总收益
+        total_cost: 总成本
+        days: 运行天数
+    Returns:
+        年化收益率（百分比，未取舍）
+    """
+    return ((total_return / total_cost - 1) / days * 365) * 100
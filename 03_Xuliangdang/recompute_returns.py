@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重算总表和月度分表的收益列
+
+由每行的原始数据（期权价格、合约数、余数成本、总成本）重新计算派生列，公式来自 option_math.py，
+与实时记录程序完全一致：
+- 总表 Total Return = 持仓市值 + 当月余数成本 + 上月最后一行的 Total Return
+- 总表 Annual Return 按 CSV 开始日期（总表文件名中的日期）起的运行天数计算
+- 月度分表 总收益 = 持仓市值 + 当月余数成本；年化收益率 按当月第一条记录的日期起的天数计算
+
+总表和全部月度分表各读取一次，按列转换为NumPy数组后一次计算所有月份。
+默认只打印差异；加 --apply 时只重写有变化的文件（未变化的行原样保留），
+并更新总表索引和月份清单中的字节位置。SQLite存储（.db）只更新有变化的行。
+取代原来逐行处理的 fix_annual_return.py、fix_all_annual_return.py、
+fix_all_monthly_annual_return.py 和 fix_historical_total_return.py。
+
+用法：
+    python recompute_returns.py option_trading_20250530.csv            # 打印差异
+    python recompute_returns.py option_trading_20250530.csv --apply    # 写回有变化的行
+    python recompute_returns.py option_trading_20250530.db [--apply]
+"""
+import csv
+import datetime
+import io
+import os
+import re
+import shutil
+import sqlite3
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+import option_math
+from csv_index import get_index_filename
+from month_manifest import MonthManifest, get_manifest_filename
+
+# 数据列位置（总表和月度分表前12列相同）：
+# Date,ETF Price,Call Strike,Put Strike,Call Price,Put Price,Call Qty,Put Qty,Remainder Cost,Total Cost,Total Return,Annual Return,Month
+DATE, CALL_PRICE, PUT_PRICE, CALL_QTY, PUT_QTY, REMAINDER_COST, TOTAL_COST, TOTAL_RETURN, ANNUAL_RETURN, MONTH = \
+    0, 4, 5, 6, 7, 8, 9, 10, 11, 12
+
+# 年化收益率比较的容差（写入时保留4位小数）
+ANNUAL_RETURN_TOLERANCE = 0.00005
+
+# 一个需要修改的单元格：文件、行号（从1开始，含表头）、日期、列名、原值、新值
+Change = namedtuple('Change', ['path', 'line', 'date', 'column', 'old', 'new'])
+
+
+def _to_float(values):
+    """把字符串列转换为浮点数组，无法转换的值为NaN"""
+    try:
+        return np.array(values, dtype=float)
+    except ValueError:
+        result = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                result[i] = float(value)
+            except ValueError:
+                pass
+        return result
+
+
+def _to_dates(values):
+    """把 'YYYY-MM-DD HH:MM:SS' 字符串列转换为日期数组，无法转换的值为NaT"""
+    try:
+        return np.array(values).astype('datetime64[s]').astype('datetime64[D]')
+    except ValueError:
+        result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+        for i, value in enumerate(values):
+            try:
+                result[i] = np.datetime64(value).astype('datetime64[D]')
+            except ValueError:
+                pass
+        return result
+
+
+def to_columns(rows, month=None):
+    """把数据行转换为列数组
+    Args:
+        rows: 数据行列表（不含表头）
+        month: 月度分表的月份；为None时月份取自Month列
+    Returns:
+        dict: 各列数组，'valid' 为原始数据完整的行
+    """
+    width = MONTH + 1 if month is None else ANNUAL_RETURN + 1
+    padded = [row + [''] * (width - len(row)) if len(row) < width else row[:width] for row in rows]
+    fields = list(zip(*padded)) if padded else [()] * width
+    columns = {
+        'date': _to_dates(list(fields[DATE])),
+        'month': np.array(fields[MONTH] if month is None else [month] * len(rows), dtype=str),
+    }
+    for name, position in (('call_price', CALL_PRICE), ('put_price', PUT_PRICE), ('call_qty', CALL_QTY),
+                           ('put_qty', PUT_QTY), ('remainder_cost', REMAINDER_COST), ('total_cost', TOTAL_COST)):
+        columns[name] = _to_float(list(fields[position]))
+    columns['valid'] = ~np.isnat(columns['date']) & (columns['total_cost'] > 0) & (np.char.str_len(columns['month']) > 0)
+    for name in ('call_price', 'put_price', 'call_qty', 'put_qty', 'remainder_cost'):
+        columns['valid'] &= np.isfinite(columns[name])
+    return columns
+
+
+def recompute(columns, start_date=None):
+    """由原始数据列计算收益列
+    Args:
+        columns: to_columns 返回的列数组（行按时间排序）
+        start_date: 总表的CSV开始日期，计算总表收益；为None时按月度分表计算
+    Returns:
+        tuple: (总收益数组, 年化收益率数组)，原始数据不完整的行为NaN
+    """
+    valid = columns['valid']
+    total_return = np.full(len(valid), np.nan)
+    annual_return = np.full(len(valid), np.nan)
+    if not valid.any():
+        return total_return, annual_return
+
+    dates = columns['date'][valid]
+    months = columns['month'][valid]
+    value = np.trunc(option_math.position_value(columns['call_qty'][valid], columns['call_price'][valid],
+                                                columns['put_qty'][valid], columns['put_price'][valid]))
+    monthly_total_return = value + columns['remainder_cost'][valid]
+    _, first, position = np.unique(months, return_index=True, return_inverse=True)
+
+    if start_date is None:
+        returns = monthly_total_return
+        days = (dates - dates[first][position]).astype(int) + 1
+    else:
+        # 上月最后一行的总收益作为当月的基准
+        last = len(months) - 1 - np.unique(months[::-1], return_index=True)[1]
+        previous_months_return = np.r_[0, np.cumsum(monthly_total_return[last])[:-1]]
+        returns = monthly_total_return + previous_months_return[position]
+        days = (dates - np.datetime64(start_date, 'D')).astype(int) + 1
+
+    days = np.maximum(days, 1)
+    total_return[valid] = returns
+    annual_return[valid] = np.round(option_math.annualized_return(returns, columns['total_cost'][valid], days), 4)
+    return total_return, annual_return
+
+
+def _changed(old_total_return, old_annual_return, total_return, annual_return):
+    """比较原值和重算值，返回需要修改的 (列位置, 新值) 列表"""
+    changes = []
+    try:
+        total_return_changed = float(old_total_return) != total_return
+    except ValueError:
+        total_return_changed = True
+    if (total_return_changed):
+        changes.append((TOTAL_RETURN, str(int(total_return))))
+    try:
+        annual_return_changed = abs(float(str(old_annual_return).rstrip('%')) - annual_return) > ANNUAL_RETURN_TOLERANCE
+    except ValueError:
+        annual_return_changed = True
+    if (annual_return_changed):
+        changes.append((ANNUAL_RETURN, f"{float(annual_return)}%"))
+    return changes
+
+
+def diff_rows(rows, total_return, annual_return, path, column_names, line_of):
+    """找出重算后有变化的行
+    Args:
+        rows: 数据行列表
+        total_return / annual_return: recompute 的结果
+        path: 文件路径（用于差异输出）
+        column_names: (总收益列名, 年化收益率列名)，用于差异输出
+        line_of: 数据行下标 -> 行号（CSV）或记录id（SQLite）
+    Returns:
+        tuple: (Change列表, {数据行下标: 修改后的行})
+    """
+    changes, new_rows = [], {}
+    for i in np.flatnonzero(~np.isnan(total_return)).tolist():
+        row = rows[i]
+        cells = _changed(row[TOTAL_RETURN], row[ANNUAL_RETURN], total_return[i], annual_return[i])
+        if not cells:
+            continue
+        new_row = list(row)
+        for position, value in cells:
+            column = column_names[0] if position == TOTAL_RETURN else column_names[1]
+            changes.append(Change(path, line_of(i), row[DATE], column, row[position], value))
+            new_row[position] = value
+        new_rows[i] = new_row
+    return changes, new_rows
+
+
+def parse_master_filename(path):
+    """从总表（或SQLite数据库）文件名解析文件名前缀和CSV开始日期
+    Returns:
+        tuple: (前缀, 'YYYYMMDD')；文件名不符合 <前缀>_YYYYMMDD.csv/.db 时返回 (None, None)
+    """
+    match = re.fullmatch(r'(.+)_(\d{8})\.(csv|db)', os.path.basename(path))
+    return (match.group(1), match.group(2)) if match else (None, None)
+
+
+def find_monthly_files(master_path):
+    """查找与总表同前缀的月度分表
+    Returns:
+        dict: {月份: 文件路径}
+    """
+    prefix, _ = parse_master_filename(master_path)
+    directory = os.path.dirname(os.path.abspath(master_path))
+    pattern = re.compile(re.escape(prefix) + r'_(\d{6})\.csv')
+    monthly_files = {}
+    for name in os.listdir(directory):
+        match = pattern.fullmatch(name)
+        if match:
+            monthly_files[match.group(1)] = os.path.join(directory, name)
+    return monthly_files
+
+
+def _read_csv_lines(path):
+    """读取CSV的原始行（bytes，含换行符）和解析后的数据行（不含表头）"""
+    with open(path, 'rb') as f:
+        lines = f.readlines()
+    rows = list(csv.reader(line.decode('utf-8') for line in lines[1:]))
+    return lines, rows
+
+
+def _format_line(row, original):
+    """按原行的换行符格式化修改后的行"""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\r\n' if original.endswith(b'\r\n') else '\n').writerow(row)
+    return buffer.getvalue().encode('utf-8')
+
+
+def _rewrite_csv(path, lines, new_rows):
+    """备份后重写CSV，只替换有变化的行
+    Returns:
+        dict: {原字节偏移: (新字节偏移, 新长度)}
+    """
+    backup_path = f"{path}.backup_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    shutil.copy2(path, backup_path)
+    offsets = {}
+    old_offset = new_offset = 0
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        for line_number, line in enumerate(lines):
+            new_line = _format_line(new_rows[line_number - 1], line) if line_number - 1 in new_rows else line
+            f.write(new_line)
+            offsets[old_offset] = (new_offset, len(new_line))
+            old_offset += len(line)
+            new_offset += len(new_line)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    print(f"✅ 已更新 {path}（{len(new_rows)} 行），原文件备份为 {backup_path}")
+    return offsets
+
+
+def _update_index(master_path, offsets):
+    """按重写后的字节位置更新总表索引；无法对应时删除索引，下次运行时自动重建"""
+    index_path = get_index_filename(master_path)
+    if not os.path.exists(index_path):
+        return
+    updated = []
+    with open(index_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split(',')
+            if len(parts) != 5 or int(parts[0]) not in offsets:
+                os.remove(index_path)
+                print(f"⚠️ 总表索引与总表不一致，已删除，下次运行时重建: {index_path}")
+                return
+            offset, length = offsets[int(parts[0])]
+            updated.append(f"{offset},{length},{','.join(parts[2:])}\n")
+    with open(index_path, 'w', encoding='utf-8', newline='') as f:
+        f.writelines(updated)
+
+
+def recompute_csv(master_path, apply=False):
+    """重算总表和全部月度分表
+    Args:
+        master_path: 总表CSV路径，文件名为 <前缀>_YYYYMMDD.csv
+        apply: 是否写回有变化的行
+    Returns:
+        list: Change列表
+    """
+    _, start_date = parse_master_filename(master_path)
+    if start_date is None:
+        raise ValueError(f"无法从文件名解析CSV开始日期: {master_path}")
+    start_date = f"{start_date[:4]}-{start_date[4:6]}-{start_date[6:]}"
+
+    tables = [(master_path, None)] + sorted((path, month) for month, path in find_monthly_files(master_path).items())
+    all_changes = []
+    for path, month in tables:
+        if not os.path.exists(path):
+            continue
+        lines, rows = _read_csv_lines(path)
+        if not rows:
+            continue
+        header = next(csv.reader([lines[0].decode('utf-8-sig')]))
+        columns = to_columns(rows, month)
+        total_return, annual_return = recompute(columns, start_date if month is None else None)
+        changes, new_rows = diff_rows(rows, total_return, annual_return, path,
+                                      (header[TOTAL_RETURN], header[ANNUAL_RETURN]), lambda i: i + 2)
+        all_changes.extend(changes)
+        if (apply and new_rows):
+            offsets = _rewrite_csv(path, lines, new_rows)
+            if (month is None):
+                _update_index(path, offsets)
+
+    manifest = MonthManifest(get_manifest_filename(master_path))
+    if (apply and all_changes and manifest.exists()):
+        manifest.rebuild(master_path, find_monthly_files(master_path))
+        print(f"✅ 已重建月份清单 {manifest.path}")
+    return all_changes
+
+
+def recompute_sqlite(db_path, apply=False):
+    """重算SQLite存储中总表和月度分表的收益列，只更新有变化的记录
+    Args:
+        db_path: 数据库路径，文件名为 <前缀>_YYYYMMDD.db
+        apply: 是否写回有变化的记录
+    Returns:
+        list: Change列表
+    """
+    _, start_date = parse_master_filename(db_path)
+    if start_date is None:
+        raise ValueError(f"无法从文件名解析CSV开始日期: {db_path}")
+    start_date = f"{start_date[:4]}-{start_date[4:6]}-{start_date[6:]}"
+
+    conn = sqlite3.connect(db_path)
+    try:
+        records = conn.execute(
+            "SELECT id, date, call_price, put_price, call_qty, put_qty, remainder_cost, total_cost, total_return, "
+            "annual_return, month, monthly_total_cost, monthly_total_return, monthly_annual_return "
+            "FROM ticks ORDER BY date, id").fetchall()
+        ids = [record[0] for record in records]
+
+        def to_row(record, monthly):
+            cost, total_return, annual_return = record[11:14] if monthly else record[7:10]
+            values = [record[1], '', '', ''] + list(record[2:7]) + [cost, total_return, annual_return, record[10]]
+            return ['' if value is None else str(value) for value in values]
+
+        all_changes, updates = [], []
+        for monthly, column_names in ((False, ("total_return", "annual_return")),
+                                      (True, ("monthly_total_return", "monthly_annual_return"))):
+            rows = [to_row(record, monthly) for record in records]
+            total_return, annual_return = recompute(to_columns(rows), None if monthly else start_date)
+            changes, new_rows = diff_rows(rows, total_return, annual_return, db_path, column_names, lambda i: ids[i])
+            all_changes.extend(changes)
+            updates.extend((f"UPDATE ticks SET {column_names[0]} = ?, {column_names[1]} = ? WHERE id = ?",
+                            (int(total_return[i]), f"{float(annual_return[i])}%", ids[i])) for i in new_rows)
+
+        if (apply and updates):
+            with conn:
+                for sql, parameters in updates:
+                    conn.execute(sql, parameters)
+            print(f"✅ 已更新 {db_path}（{len(updates)} 条记录）")
+    finally:
+        conn.close()
+    return all_changes
+
+
+def main(path, apply=False):
+    changes = recompute_sqlite(path, apply) if path.endswith('.db') else recompute_csv(path, apply)
+    counts = {}
+    for change in changes:
+        print(f"{os.path.basename(change.path)}:{change.line} {change.date} {change.column}: {change.old} -> {change.new}")
+        counts[change.path] = counts.get(change.path, 0) + 1
+    if not changes:
+        print("✅ 所有收益列与重算结果一致")
+    for changed_path, count in counts.items():
+        print(f"📊 {changed_path}: {count} 处差异")
+    if (changes and not apply):
+        print("使用 --apply 写回")
+
+
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if argument != '--apply']
+    if (len(arguments) != 1):
+        print("用法: python recompute_returns.py <总表CSV或SQLite数据库> [--apply]")
+        sys.exit(1)
+    main(arguments[0], '--apply' in sys.argv[1:])
@@ -0,0 +1,133 @@
+"""
+交易日历感知的调度器
+
+根据交易时段和交易日计算下一次精确的唤醒时间：
+- 交易时段内：下一个按整点对齐的采样时刻（例如每分钟的第0秒）
+- 时段收盘：采样间隔不能整除时段长度时，在收盘时刻补一次采样
+- 非交易时段/非交易日：下一个交易时段的开盘时刻
+
+休眠按截止时刻计算剩余时间并分段进行，不会因为每轮处理耗时而逐渐偏离整分钟。
+"""
+import datetime
+import time
+
+# 默认采样间隔（秒）
+SAMPLING_INTERVAL = 60
+
+# 单次休眠的最长时间（秒），长时间休眠分段进行，以便及时修正系统时间变化
+MAX_SLEEP_CHUNK = 300
+
+# 查找下一个开盘时刻时最多向后查找的天数
+MAX_LOOKAHEAD_DAYS = 60
+
+
+class TradingScheduler:
+    """按交易时段和采样间隔计算唤醒时间的调度器"""
+
+    def __init__(self, trading_hours, is_trading_day, interval=SAMPLING_INTERVAL,
+                 clock=datetime.datetime.now, sleeper=time.sleep):
+        """
+        Args:
+            trading_hours: 交易时段列表 [(start_h, start_m, end_h, end_m), ...]，收盘分钟包含在内
+            is_trading_day: 判断日期是否为交易日的函数 is_trading_day(date) -> bool
+            interval: 采样间隔（秒），按当天0点对齐
+            clock: 获取当前时间的函数
+            sleeper: 休眠函数
+        """
+        self.trading_hours = sorted(trading_hours)
+        self.is_trading_day = is_trading_day
+        self.interval = interval
+        self.clock = clock
+        self.sleeper = sleeper
+
+    def _sessions(self, date):
+        """获取某天的交易时段 [(开盘时刻, 收盘时刻), ...]，收盘时刻为收盘分钟的最后一秒"""
+        day_start = datetime.datetime.combine(date, datetime.time())
+        return [(day_start + datetime.timedelta(hours=start_h, minutes=start_m),
+                 day_start + datetime.timedelta(hours=end_h, minutes=end_m, seconds=59))
+                for start_h, start_m, end_h, end_m in self.trading_hours]
+
+    def current_session(self, now):
+        """获取当前所处的交易时段
+        Args:
+            now: 当前时间
+        Returns:
+            tuple: (开盘时刻, 收盘时刻)，不在交易时段时返回None
+        """
+        if not self.is_trading_day(now.date()):
+            return None
+        for session_open, session_close in self._sessions(now.date()):
+            if session_open <= now <= session_close:
+                return session_open, session_close
+        return None
+
+    def in_session(self, now):
+        """判断当前是否在交易时段内"""
+        return self.current_session(now) is not None
+
+    def next_session_open(self, now):
+        """获取严格晚于now的下一个开盘时刻
+        Args:
+            now: 当前时间
+        Returns:
+            datetime: 下一个开盘时刻，找不到时返回None
+        """
+        for offset in range(MAX_LOOKAHEAD_DAYS):
+            date = now.date() + datetime.timedelta(days=offset)
+            if not self.is_trading_day(date):
+                continue
+            for session_open, _ in self._sessions(date):
+                if session_open > now:
+                    return session_open
+        return None
+
+    def next_sample_time(self, now):
+        """获取严格晚于now、按采样间隔对齐的下一个采样时刻（不考虑交易时段）"""
+        day_start = datetime.datetime.combine(now.date(), datetime.time())
+        elapsed = (now - day_start).total_seconds()
+        slots = int(elapsed // self.interval) + 1
+        return day_start + datetime.timedelta(seconds=slots * self.interval)
+
+    def next_wakeup(self, now=None):
+        """计算下一次唤醒时间
+        Args:
+            now: 当前时间，默认取时钟
+        Returns:
+            tuple: (唤醒时刻, 原因)，原因为 'sample'、'close' 或 'open'
+        """
+        if now is None:
+            now = self.clock()
+        session = self.current_session(now)
+        if session is not None:
+            _, session_close = session
+            next_sample = self.next_sample_time(now)
+            if next_sample <= session_close:
+                return next_sample, 'sample'
+            # 收盘分钟的起点，若尚未在该时刻采样过则补一次收盘采样
+            close_minute = session_close.replace(second=0)
+            if now < close_minute:
+                return close_minute, 'close'
+        return self.next_session_open(now), 'open'
+
+    def sleep_until(self, target):
+        """休眠到指定时刻，分段休眠并在每段后按时钟重新计算剩余时间
+        Args:
+            target: 目标时刻
+        """
+        while True:
+            remaining = (target - self.clock()).total_seconds()
+            if remaining <= 0:
+                return
+            self.sleeper(min(remaining, MAX_SLEEP_CHUNK))
+
+    def wait_next(self):
+        """休眠到下一次唤醒时间
+        Returns:
+            tuple: (唤醒时刻, 原因)
+        """
+        target, reason = self.next_wakeup()
+        if target is None:
+            # 日历中找不到后续交易日，退化为等待一个采样间隔
+            target = self.clock() + datetime.timedelta(seconds=self.interval)
+        self.sleep_until(target)
+        return target, reason
@@ -0,0 +1,369 @@
+"""
+新浪行情批量查询客户端
+
+hq.sinajs.cn 的 list= 参数支持逗号分隔的多个代码，一次请求即可同时取回
+CON_OP_*（期权行情）、CON_SO_*（期权希腊字母/行权价）、OP_UP_/OP_DOWN_（合约列表）
+以及 s_sh510050（ETF简要行情）等多个品种，避免每个品种单独发起一次HTTP请求。
+
+所有请求共用一个保持长连接的 Session（带连接池），避免每次请求都重新建立TCP连接。
+
+fetch_quote_legs 基于 asyncio 并发发出多路请求（例如一个tick的Call、Put、ETF三条腿），
+每个请求都有截止时间，总耗时取决于最慢的单个请求而不是各请求耗时之和。
+
+prefetch_quotes 在一个采样时刻开始时一次取回多个调用方（例如多标的模式下的各个标的）需要的行情，
+之后 fetch_quotes 对已预取的代码直接返回预取结果（每条只使用一次），不再单独发起请求。
+
+行情和期权接口地址可以用环境变量 SINA_HQ_BASE_URL、SINA_OPTION_API_URL 改为本地模拟服务器
+（见 sina_stub_server.py），也可以在运行时直接修改 HQ_BASE_URL、OPTION_API_BASE_URL。
+
+requests、asyncio 和线程池在首次发起请求时才导入，只使用解析函数或 OptionQuote 的脚本导入本模块不需要加载它们。
+"""
+import os
+import re
+import threading
+
+# 网络请求失败时抛出的异常：requests.RequestException 继承自 OSError，
+# 调用方捕获 RequestError 即可，不需要为此在导入时加载 requests
+RequestError = OSError
+
+# 新浪行情接口地址
+HQ_BASE_URL = os.environ.get("SINA_HQ_BASE_URL", "http://hq.sinajs.cn")
+
+# 新浪期权接口地址（到期日查询 StockOptionService.getRemainderDay）
+OPTION_API_BASE_URL = os.environ.get("SINA_OPTION_API_URL",
+                                     "http://stock.finance.sina.com.cn/futures/api/openapi.php")
+
+# Sina API headers（不再强制 Connection: close，以便复用连接）
+HEADERS = {"Referer": "http://finance.sina.com.cn/"}
+
+# 连接超时与读取超时（秒）
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+
+# 连接池参数：缓存的主机连接池数量，以及每个主机的最大连接数
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 4
+
+# 单次请求最多包含的代码数量，超出部分自动拆分为多次请求
+MAX_SYMBOLS_PER_REQUEST = 100
+
+# 并发获取一个tick时的截止时间（秒），超时未返回的腿视为获取失败
+TICK_DEADLINE = 8.0
+
+# 响应格式: var hq_str_CON_OP_10008123="字段1,字段2,...";
+_QUOTE_PATTERN = re.compile(r'var hq_str_([A-Za-z0-9_]+)="([^"]*)"')
+
+
+_session = None
+_session_lock = threading.Lock()
+_executor = None
+
+# 本轮预取的行情 {代码: 字段列表}，None表示没有预取
+_prefetched = None
+
+
+def get_session():
+    """获取共享的长连接Session（首次调用时创建）
+    Returns:
+        Session: 带连接池的共享Session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                from requests import Session
+                from requests.adapters import HTTPAdapter
+                session = Session()
+                session.trust_env = False  # 忽略代理环境变量，等同于 proxies={'http': None, 'https': None}
+                session.headers.update(HEADERS)
+                # pool_block=True 保证每个主机的并发连接数不超过 POOL_MAXSIZE
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, pool_block=True)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def close_session():
+    """关闭共享Session并释放连接池中的连接"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def configure_session(connect_timeout=None, read_timeout=None, pool_connections=None, pool_maxsize=None):
+    """修改超时和连接池参数，连接池参数变化时会重建共享Session
+    Args:
+        connect_timeout: 连接超时秒数
+        read_timeout: 读取超时秒数
+        pool_connections: 缓存的主机连接池数量
+        pool_maxsize: 每个主机的最大连接数
+    """
+    global CONNECT_TIMEOUT, READ_TIMEOUT, POOL_CONNECTIONS, POOL_MAXSIZE
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+    if pool_connections is not None or pool_maxsize is not None:
+        if pool_connections is not None:
+            POOL_CONNECTIONS = pool_connections
+        if pool_maxsize is not None:
+            POOL_MAXSIZE = pool_maxsize
+        close_session()
+
+
+def http_get(url, timeout=None, **kwargs):
+    """通过共享Session发起GET请求
+    Args:
+        url: 请求URL
+        timeout: 超时设置，默认使用 (CONNECT_TIMEOUT, READ_TIMEOUT)
+    Returns:
+        Response: 响应对象
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+
+# CON_OP_ 期权行情字段（按接口返回顺序）
+OPTION_QUOTE_FIELDS = ['Volume Bid', 'Price Bid', 'Latest Price', 'Price Ask', 'Volume Ask', 'Open Interest', 'Price Change',
+                       'Strike Price', 'Previous Close', 'Open', 'Upper Limit', 'Lower Limit', 'Ask Price 5', 'Ask Volume 5',
+                       'Ask Price 4', 'Ask Volume 4', 'Ask Price 3', 'Ask Volume 3', 'Ask Price 2', 'Ask Volume 2',
+                       'Ask Price 1', 'Ask Volume 1', 'Bid Price 1', 'Bid Volume 1', 'Bid Price 2', 'Bid Volume 2',
+                       'Bid Price 3', 'Bid Volume 3', 'Bid Price 4', 'Bid Volume 4', 'Bid Price 5', 'Bid Volume 5',
+                       'Quote Time', 'Main Contract', 'Status Code', 'Underlying Type', 'Underlying Stock',
+                       'Option Name', 'Amplitude', 'High', 'Low', 'Volume', 'Amount', 'Dividend Adjustment',
+                       'Previous Settlement', 'Option Type', 'Expiry Date', 'Days to Expiry', 'Moneyness',
+                       'Intrinsic Value', 'Time Value']
+
+# 字段名（含中文别名）-> 字段下标，模块加载时计算一次
+OPTION_QUOTE_FIELD_INDEX = {name: index for index, name in enumerate(OPTION_QUOTE_FIELDS)}
+OPTION_QUOTE_FIELD_INDEX.update({
+    "最新价": OPTION_QUOTE_FIELD_INDEX['Latest Price'],
+    "行权价": OPTION_QUOTE_FIELD_INDEX['Strike Price'],
+    "买价": OPTION_QUOTE_FIELD_INDEX['Price Bid'],
+    "卖价": OPTION_QUOTE_FIELD_INDEX['Price Ask'],
+})
+
+_LATEST_PRICE = OPTION_QUOTE_FIELD_INDEX['Latest Price']
+_PRICE_BID = OPTION_QUOTE_FIELD_INDEX['Price Bid']
+_PRICE_ASK = OPTION_QUOTE_FIELD_INDEX['Price Ask']
+_STRIKE_PRICE = OPTION_QUOTE_FIELD_INDEX['Strike Price']
+
+
+class OptionQuote:
+    """一条期权行情记录（CON_OP_），按下标O(1)读取字段"""
+
+    __slots__ = ('values', '_floats')
+
+    def __init__(self, values):
+        """
+        Args:
+            values: 接口返回的字段值列表
+        """
+        self.values = values
+        self._floats = {}
+
+    def get(self, field, default=None):
+        """按字段名读取原始字符串值
+        Args:
+            field: 字段名，例如 'Latest Price' 或 '最新价'
+            default: 字段不存在或为空时的返回值
+        Returns:
+            str: 字段值
+        """
+        index = OPTION_QUOTE_FIELD_INDEX.get(field)
+        if index is None or index >= len(self.values) or not self.values[index]:
+            return default
+        return self.values[index]
+
+    def _float_at(self, index):
+        """读取数值字段，同一字段只转换一次"""
+        if index in self._floats:
+            return self._floats[index]
+        try:
+            value = float(self.values[index])
+        except (IndexError, ValueError):
+            value = None
+        self._floats[index] = value
+        return value
+
+    def get_float(self, field):
+        """按字段名读取数值，缺失或无效时返回None"""
+        index = OPTION_QUOTE_FIELD_INDEX.get(field)
+        return None if index is None else self._float_at(index)
+
+    @property
+    def latest_price(self):
+        return self._float_at(_LATEST_PRICE)
+
+    @property
+    def bid_price(self):
+        return self._float_at(_PRICE_BID)
+
+    @property
+    def ask_price(self):
+        return self._float_at(_PRICE_ASK)
+
+    @property
+    def strike_price(self):
+        return self._float_at(_STRIKE_PRICE)
+
+    @property
+    def quote_time(self):
+        return self.get('Quote Time')
+
+    def as_dict(self):
+        """转换为 {字段名: 值} 字典，用于调试输出"""
+        return dict(zip(OPTION_QUOTE_FIELDS, self.values))
+
+    def __repr__(self):
+        return f"OptionQuote(latest_price={self.get('Latest Price')}, strike_price={self.get('Strike Price')})"
+
+
+def build_quote_url(symbols):
+    """生成批量行情请求URL
+    Args:
+        symbols: 代码列表，例如 ['CON_OP_10008123', 's_sh510050']
+    Returns:
+        str: 请求URL
+    """
+    return f"{HQ_BASE_URL}/list={','.join(symbols)}"
+
+
+def build_remainder_day_url(month, cate, exchange='null'):
+    """生成期权到期日查询URL
+    Args:
+        month: 月份，格式YYYYMM
+        cate: 品种，例如 '50ETF' 或 'XD50ETF'
+        exchange: 交易所
+    Returns:
+        str: 请求URL
+    """
+    return (f"{OPTION_API_BASE_URL}/StockOptionService.getRemainderDay?"
+            f"exchange={exchange}&cate={cate}&date={month[:4]}-{month[4:]}")
+
+
+def parse_quote_response(text):
+    """解析批量行情响应
+    Args:
+        text: 已解码的响应文本
+    Returns:
+        dict: {代码: 字段列表}，无数据的代码对应空列表
+    """
+    quotes = {}
+    for symbol, content in _QUOTE_PATTERN.findall(text):
+        quotes[symbol] = content.split(',') if content else []
+    return quotes
+
+
+def fetch_quotes(symbols, timeout=None):
+    """一次往返获取多个代码的行情
+    Args:
+        symbols: 代码列表，重复的代码只请求一次
+        timeout: 超时设置，默认使用 (CONNECT_TIMEOUT, READ_TIMEOUT)
+    Returns:
+        dict: {代码: 字段列表}，响应中缺失的代码不会出现在结果中
+    Raises:
+        RequestError: 网络请求失败
+        UnicodeDecodeError: 响应解码失败
+    """
+    unique_symbols = list(dict.fromkeys(symbols))
+    quotes = {}
+    prefetched = _prefetched
+    if prefetched:
+        # 已预取的代码直接使用预取结果，取出后删除，重试时会重新请求最新行情
+        missing_symbols = []
+        for symbol in unique_symbols:
+            data = prefetched.pop(symbol, None)
+            if data:
+                quotes[symbol] = data
+            else:
+                missing_symbols.append(symbol)
+        unique_symbols = missing_symbols
+    for start in range(0, len(unique_symbols), MAX_SYMBOLS_PER_REQUEST):
+        chunk = unique_symbols[start:start + MAX_SYMBOLS_PER_REQUEST]
+        response = http_get(build_quote_url(chunk), timeout=timeout)
+        response.raise_for_status()
+        quotes.update(parse_quote_response(response.content.decode('gbk')))
+    return quotes
+
+
+def prefetch_quotes(symbols, timeout=None):
+    """一次批量请求预取多个代码的行情，供之后的 fetch_quotes 使用
+    Args:
+        symbols: 代码列表
+        timeout: 超时设置，默认使用 (CONNECT_TIMEOUT, READ_TIMEOUT)
+    Returns:
+        int: 预取到的代码数量，请求失败时返回0（之后的 fetch_quotes 照常单独请求）
+    """
+    global _prefetched
+    clear_prefetched()
+    try:
+        quotes = fetch_quotes(symbols, timeout=timeout)
+    except (RequestError, UnicodeDecodeError) as e:
+        print(f"Failed to prefetch quotes: {str(e)}")
+        return 0
+    _prefetched = quotes
+    return len(quotes)
+
+
+def clear_prefetched():
+    """丢弃尚未使用的预取行情"""
+    global _prefetched
+    _prefetched = None
+
+
+def _get_executor():
+    """获取并发请求使用的线程池（首次调用时创建）"""
+    global _executor
+    if _executor is None:
+        with _session_lock:
+            if _executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _executor = ThreadPoolExecutor(max_workers=POOL_MAXSIZE, thread_name_prefix='sina-quote')
+    return _executor
+
+
+async def fetch_quote_legs_async(legs, deadline=TICK_DEADLINE):
+    """并发获取多条腿的行情，在截止时间内组装结果
+    Args:
+        legs: {腿名称: 代码列表}，每条腿单独发起一次请求
+        deadline: 截止时间（秒），同时作为每个请求的读取超时
+    Returns:
+        dict: {腿名称: {代码: 字段列表}}，失败或超时的腿对应None
+    """
+    if not legs:
+        return {}
+    import asyncio
+    loop = asyncio.get_running_loop()
+    timeout = (min(CONNECT_TIMEOUT, deadline), deadline)
+    futures = {leg: loop.run_in_executor(_get_executor(), fetch_quotes, symbols, timeout)
+               for leg, symbols in legs.items()}
+    done, pending = await asyncio.wait(futures.values(), timeout=deadline)
+    for future in pending:
+        future.cancel()
+
+    result = {}
+    for leg, future in futures.items():
+        if future in done and future.exception() is None:
+            result[leg] = future.result()
+        else:
+            reason = "timeout" if future not in done else str(future.exception())
+            print(f"Failed to get quotes for {leg}: {reason}")
+            result[leg] = None
+    return result
+
+
+def fetch_quote_legs(legs, deadline=TICK_DEADLINE):
+    """fetch_quote_legs_async 的同步入口
+    Args:
+        legs: {腿名称: 代码列表}
+        deadline: 截止时间（秒）
+    Returns:
+        dict: {腿名称: {代码: 字段列表}}，失败或超时的腿对应None
+    """
+    import asyncio
+    return asyncio.run(fetch_quote_legs_async(legs, deadline))
@@ -0,0 +1,374 @@
+"""
+本地新浪行情模拟服务器
+
+在本机提供与新浪接口格式相同的行情服务，用于离线运行、压测和延迟测试：
+- /list=代码1,代码2,...（hq.sinajs.cn）：OP_UP_/OP_DOWN_ 合约列表、CON_OP_ 期权行情、
+  CON_SO_ 期权行权价、s_sh510050 等ETF简要行情，GBK编码
+- /futures/api/openapi.php/StockOptionService.getRemainderDay：期权到期日和剩余天数（JSON）
+
+行情数据默认按标的价格和行权价合成（ETF价格随时间缓慢波动，期权价格为内在价值加时间价值），
+也可以回放录制的数据（见 load_recording）。可配置固定延迟、随机抖动、错误率和限流（每秒请求数），
+用于复现网络慢、接口报错和被限流的情况。
+
+用法：
+    python sina_stub_server.py --port 8765 --latency 0.05 --jitter 0.02 --error-rate 0.01 --throttle 20
+    SINA_HQ_BASE_URL=http://127.0.0.1:8765 \\
+    SINA_OPTION_API_URL=http://127.0.0.1:8765/futures/api/openapi.php python XuTwo.py
+"""
+import argparse
+import datetime
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from option_expiry import expiry_date
+from sina_quote import OPTION_QUOTE_FIELDS, OPTION_QUOTE_FIELD_INDEX
+
+# 合成行情的标的：代码 -> (ETF简要行情代码, 名称, 基准价格)
+UNDERLYINGS = {
+    "510050": ("s_sh510050", "50ETF", 2.9),
+    "510300": ("s_sh510300", "300ETF", 3.9),
+    "510500": ("s_sh510500", "500ETF", 5.8),
+    "588000": ("s_sh588000", "科创50", 0.95),
+}
+
+# 每个到期月份在平值上下各挂牌的行权价档数
+STRIKES_EACH_SIDE = 6
+
+# 合成ETF价格的波动幅度和周期（秒）
+ETF_PRICE_AMPLITUDE = 0.02
+ETF_PRICE_PERIOD = 4 * 3600
+
+# 合成期权价格使用的年化波动率
+VOLATILITY = 0.2
+
+# 期权接口的路径
+REMAINDER_DAY_PATH = "/futures/api/openapi.php/StockOptionService.getRemainderDay"
+
+# CON_SO_ 行情中行权价的字段位置
+CON_SO_STRIKE_INDEX = 13
+
+
+def strike_step(price):
+    """上交所ETF期权的行权价间隔：3元以下0.05，3~5元0.1，5~10元0.25"""
+    if (price < 3):
+        return 0.05
+    if (price < 5):
+        return 0.1
+    return 0.25
+
+
+def load_recording(path):
+    """读取录制的行情数据
+    格式：{"quotes": {代码: 行情内容字符串 或 内容字符串列表}, "expire_days": {"YYYY-MM": "YYYY-MM-DD"}}
+    列表按请求次数依次回放，回放到最后一条后从头循环。
+    Returns:
+        dict: 录制数据
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        recording = json.load(f)
+    recording.setdefault('quotes', {})
+    recording.setdefault('expire_days', {})
+    return recording
+
+
+class QuoteBook:
+    """合成或回放的行情数据"""
+
+    def __init__(self, recording=None, clock=time.time, today=None):
+        """
+        Args:
+            recording: load_recording 返回的录制数据，其中的代码优先回放
+            clock: 当前时间函数，决定合成的ETF价格
+            today: 计算剩余天数的日期函数，默认为 datetime.date.today
+        """
+        self.recording = recording or {'quotes': {}, 'expire_days': {}}
+        self.clock = clock
+        self.today = today or datetime.date.today
+        self._replay_positions = {}
+        self._contracts = {}  # 期权代码 -> (标的代码, 月份YYMM, 'C'/'P', 行权价)
+        self._chains = {}  # (标的代码, 月份YYMM) -> (Call代码列表, Put代码列表)
+        self._lock = threading.Lock()
+
+    def etf_price(self, code):
+        _, _, base_price = UNDERLYINGS[code]
+        phase = 2 * math.pi * (self.clock() % ETF_PRICE_PERIOD) / ETF_PRICE_PERIOD
+        return round(base_price * (1 + ETF_PRICE_AMPLITUDE * math.sin(phase)), 3)
+
+    def expire_date(self, year, month):
+        recorded = self.recording['expire_days'].get(f"{year}-{month:02d}")
+        if recorded:
+            return datetime.datetime.strptime(recorded, "%Y-%m-%d").date()
+        return expiry_date(year, month)
+
+    def chain(self, code, yymm):
+        """按标的基准价格生成（或取已生成的）某月的期权合约列表
+        Returns:
+            tuple: (Call代码列表, Put代码列表)
+        """
+        with self._lock:
+            if (code, yymm) not in self._chains:
+                price = UNDERLYINGS[code][2]
+                step = strike_step(price)
+                atm = round(price / step) * step
+                strikes = [round(atm + i * step, 3) for i in range(-STRIKES_EACH_SIDE, STRIKES_EACH_SIDE + 1)]
+                codes = ([], [])
+                for option_type, code_list in zip("CP", codes):
+                    for strike in strikes:
+                        option_code = str(10000001 + len(self._contracts))
+                        self._contracts[option_code] = (code, yymm, option_type, strike)
+                        code_list.append(option_code)
+                self._chains[(code, yymm)] = codes
+            return self._chains[(code, yymm)]
+
+    def option_price(self, option_code):
+        code, yymm, option_type, strike = self._contracts[option_code]
+        etf_price = self.etf_price(code)
+        days = max((self.expire_date(2000 + int(yymm[:2]), int(yymm[2:])) - self.today()).days, 1)
+        deviation = etf_price * VOLATILITY * math.sqrt(days / 365)
+        intrinsic = max(etf_price - strike, 0) if option_type == 'C' else max(strike - etf_price, 0)
+        time_value = 0.4 * deviation * math.exp(-0.5 * ((etf_price - strike) / deviation) ** 2)
+        return max(round(intrinsic + time_value, 4), 0.0001)
+
+    def _option_name(self, option_code):
+        code, yymm, option_type, strike = self._contracts[option_code]
+        return f"{UNDERLYINGS[code][1]}{'购' if option_type == 'C' else '沽'}{int(yymm[2:])}月{int(round(strike * 1000))}"
+
+    def _synthetic(self, symbol):
+        if symbol.startswith(("OP_UP_", "OP_DOWN_")):
+            body = symbol.split("_", 2)[2]
+            code, yymm = body[:-4], body[-4:]
+            if code not in UNDERLYINGS:
+                return ""
+            calls, puts = self.chain(code, yymm)
+            codes = calls if symbol.startswith("OP_UP_") else puts
+            return "".join(f"CON_OP_{option_code}," for option_code in codes)
+        if symbol.startswith("CON_OP_"):
+            option_code = symbol[7:]
+            if option_code not in self._contracts:
+                return ""
+            price = self.option_price(option_code)
+            fields = {
+                'Volume Bid': "10", 'Price Bid': f"{max(price - 0.0001, 0.0001):.4f}", 'Latest Price': f"{price:.4f}",
+                'Price Ask': f"{price + 0.0001:.4f}", 'Volume Ask': "10", 'Open Interest': "1000",
+                'Strike Price': f"{self._contracts[option_code][3]:.3f}",
+                'Quote Time': datetime.datetime.fromtimestamp(self.clock()).strftime("%Y-%m-%d %H:%M:%S"),
+                'Option Name': self._option_name(option_code),
+            }
+            values = [""] * len(OPTION_QUOTE_FIELDS)
+            for name, value in fields.items():
+                values[OPTION_QUOTE_FIELD_INDEX[name]] = value
+            return ",".join(values)
+        if symbol.startswith("CON_SO_"):
+            option_code = symbol[7:]
+            if option_code not in self._contracts:
+                return ""
+            values = [self._option_name(option_code)] + [""] * 16
+            values[CON_SO_STRIKE_INDEX] = f"{self._contracts[option_code][3]:.4f}"
+            return ",".join(values)
+        for code, (etf_symbol, name, _) in UNDERLYINGS.items():
+            if (symbol == etf_symbol):
+                return f"{name},{self.etf_price(code):.3f},0.000,0.00,100000,30000"
+        return ""
+
+    def quote(self, symbol):
+        """获取一个代码的行情内容（hq_str_ 引号中的部分），未知代码返回空字符串"""
+        recorded = self.recording['quotes'].get(symbol)
+        if recorded is None:
+            return self._synthetic(symbol)
+        if isinstance(recorded, str):
+            return recorded
+        with self._lock:
+            position = self._replay_positions.get(symbol, 0)
+            self._replay_positions[symbol] = position + 1
+        return recorded[position % len(recorded)]
+
+    def remainder_day(self, cate, month):
+        """getRemainderDay 的返回数据
+        Args:
+            cate: 品种
+            month: 月份 "YYYY-MM"
+        """
+        year, month_number = (int(part) for part in month.split("-"))
+        expire = self.expire_date(year, month_number)
+        return {"result": {"status": {"code": 0}, "data": {
+            "expireDay": expire.strftime("%Y-%m-%d"),
+            "remainderDays": (expire - self.today()).days,
+            "cateId": cate,
+        }}}
+
+
+class FaultConfig:
+    """延迟、错误和限流设置"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle=None, seed=None):
+        """
+        Args:
+            latency: 每个请求的固定延迟（秒）
+            jitter: 随机抖动（秒），实际延迟在 latency ± jitter 之间
+            error_rate: 返回HTTP 500的概率
+            throttle: 每秒允许的请求数，超出时返回HTTP 403；None表示不限流
+            seed: 随机数种子
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle = throttle
+        self.random = random.Random(seed)
+        self._tokens = throttle or 0
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            return max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0)
+
+    def should_fail(self):
+        with self._lock:
+            return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    def allow(self):
+        """令牌桶限流，桶容量为每秒请求数"""
+        if not self.throttle:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.throttle, self._tokens + (now - self._refilled_at) * self.throttle)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.count('requests')
+        faults = server.faults
+        if not faults.allow():
+            server.count('throttled')
+            self._send(403, b"Forbidden", "text/plain")
+            return
+        delay = faults.delay()
+        if delay:
+            time.sleep(delay)
+        if faults.should_fail():
+            server.count('errors')
+            self._send(500, b"", "text/plain")
+            return
+
+        url = urlsplit(self.path)
+        if url.path.startswith("/list="):
+            symbols = [symbol for symbol in unquote(url.path[len("/list="):]).split(",") if symbol]
+            server.count('symbols', len(symbols))
+            text = "".join(f'var hq_str_{symbol}="{server.book.quote(symbol)}";\n' for symbol in symbols)
+            self._send(200, text.encode('gbk'), "application/javascript; charset=GBK")
+        elif url.path == REMAINDER_DAY_PATH:
+            query = parse_qs(url.query)
+            data = server.book.remainder_day(query.get('cate', [''])[0], query.get('date', [''])[0])
+            self._send(200, json.dumps(data).encode('utf-8'), "application/json")
+        else:
+            self._send(404, b"Not Found", "text/plain")
+
+
+class SinaStubServer(ThreadingHTTPServer):
+    """本地新浪行情模拟服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, book=None, faults=None, verbose=False):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            book: QuoteBook，默认合成行情
+            faults: FaultConfig，默认无延迟、无错误、不限流
+            verbose: 是否打印每个请求
+        """
+        super().__init__((host, port), _Handler)
+        self.book = book or QuoteBook()
+        self.faults = faults or FaultConfig()
+        self.verbose = verbose
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'symbols': 0}
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+    def count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    @property
+    def hq_base_url(self):
+        """对应 sina_quote.HQ_BASE_URL"""
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    @property
+    def option_api_url(self):
+        """对应 sina_quote.OPTION_API_BASE_URL"""
+        return f"{self.hq_base_url}/futures/api/openapi.php"
+
+    def start(self):
+        """在后台线程中运行服务器
+        Returns:
+            SinaStubServer: self
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name='sina-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器并关闭监听端口"""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地新浪行情模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回HTTP 500的概率")
+    parser.add_argument("--throttle", type=float, default=None, help="每秒允许的请求数，超出返回HTTP 403")
+    parser.add_argument("--replay", default=None, help="回放的录制数据文件（JSON）")
+    parser.add_argument("--seed", type=int, default=None, help="随机数种子")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求")
+    args = parser.parse_args()
+
+    book = QuoteBook(load_recording(args.replay) if args.replay else None)
+    faults = FaultConfig(args.latency, args.jitter, args.error_rate, args.throttle, args.seed)
+    server = SinaStubServer(args.host, args.port, book, faults, args.verbose)
+    print(f"✅ 模拟服务器已启动: SINA_HQ_BASE_URL={server.hq_base_url} "
+          f"SINA_OPTION_API_URL={server.option_api_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 请求统计: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
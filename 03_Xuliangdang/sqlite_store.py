@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite交易数据存储（WAL模式）
+
+每个采样时刻的交易数据（总表字段 + 月度分表字段）和程序状态在同一个事务中提交，
+不会出现CSV写了一半、状态文件没更新的情况。总表CSV和月度分表CSV作为派生视图按需导出。
+
+用法：
+    python sqlite_store.py <数据库文件> master <输出CSV>
+    python sqlite_store.py <数据库文件> monthly <YYYYMM> <输出CSV>
+"""
+import csv
+import datetime
+import json
+import sqlite3
+import sys
+
+from csv_index import IndexEntry
+
+MASTER_HEADER = ["Date", "ETF Price", "Call Strike", "Put Strike", "Call Price", "Put Price",
+                 "Call Qty", "Put Qty", "Remainder Cost", "Total Cost", "Total Return", "Annual Return", "Month"]
+
+MONTHLY_HEADER = ["日期", "ETF 价格", "Call 行权价", "Put 行权价", "Call 价格", "Put 价格",
+                  "Call 数量", "Put 数量", "余数成本", "总成本", "总收益", "年化收益率"]
+
+# 总表列对应的数据库字段
+MASTER_COLUMNS = ["date", "etf_price", "call_strike", "put_strike", "call_price", "put_price",
+                  "call_qty", "put_qty", "remainder_cost", "total_cost", "total_return", "annual_return", "month"]
+
+# 月度分表中与总表不同的三列
+MONTHLY_COLUMNS = ["monthly_total_cost", "monthly_total_return", "monthly_annual_return"]
+
+# 数值列不声明类型，按写入时的类型原样保存，导出的CSV与直接写入的CSV内容一致
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ticks (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    month TEXT NOT NULL,
+    remainder_days INTEGER,
+    etf_price,
+    call_strike,
+    put_strike,
+    call_price,
+    put_price,
+    call_qty,
+    put_qty,
+    remainder_cost,
+    total_cost,
+    total_return,
+    annual_return TEXT,
+    monthly_total_cost,
+    monthly_total_return,
+    monthly_annual_return TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ticks_month_remainder ON ticks (month, remainder_days, date);
+CREATE INDEX IF NOT EXISTS idx_ticks_date ON ticks (date);
+CREATE TABLE IF NOT EXISTS state (
+    month TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+class TradeStore:
+    """交易数据和程序状态的SQLite存储，查询接口与总表索引 MasterCsvIndex 一致"""
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL模式下FULL才会在每次提交时fsync
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _write_state(self, month, state):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO state (month, data, updated_at) VALUES (?, ?, ?)",
+            (month, json.dumps(state, ensure_ascii=False),
+             datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+    def record_tick(self, master_row, monthly_row, remainder_days, state=None, state_month=None):
+        """在一个事务中写入一个采样时刻的交易数据和程序状态
+        Args:
+            master_row: 总表数据行（英文表头顺序，最后一列为月份）
+            monthly_row: 月度分表数据行（中文表头顺序）
+            remainder_days: 写入时的剩余天数
+            state: 同一事务中保存的程序状态，None表示不更新状态
+            state_month: 状态所属月份，默认为数据行的月份
+        """
+        values = dict(zip(MASTER_COLUMNS, master_row))
+        values['remainder_days'] = remainder_days
+        values.update(zip(MONTHLY_COLUMNS, monthly_row[9:12]))
+        columns = list(values)
+        with self.conn:
+            self.conn.execute(
+                f"INSERT INTO ticks ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [values[column] for column in columns])
+            if state is not None:
+                self._write_state(state_month or str(values['month']), state)
+
+    def save_state(self, month, state):
+        """保存程序状态
+        Args:
+            month: 状态所属月份 YYYYMM
+            state: 状态字典
+        """
+        with self.conn:
+            self._write_state(month, state)
+
+    def load_state(self, month):
+        """读取程序状态，没有时返回None"""
+        row = self.conn.execute("SELECT data FROM state WHERE month = ?", (month,)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def _entry(self, row):
+        return IndexEntry(row['id'], 0, row['date'], row['month'], row['remainder_days'])
+
+    def read_row(self, entry):
+        """读取索引对应的数据行
+        Args:
+            entry: IndexEntry，offset为数据库行号
+        Returns:
+            dict: 以总表表头为键的数据行（值为CSV中的文本形式）
+        """
+        row = self.conn.execute(
+            f"SELECT {', '.join(MASTER_COLUMNS)} FROM ticks WHERE id = ?", (entry.offset,)).fetchone()
+        return {header: str(row[column]) for header, column in zip(MASTER_HEADER, MASTER_COLUMNS)}
+
+    def entries_for_remainder(self, month, remainder_days):
+        """获取某月某剩余天数的全部记录（按时间顺序）"""
+        rows = self.conn.execute(
+            "SELECT id, date, month, remainder_days FROM ticks WHERE month = ? AND remainder_days = ? "
+            "ORDER BY date, id", (month, remainder_days)).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def _month_edge(self, month, order):
+        row = self.conn.execute(
+            f"SELECT id, date, month, remainder_days FROM ticks WHERE month = ? "
+            f"ORDER BY date {order}, id {order} LIMIT 1", (month,)).fetchone()
+        return self.read_row(self._entry(row)) if row else None
+
+    def first_of_month(self, month):
+        """获取某月第一条数据行，没有时返回None"""
+        return self._month_edge(month, "ASC")
+
+    def last_of_month(self, month):
+        """获取某月最后一条数据行，没有时返回None"""
+        return self._month_edge(month, "DESC")
+
+    def row_count(self, month):
+        """获取某月的数据行数"""
+        return self.conn.execute("SELECT COUNT(*) FROM ticks WHERE month = ?", (month,)).fetchone()[0]
+
+    def daily_first_entries(self):
+        """获取每个交易日的第一条记录（按日期排序）"""
+        rows = self.conn.execute(
+            "SELECT id, MIN(date) AS date, month, remainder_days FROM ticks "
+            "GROUP BY substr(date, 1, 10) ORDER BY date").fetchall()
+        return [self._entry(row) for row in rows]
+
+    def months(self):
+        """获取已有数据的全部月份（按时间排序）"""
+        return [row['month'] for row in self.conn.execute("SELECT DISTINCT month FROM ticks ORDER BY month")]
+
+    def export_master_csv(self, csv_path):
+        """导出总表CSV（英文表头，包含月份字段）
+        Returns:
+            int: 导出的数据行数
+        """
+        count = 0
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(MASTER_HEADER)
+            for row in self.conn.execute(f"SELECT {', '.join(MASTER_COLUMNS)} FROM ticks ORDER BY date, id"):
+                writer.writerow(list(row))
+                count += 1
+        return count
+
+    def export_monthly_csv(self, month, csv_path):
+        """导出月度分表CSV（中文表头，使用当月成本和当月收益）
+        Returns:
+            int: 导出的数据行数
+        """
+        columns = MASTER_COLUMNS[:9] + MONTHLY_COLUMNS
+        count = 0
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(MONTHLY_HEADER)
+            for row in self.conn.execute(
+                    f"SELECT {', '.join(columns)} FROM ticks WHERE month = ? ORDER BY date, id", (month,)):
+                writer.writerow(list(row))
+                count += 1
+        return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[2] == "master":
+        store = TradeStore(sys.argv[1])
+        print(f"✅ 已导出总表 {sys.argv[3]}，共 {store.export_master_csv(sys.argv[3])} 条记录")
+    elif len(sys.argv) == 5 and sys.argv[2] == "monthly":
+        store = TradeStore(sys.argv[1])
+        print(f"✅ 已导出月度分表 {sys.argv[4]}，共 {store.export_monthly_csv(sys.argv[3], sys.argv[4])} 条记录")
+    else:
+        print(__doc__)
+        sys.exit(1)
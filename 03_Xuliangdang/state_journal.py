@@ -0,0 +1,130 @@
+"""
+日志式状态存储
+
+保存状态时只把与上次相比变化的字段作为一行紧凑的JSON追加到日志文件并fsync，
+累计一定条数后把完整状态压缩写入快照文件（写临时文件后原子替换），再清空日志。
+加载时读取快照并依次重放日志中的变化，程序在写入中途崩溃只会丢失最后一条未写完的记录。
+
+日志记录格式（每行一条）：{"set": {变化的字段: 新值}, "del": [删除的字段]}
+"""
+import json
+import os
+
+# 日志累计多少条记录后压缩为快照
+COMPACT_EVERY = 100
+
+
+class StateJournal:
+    """快照 + 增量日志的状态存储"""
+
+    def __init__(self, snapshot_path, journal_path=None, compact_every=COMPACT_EVERY):
+        """
+        Args:
+            snapshot_path: 快照文件路径（完整状态的JSON）
+            journal_path: 日志文件路径，默认为快照文件名加 .journal 后缀
+            compact_every: 日志累计多少条记录后压缩为快照
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{os.path.splitext(snapshot_path)[0]}.journal"
+        self.compact_every = compact_every
+        self.state = None
+        self.journal_records = 0
+        self._loaded = False
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取状态快照失败: {str(e)}")
+            return None
+
+    def _read_journal(self):
+        """读取日志记录，忽略崩溃时没有写完的最后一行
+        Returns:
+            tuple: (记录列表, 日志末尾是否有没写完的记录)
+        """
+        records = []
+        if not os.path.exists(self.journal_path):
+            return records, False
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    return records, True
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    return records, True
+        return records, False
+
+    def _truncate_journal(self):
+        with open(self.journal_path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_records = 0
+
+    def load(self):
+        """加载快照并重放日志
+        Returns:
+            dict: 最新状态，没有保存过状态时返回None
+        """
+        state = self._read_snapshot()
+        records, torn = self._read_journal()
+        for record in records:
+            if state is None:
+                state = {}
+            state.update(record.get('set', {}))
+            for key in record.get('del', []):
+                state.pop(key, None)
+        self.state = state
+        self.journal_records = len(records)
+        self._loaded = True
+        if records:
+            # 重放过的日志压缩进快照，下次启动直接读取快照
+            self.compact()
+        elif torn:
+            # 清除没写完的记录，避免后续追加的记录与其拼接成无法解析的一行
+            self._truncate_journal()
+        return None if state is None else dict(state)
+
+    def save(self, state):
+        """保存状态，只追加与上次保存相比变化的字段
+        Args:
+            state: 完整状态字典（值需可JSON序列化）
+        """
+        if not self._loaded:
+            self.load()
+        # 通过JSON往返统一类型（例如元组变为列表），避免把相同的值判断为变化
+        state = json.loads(json.dumps(state))
+        previous = self.state or {}
+        changed = {key: value for key, value in state.items() if key not in previous or previous[key] != value}
+        removed = [key for key in previous if key not in state]
+        if self.state is not None and not changed and not removed:
+            return
+        record = {'set': changed}
+        if removed:
+            record['del'] = removed
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.state = state
+        self.journal_records += 1
+        if self.journal_records >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """把当前状态写入快照（临时文件 + 原子替换）并清空日志
+        先替换快照再清空日志，中途崩溃时重放的日志只会重复设置相同的值
+        """
+        if self.state is None:
+            return
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._truncate_journal()
@@ -0,0 +1,186 @@
+"""
+策略参数扫描
+
+用 backtest.py 在同一份行情数据上评估多组策略参数（网格或随机抽样），按最终年化收益率排序输出：
+- 行情数据只加载一次，各数组放入共享内存，进程池中的每个进程直接映射使用，任务之间只传递参数
+- 每组参数的回测是纯NumPy计算，进程数默认为CPU核数
+
+用法：
+    python sweep.py <行情数据.npz>                 # 网格扫描 SWEEP_GRID 的全部组合
+    python sweep.py <行情数据.npz> 200             # 从 SWEEP_GRID 中随机抽取200组
+结果按年化收益率从高到低打印前 TOP_N 组，并全部写入 <行情数据>_sweep.csv
+"""
+import csv
+import itertools
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest import MarketData, StrategyParams, load_market_data, run_backtest, summarize
+
+# 扫描范围：{参数名: 候选值}，未列出的参数使用 StrategyParams 的默认值
+SWEEP_GRID = {
+    'call_otm_level': [1, 2, 3, 4],
+    'put_otm_level': [1, 2, 3, 4],
+    'days_before_expiry_start': [10, 13, 16, 19, 22, 25],
+    'days_before_expiry_stop': [1, 2, 3],
+    'call_investment': [300, 400, 500, 600, 700],
+}
+
+# 打印的结果数量
+TOP_N = 20
+
+# 结果表的列
+RESULT_COLUMNS = list(StrategyParams._fields) + ['months', 'total_cost', 'total_return', 'annual_return',
+                                                 'worst_month_profit', 'skipped_months']
+
+# 工作进程中映射的共享内存和行情数据
+_worker_blocks = []
+_worker_data = None
+_worker_start_date = None
+
+
+def _is_valid(params):
+    """检查参数组合是否有意义：停止天数不大于开始天数，Call和Put投资不超过月投资"""
+    return (params.days_before_expiry_stop <= params.days_before_expiry_start and
+            params.call_investment > 0 and params.put_investment > 0 and
+            params.call_investment + params.put_investment <= params.monthly_investment)
+
+
+def _make_params(values):
+    """由参数字典生成 StrategyParams；只给出Call投资时，Put投资为月投资的剩余部分"""
+    values = dict(values)
+    if ('call_investment' in values and 'put_investment' not in values):
+        monthly_investment = values.get('monthly_investment', StrategyParams().monthly_investment)
+        values['put_investment'] = monthly_investment - values['call_investment']
+    return StrategyParams(**values)
+
+
+def grid_params(grid=SWEEP_GRID):
+    """生成网格中全部有效的参数组合
+    Args:
+        grid: {参数名: 候选值列表}
+    Returns:
+        list: StrategyParams 列表
+    """
+    names = list(grid)
+    combinations = (_make_params(zip(names, values)) for values in itertools.product(*grid.values()))
+    return [params for params in combinations if _is_valid(params)]
+
+
+def random_params(count, grid=SWEEP_GRID, seed=None):
+    """从网格中随机抽取不重复的有效参数组合
+    Args:
+        count: 组合数量（超过网格中有效组合数时返回全部组合）
+        grid: {参数名: 候选值列表}
+        seed: 随机种子
+    Returns:
+        list: StrategyParams 列表
+    """
+    candidates = grid_params(grid)
+    return random.Random(seed).sample(candidates, min(count, len(candidates)))
+
+
+def share_market_data(data):
+    """把行情数据的各数组复制到共享内存
+    Returns:
+        tuple: (共享内存块列表, 各字段的 (共享内存名, 形状, dtype))
+    """
+    blocks, layout = [], {}
+    for field, value in data._asdict().items():
+        value = np.ascontiguousarray(value)
+        block = shared_memory.SharedMemory(create=True, size=max(value.nbytes, 1))
+        np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf)[...] = value
+        blocks.append(block)
+        layout[field] = (block.name, value.shape, value.dtype.str)
+    return blocks, layout
+
+
+def attach_market_data(layout):
+    """按 share_market_data 返回的布局映射共享内存中的行情数据（不复制）
+    Returns:
+        tuple: (共享内存块列表, MarketData)
+    """
+    blocks, fields = [], {}
+    for field, (name, shape, dtype) in layout.items():
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        fields[field] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return blocks, MarketData(**fields)
+
+
+def _init_worker(layout, start_date):
+    global _worker_blocks, _worker_data, _worker_start_date
+    _worker_blocks, _worker_data = attach_market_data(layout)
+    _worker_start_date = start_date
+
+
+def _evaluate(params):
+    result = run_backtest(_worker_data, params, _worker_start_date)
+    summary = summarize(result, params)
+    summary['skipped_months'] = len(result.skipped_months)
+    return params, summary
+
+
+def run_sweep(data, params_list, workers=None, start_date=None):
+    """在进程池中评估多组参数
+    Args:
+        data: MarketData
+        params_list: StrategyParams 列表
+        workers: 进程数，默认为CPU核数
+        start_date: 计算总运行天数的开始日期，默认为第一条行情的日期
+    Returns:
+        list: [(StrategyParams, 汇总结果)]，按最终年化收益率从高到低排序
+    """
+    blocks, layout = share_market_data(data)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(layout, start_date)) as executor:
+            chunksize = max(1, len(params_list) // ((workers or os.cpu_count() or 1) * 4))
+            results = list(executor.map(_evaluate, params_list, chunksize=chunksize))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    results.sort(key=lambda item: item[1]['annual_return'], reverse=True)
+    return results
+
+
+def write_results(path, results):
+    """把排序后的扫描结果写入CSV"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['rank'] + RESULT_COLUMNS)
+        for rank, (params, summary) in enumerate(results, 1):
+            row = params._asdict()
+            row.update(summary)
+            writer.writerow([rank] + [row[column] for column in RESULT_COLUMNS])
+
+
+def main(path, count=None):
+    data = load_market_data(path)
+    params_list = random_params(count) if count else grid_params()
+    print(f"🔄 评估 {len(params_list)} 组参数...", flush=True)
+    results = run_sweep(data, params_list)
+
+    print("排名 Call档 Put档 开始天数 停止天数 Call投资 Put投资 月数 总收益 年化收益率")
+    for rank, (params, summary) in enumerate(results[:TOP_N], 1):
+        print(f"{rank:>4} {params.call_otm_level:>6} {params.put_otm_level:>5} "
+              f"{params.days_before_expiry_start:>8} {params.days_before_expiry_stop:>8} "
+              f"{params.call_investment:>8} {params.put_investment:>7} {summary['months']:>4} "
+              f"{summary['total_return']:>6} {summary['annual_return']:>9}%")
+
+    output = os.path.splitext(path)[0] + "_sweep.csv"
+    write_results(output, results)
+    print(f"✅ 全部结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    if (len(sys.argv) not in (2, 3)):
+        print("用法: python sweep.py <行情数据.npz> [随机组合数]")
+        sys.exit(1)
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) == 3 else None)
@@ -0,0 +1,74 @@
+"""
+测试后台线程日志写入器
+"""
+import gzip
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from async_logger import AsyncFileLogger
+
+
+class Unformattable:
+    """格式化时会被调用的对象，用来确认被过滤的日志没有做字符串格式化"""
+
+    def __init__(self):
+        self.formatted = False
+
+    def __str__(self):
+        self.formatted = True
+        return "formatted"
+
+
+def test_level_filter_and_lazy_format():
+    """低于级别的日志不入队也不格式化，参数在后台线程中格式化"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, "option_trading.log")
+        logger = AsyncFileLogger(lambda moment: log_path, level="INFO")
+        value = Unformattable()
+        logger.log("调试信息 %s", "DEBUG", value)
+        assert logger.queue.empty() and logger._thread is None
+        assert not value.formatted
+
+        logger.log("交易数据已写入 %s (%d)", "INFO", "option_trading_202506.csv", 3)
+        logger.log("查询失败", "ERROR")
+        assert logger.flush()
+        logger.close()
+
+        with open(log_path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert len(lines) == 2
+        assert lines[0].endswith("INFO: 交易数据已写入 option_trading_202506.csv (3)")
+        assert lines[1].endswith("ERROR: 查询失败")
+    print("✅ 日志级别过滤和延迟格式化正确")
+
+
+def test_size_rotation_with_gzip():
+    """超过大小上限时轮转，轮转出的文件被gzip压缩"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, "option_trading.log")
+        logger = AsyncFileLogger(lambda moment: log_path, max_bytes=200, compress_rotated=True)
+        for i in range(10):
+            logger.log("第%d条日志 %s", "INFO", i, "x" * 40)
+        logger.close()
+
+        rotated = sorted(name for name in os.listdir(tmp_dir) if name.endswith(".gz"))
+        assert rotated
+        lines = []
+        for name in rotated:
+            with gzip.open(os.path.join(tmp_dir, name), 'rt', encoding='utf-8') as f:
+                lines.extend(f.read().splitlines())
+        with open(log_path, encoding='utf-8') as f:
+            current = f.read()
+        assert len(current.encode('utf-8')) <= 200
+        lines.extend(current.splitlines())
+        assert len(lines) == 10
+        assert all(f"第{i}条日志" in line for i, line in enumerate(lines))
+    print("✅ 按大小轮转和压缩正确")
+
+
+if __name__ == "__main__":
+    test_level_filter_and_lazy_format()
+    test_size_rotation_with_gzip()
@@ -0,0 +1,108 @@
+"""
+测试向量化回测：选行权价、合约数、余数成本和跨月总收益与实时逻辑一致
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import option_math
+from backtest import MarketData, StrategyParams, run_backtest, save_market_data, load_market_data, summarize
+
+
+def make_market_data():
+    """两个月份的行情：ETF价格2.8~3.1，行权价2.60~3.20（间隔0.05）"""
+    strikes = np.round(np.arange(2.6, 3.2001, 0.05), 2)
+    times = np.array(['2025-01-06T10:00', '2025-01-08T10:00', '2025-01-15T10:00', '2025-01-21T10:00',
+                      '2025-02-05T10:00', '2025-02-06T10:00', '2025-02-20T10:00', '2025-02-25T10:00'],
+                     dtype='datetime64[m]')
+    months = np.array([202501] * 4 + [202502] * 4)
+    # 第一行不在记录期内（剩余21天），最后一个月的最后一行剩余0天也不记录
+    remainder_days = np.array([21, 19, 12, 1, 19, 18, 5, 0])
+    etf_prices = np.array([2.95, 2.9, 2.85, 2.8, 2.91, 2.93, 3.0, 3.1])
+
+    n, k = len(times), len(strikes)
+    call_prices = np.tile(np.linspace(0.2, 0.005, k), (n, 1)) * np.linspace(1, 1.5, n)[:, None]
+    put_prices = np.tile(np.linspace(0.005, 0.2, k), (n, 1)) * np.linspace(1, 0.8, n)[:, None]
+    # 2.75的行权价没有挂牌
+    call_prices[:, 3] = np.nan
+    put_prices[:, 3] = np.nan
+    return MarketData(times, months, etf_prices, strikes, call_prices, put_prices, remainder_days)
+
+
+def test_matches_scalar_logic():
+    """逐月份用实时程序的标量公式计算，与向量化结果一致"""
+    data = make_market_data()
+    params = StrategyParams()
+    result = run_backtest(data, params, start_date='2025-01-01')
+
+    assert list(result.months['month']) == [202501, 202502]
+    assert result.skipped_months == []
+    # 202501：ETF 2.9，平值2.90，向上2档3.00，向下2档跳过未挂牌的2.75为2.80
+    assert (result.months['call_strike'][0], result.months['put_strike'][0]) == (3.0, 2.8)
+    # 202502：ETF 2.91，平值仍为2.90
+    assert (result.months['call_strike'][1], result.months['put_strike'][1]) == (3.0, 2.8)
+
+    expected_rows = [1, 2, 3, 4, 5, 6]
+    assert list(result.rows['time']) == list(data.times[expected_rows])
+
+    previous_months_return = 0
+    for month_index, entry_row in enumerate([1, 4]):
+        call_entry = data.call_prices[entry_row, 8]
+        put_entry = data.put_prices[entry_row, 4]
+        call_contracts = int(option_math.contract_count(params.call_investment, call_entry))
+        put_contracts = int(option_math.contract_count(params.put_investment, put_entry))
+        remainder = int(option_math.remainder_cost(params.monthly_investment, call_contracts, call_entry,
+                                                   put_contracts, put_entry))
+        assert result.months['call_contracts'][month_index] == call_contracts
+        assert result.months['put_contracts'][month_index] == put_contracts
+        assert result.months['remainder_cost'][month_index] == remainder
+
+        for row in expected_rows[month_index * 3:month_index * 3 + 3]:
+            value = int(option_math.position_value(call_contracts, data.call_prices[row, 8],
+                                                   put_contracts, data.put_prices[row, 4]))
+            monthly_total_return = value + remainder
+            total_return = monthly_total_return + previous_months_return
+            total_cost = (month_index + 1) * params.monthly_investment
+            days = (data.times[row].astype('datetime64[D]') - np.datetime64('2025-01-01')).astype(int) + 1
+            i = expected_rows.index(row)
+            assert result.rows['monthly_total_return'][i] == monthly_total_return
+            assert result.rows['total_return'][i] == total_return
+            assert result.rows['total_cost'][i] == total_cost
+            assert result.rows['annual_return'][i] == round(
+                option_math.annualized_return(total_return, total_cost, int(days)), 4)
+        previous_months_return += monthly_total_return
+
+    summary = summarize(result, params)
+    assert summary['months'] == 2
+    assert summary['total_cost'] == 2000
+    assert summary['total_return'] == previous_months_return
+    print("✅ 回测结果与实时逻辑一致")
+
+
+def test_skip_month_and_npz_roundtrip():
+    """买入价格无效的月份被跳过；行情数据可保存为npz后读回"""
+    data = make_market_data()
+    call_prices = data.call_prices.copy()
+    call_prices[4, :] = np.nan
+    data = data._replace(call_prices=call_prices)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "market.npz")
+        save_market_data(path, data)
+        loaded = load_market_data(path)
+    assert all(np.array_equal(a, b, equal_nan=a.dtype.kind == 'f') for a, b in zip(loaded, data))
+
+    result = run_backtest(loaded, start_date='2025-01-01')
+    assert result.skipped_months == [202502]
+    assert list(result.months['month']) == [202501]
+    assert len(result.rows['time']) == 3
+    print("✅ 跳过无效月份和npz读写正确")
+
+
+if __name__ == "__main__":
+    test_matches_scalar_logic()
+    test_skip_month_and_npz_roundtrip()
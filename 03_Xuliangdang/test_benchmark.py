@@ -0,0 +1,53 @@
+"""
+测试基准测试工具：合成数据与主程序的读取逻辑一致，退化判断正确
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import benchmark_environment, compare, generate_data, run_benchmarks
+from csv_index import MasterCsvIndex
+
+
+def test_generated_data_readable():
+    """合成的总表、索引和月份清单能被主程序直接使用"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        months = generate_data(tmp_dir, 5000)
+        assert months == ["202506", "202507"]
+        master_path = os.path.join(tmp_dir, "option_trading_20250530.csv")
+        with open(master_path, 'r', encoding='utf-8') as f:
+            assert sum(1 for _ in f) == 5001
+
+        index = MasterCsvIndex(master_path)
+        index.load()
+        assert len(index.entries) == 5000
+
+        with benchmark_environment(tmp_dir) as strategy:
+            values = strategy.get_historical_values("202507", 20)
+            assert values is not None
+            state = strategy.recover_state_from_csv("202507")
+            assert state['total_cost'] == 2000
+    print("✅ 合成数据可被主程序读取")
+
+
+def test_compare_flags_regressions():
+    """只有超过阈值的项目视为退化，基准中没有的项目忽略"""
+    results = run_benchmarks([200], fixed=False)
+    assert set(results['200']) == {'index_load', 'manifest_load', 'historical_values',
+                                   'closest_historical_day', 'recover_state_from_csv', 'tick_append'}
+
+    baseline = {'200': {name: dict(result) for name, result in results['200'].items()}}
+    assert compare(results, baseline) == []
+
+    baseline['200']['index_load']['seconds'] = results['200']['index_load']['seconds'] / 2
+    del baseline['200']['tick_append']
+    regressions = compare(results, baseline, threshold=0.2)
+    assert [(group, name) for group, name, _, _ in regressions] == [('200', 'index_load')]
+    print("✅ 性能退化判断正确")
+
+
+if __name__ == "__main__":
+    test_generated_data_readable()
+    test_compare_flags_regressions()
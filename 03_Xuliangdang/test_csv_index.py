@@ -0,0 +1,91 @@
+"""
+测试CSV总表索引
+"""
+import csv
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from csv_index import MasterCsvIndex
+
+HEADER = ["Date", "ETF Price", "Call Strike", "Put Strike", "Call Price", "Put Price", "Call Qty", "Put Qty",
+          "Remainder Cost", "Total Cost", "Total Return", "Annual Return", "Month"]
+
+
+def make_row(date_str, month, total_return):
+    return [date_str, 2.8, 2.9, 2.7, 0.01, 0.012, 5, 4, 52, 1000, total_return, "1.0%", month]
+
+
+def append_row(csv_path, index, row, remainder_days):
+    """按XuTwo的方式追加一行并更新索引"""
+    with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+        offset = f.tell()
+        csv.writer(f).writerow(row)
+        f.flush()
+        length = f.tell() - offset
+    index.add(offset, length, row[0], row[-1], remainder_days)
+
+
+def test_index_point_queries():
+    """按月份和剩余天数定位数据行，重启后直接从索引文件加载"""
+    calls = []
+
+    def remainder_fn(month, date_str):
+        calls.append(date_str)
+        return 20
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "master.csv")
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(HEADER)
+            csv.writer(f).writerow(make_row("2025-06-05 09:40:00", "202506", 1001))
+
+        # 已有数据行没有索引时补建
+        index = MasterCsvIndex(csv_path, remainder_fn=remainder_fn).load()
+        assert calls == ["2025-06-05 09:40:00"]
+
+        append_row(csv_path, index, make_row("2025-06-06 09:40:00", "202506", 1005), 19)
+        append_row(csv_path, index, make_row("2025-06-06 09:41:00", "202506", 1006), 19)
+        append_row(csv_path, index, make_row("2025-07-07 09:40:00", "202507", 1010), 19)
+
+        entries = index.entries_for_remainder("202506", 19)
+        assert [entry.date for entry in entries] == ["2025-06-06 09:40:00", "2025-06-06 09:41:00"]
+        assert index.read_row(entries[0])["Total Return"] == "1005"
+        assert index.last_of_month("202506")["Total Return"] == "1006"
+        assert index.first_of_month("202507")["Date"] == "2025-07-07 09:40:00"
+        assert [entry.date for entry in index.daily_first_entries()] == \
+            ["2025-06-05 09:40:00", "2025-06-06 09:40:00", "2025-07-07 09:40:00"]
+
+        # 重启后从索引文件加载，不再逐行解析总表
+        reloaded = MasterCsvIndex(csv_path, remainder_fn=remainder_fn).load()
+        assert len(calls) == 1
+        assert reloaded.last_of_month("202507")["Total Return"] == "1010"
+    print("✅ 总表索引查询正确")
+
+
+def test_index_rebuilt_after_rewrite():
+    """总表被修复脚本重写后索引自动重建"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "master.csv")
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(HEADER)
+        index = MasterCsvIndex(csv_path, remainder_fn=lambda month, date_str: 5).load()
+        append_row(csv_path, index, make_row("2025-06-20 10:00:00", "202506", 1001), 5)
+        append_row(csv_path, index, make_row("2025-06-20 10:01:00", "202506", 1002), 5)
+
+        # 重写总表，只保留修正后的第一行
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(HEADER)
+            csv.writer(f).writerow(make_row("2025-06-20 10:00:00", "202506", 999))
+
+        rebuilt = MasterCsvIndex(csv_path, remainder_fn=lambda month, date_str: 5).load()
+        assert len(rebuilt.entries) == 1
+        assert rebuilt.last_of_month("202506")["Total Return"] == "999"
+    print("✅ 总表重写后索引重建正确")
+
+
+if __name__ == "__main__":
+    test_index_point_queries()
+    test_index_rebuilt_after_rewrite()
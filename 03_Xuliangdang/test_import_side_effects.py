@@ -0,0 +1,48 @@
+"""
+测试导入XuTwo没有副作用：不发起网络请求、不修改环境变量、不创建文件、不启动线程
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHECK_SCRIPT = """
+import json, os, sys, threading
+import XuTwo
+print(json.dumps({
+    'proxy': os.environ.get('http_proxy'),
+    'modules': [name for name in ('requests', 'asyncio', 'urllib3') if name in sys.modules],
+    'threads': threading.active_count(),
+    'files': os.listdir('.'),
+}))
+"""
+
+
+def test_import_has_no_side_effects():
+    """在空目录中导入：环境变量不变，不加载requests，不启动线程，不创建文件"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, http_proxy="http://127.0.0.1:9", PYTHONPATH=SCRIPT_DIR)
+        output = subprocess.run([sys.executable, "-c", CHECK_SCRIPT], cwd=tmp_dir, env=env,
+                                capture_output=True, text=True, timeout=60, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result == {'proxy': "http://127.0.0.1:9", 'modules': [], 'threads': 1, 'files': []}
+    print("✅ 导入XuTwo没有副作用")
+
+
+def test_helpers_usable_without_initialize():
+    """不调用 initialize_strategy 也可以直接使用工具函数，日志器和调度器在首次使用时创建"""
+    import XuTwo
+    assert XuTwo.get_next_month("202512") == "202601"
+    assert XuTwo.get_scheduler() is XuTwo.get_scheduler()
+    assert XuTwo.validate_price(0.0123)
+    print("✅ 工具函数可以直接使用")
+
+
+if __name__ == "__main__":
+    test_import_has_no_side_effects()
+    test_helpers_usable_without_initialize()
@@ -0,0 +1,79 @@
+"""
+测试月份清单
+"""
+import csv
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from month_manifest import MonthManifest
+from tick_writer import TickWriter
+
+MASTER_HEADER = ["Date", "ETF Price", "Call Strike", "Put Strike", "Call Price", "Put Price", "Call Qty", "Put Qty",
+                 "Remainder Cost", "Total Cost", "Total Return", "Annual Return", "Month"]
+MONTHLY_HEADER = ["日期", "ETF 价格", "Call 行权价", "Put 行权价", "Call 价格", "Put 价格", "Call 数量", "Put 数量",
+                  "余数成本", "总成本", "总收益", "年化收益率"]
+
+
+def write_ticks(tmp_dir, manifest):
+    """用写入器写入两个月的数据，并在回调中更新清单"""
+
+    def on_flush(rows):
+        for row in rows:
+            manifest.record(row.month, row.master_path, row.master_offset, row.master_length,
+                            row.master_row, is_master=True)
+            manifest.record(row.month, row.monthly_path, row.monthly_offset, row.monthly_length, row.monthly_row)
+        manifest.save()
+
+    master_path = os.path.join(tmp_dir, "option_trading_20250530.csv")
+    writer = TickWriter(master_path, MASTER_HEADER, MONTHLY_HEADER,
+                        lambda month: os.path.join(tmp_dir, f"option_trading_{month}.csv"), on_flush=on_flush)
+    ticks = [("2025-06-06 09:40:00", "202506", 2.80, 0.0123, 1005, 2005),
+             ("2025-06-24 15:00:00", "202506", 2.85, 0.0050, 990, 1990),
+             ("2025-06-25 09:40:00", "202507", 2.86, 0.0130, 1002, 2992)]
+    for date_str, month, etf_price, option_price, monthly_return, total_return in ticks:
+        values = [date_str, etf_price, 2.9, 2.7, option_price, option_price, 5, 4, 52]
+        writer.write(values + [3000, total_return, "1.0%", month], values + [1000, monthly_return, "1.0%"], month)
+    writer.close()
+    return master_path
+
+
+def test_manifest_lookup():
+    """清单记录月份摘要，恢复时只读取第一行和最后一行"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manifest = MonthManifest(os.path.join(tmp_dir, "manifest.json"))
+        write_ticks(tmp_dir, manifest)
+
+        assert manifest.has_month("202506") and not manifest.has_month("202505")
+        entry = MonthManifest(manifest.path).load().get("202506")
+        assert entry['start_of_month_etf_price'] == 2.8
+        assert entry['final_total_return'] == 1990
+        assert entry['files']["option_trading_202506.csv"]['rows'] == 2
+
+        first, last, count = manifest.master_rows("202506")
+        assert (first[0], last[0], count) == ("2025-06-06 09:40:00", "2025-06-24 15:00:00", 2)
+    print("✅ 月份清单查询正确")
+
+
+def test_rebuild_matches_incremental():
+    """扫描现有文件重建的清单与逐行更新的清单一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manifest = MonthManifest(os.path.join(tmp_dir, "manifest.json"))
+        master_path = write_ticks(tmp_dir, manifest)
+
+        rebuilt = MonthManifest(os.path.join(tmp_dir, "rebuilt.json")).rebuild(master_path, {
+            "202506": os.path.join(tmp_dir, "option_trading_202506.csv"),
+            "202507": os.path.join(tmp_dir, "option_trading_202507.csv"),
+        })
+        assert rebuilt.months == manifest.months
+        with open(os.path.join(tmp_dir, "option_trading_202507.csv"), encoding='utf-8') as f:
+            assert list(csv.reader(f))[1] == rebuilt.read_row("option_trading_202507.csv",
+                                                                rebuilt.get("202507")['files']["option_trading_202507.csv"]['first'])
+    print("✅ 重建清单正确")
+
+
+if __name__ == "__main__":
+    test_manifest_lookup()
+    test_rebuild_matches_incremental()
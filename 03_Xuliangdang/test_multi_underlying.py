@@ -0,0 +1,160 @@
+"""
+测试多标的运行模式：独立的策略实例和共用的行情预取
+"""
+import datetime
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import multi_underlying
+import sina_quote
+from multi_underlying import load_strategy
+from sina_stub_server import QuoteBook, SinaStubServer
+
+
+class FakeResponse:
+    """只包含 fetch_quotes 用到的属性的响应对象"""
+
+    def __init__(self, text):
+        self.content = text.encode('gbk')
+
+    def raise_for_status(self):
+        pass
+
+
+def test_strategies_are_independent():
+    """每个标的的策略实例使用各自的代码、文件名和状态"""
+    fifty = load_strategy("50ETF")
+    star = load_strategy("Kechuang")
+    assert fifty is not star
+    assert (fifty.UNDERLYING_CODE, fifty.ETF_SYMBOL) == ("510050", "s_sh510050")
+    assert (star.UNDERLYING_CODE, star.ETF_SYMBOL) == ("588000", "s_sh588000")
+    # 50ETF保持原有的文件名
+    assert fifty.get_csv_filename() == f"option_trading_{fifty.CSV_START_DATE}.csv"
+    assert star.get_csv_filename() == f"option_trading_Kechuang_{star.CSV_START_DATE}.csv"
+    # ETF价格有效范围按标的区分
+    assert fifty.validate_price(2.8, 'etf') and not fifty.validate_price(0.9, 'etf')
+    assert star.validate_price(0.9, 'etf')
+
+    fifty.selected_call_strike, fifty.selected_put_strike = ("10008123", 2.9), ("10008124", 2.7)
+    star.selected_call_strike = star.selected_put_strike = None
+    assert fifty.get_prefetch_symbols() == ["s_sh510050", "CON_OP_10008123", "CON_OP_10008124"]
+    assert star.get_prefetch_symbols() == ["s_sh588000"]
+    print("✅ 各标的策略实例相互独立")
+
+
+def test_prefetch_serves_fetch_quotes():
+    """预取后各标的的行情查询不再发起请求，预取结果只使用一次"""
+    requests = []
+
+    def fake_http_get(url, timeout=None, **kwargs):
+        requests.append(url)
+        symbols = url.split("list=")[1].split(",")
+        return FakeResponse("".join(f'var hq_str_{symbol}="{symbol},1.0";\n' for symbol in symbols))
+
+    original_http_get = sina_quote.http_get
+    sina_quote.http_get = fake_http_get
+    try:
+        assert sina_quote.prefetch_quotes(["s_sh510050", "s_sh588000", "CON_OP_10008123"]) == 3
+        assert len(requests) == 1
+
+        assert sina_quote.fetch_quotes(["s_sh510050"])["s_sh510050"][1] == "1.0"
+        legs = sina_quote.fetch_quote_legs({'call': ["CON_OP_10008123"], 'etf': ["s_sh588000"]})
+        assert legs['call']["CON_OP_10008123"] and legs['etf']["s_sh588000"]
+        assert len(requests) == 1
+
+        # 已使用过的预取结果不再返回，重试时重新请求
+        sina_quote.fetch_quotes(["s_sh510050"])
+        assert len(requests) == 2
+        assert requests[1].endswith("list=s_sh510050")
+    finally:
+        sina_quote.http_get = original_http_get
+        sina_quote.clear_prefetched()
+    print("✅ 行情预取正确")
+
+
+def test_standard_ladder_covers_each_profile():
+    """理论标准行权价阶梯覆盖各标的的ETF价格范围（包括1元以下的科创50）"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        star, fifty = load_strategy("Kechuang"), load_strategy("50ETF")
+        try:
+            assert star.validate_strike_prices_against_etf(1.05, 0.85, 0.95)
+            assert not star.validate_strike_prices_against_etf(1.1, 0.85, 0.95)
+            assert star.validate_strike_prices_against_etf(0.5, 0.3, 0.4)
+            assert fifty.validate_strike_prices_against_etf(2.9, 2.7, 2.8)
+            for strategy in (star, fifty):
+                low, high = strategy.ETF_PRICE_RANGE
+                ladder = strategy.get_standard_strike_ladder()
+                assert ladder.strikes[0] <= low and ladder.strikes[-1] >= high
+        finally:
+            for strategy in (star, fifty):
+                strategy.get_logger().close()
+            os.chdir(cwd)
+    print("✅ 标准行权价阶梯覆盖各标的的ETF价格范围")
+
+
+def prepare_recording_state(strategy, book, now, remainder_days):
+    """把策略设置为已选定合约、正在记录的状态，剩余天数固定（不依赖当前日期）"""
+    strategy.EXPIRY_OFFLINE = True
+    strategy.get_option_expire_day = lambda month: (
+        ("2099-01-01", remainder_days[0]) if month == strategy.current_month else ("2099-02-01", 40))
+    calls, puts = book.chain(strategy.UNDERLYING_CODE, now.strftime("%y%m"))
+    strategy.current_month = strategy.trading_month = datetime.datetime.now().strftime("%Y%m")
+    strategy.start_date = now.date()
+    strategy.selected_call_strike = (calls[-1], 0.0)
+    strategy.selected_put_strike = (puts[0], 0.0)
+    strategy.call_contracts = strategy.put_contracts = 10
+    strategy.start_of_month_etf_price = strategy.call_initial_price = strategy.put_initial_price = None
+    strategy.monthly_remainder_cost = strategy.previous_month_final_return = 0
+    strategy.total_cost = strategy.MONTHLY_INVESTMENT
+    strategy.processed_today = strategy.month_switched = False
+    strategy.monthly_investment_added = True
+
+
+def test_one_batched_request_per_tick():
+    """多标的模式下每个采样时刻（包括开始记录当天）只向行情服务器发出一次批量请求"""
+    cwd = os.getcwd()
+    book = QuoteBook(clock=lambda: 0)
+    server = SinaStubServer(book=book).start()
+    original = (sina_quote.HQ_BASE_URL, sina_quote.OPTION_API_BASE_URL)
+    sina_quote.HQ_BASE_URL, sina_quote.OPTION_API_BASE_URL = server.hq_base_url, server.option_api_url
+    now = datetime.datetime(2025, 6, 10, 10, 0)
+    remainder_days = [10]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        strategies = {name: load_strategy(name) for name in ("50ETF", "300ETF")}
+        try:
+            for strategy in strategies.values():
+                prepare_recording_state(strategy, book, now, remainder_days)
+
+            for days in (10, 19):  # 平常的采样时刻，以及重新计算合约数量的开始记录当天
+                remainder_days[0] = days
+                before = server.stats['requests']
+                multi_underlying.run_tick(strategies, now)
+                assert server.stats['requests'] - before == 1, days
+
+            for strategy in strategies.values():
+                strategy.flush_before_sleep(None)
+                assert strategy.call_initial_price and strategy.put_initial_price
+                assert strategy.validate_price(strategy.start_of_month_etf_price, 'etf')
+                with open(strategy.get_csv_filename(), encoding='utf-8') as f:
+                    assert len(f.read().splitlines()) == 3
+        finally:
+            for strategy in strategies.values():
+                strategy.get_logger().close()
+            os.chdir(cwd)
+            sina_quote.HQ_BASE_URL, sina_quote.OPTION_API_BASE_URL = original
+            sina_quote.close_session()
+            server.stop()
+    print("✅ 每个采样时刻只发出一次批量行情请求")
+
+
+if __name__ == "__main__":
+    test_strategies_are_independent()
+    test_prefetch_serves_fetch_quotes()
+    test_standard_ladder_covers_each_profile()
+    test_one_batched_request_per_tick()
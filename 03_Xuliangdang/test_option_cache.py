@@ -0,0 +1,257 @@
+"""
+测试期权元数据缓存
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backtest import MarketData, StrategyParams, select_strikes
+from multi_underlying import load_strategy
+from option_cache import ExpiryCache, OptionChain, OptionChainCache, is_standard_strike
+
+
+def test_expiry_cache_fetches_once_per_month():
+    """同一月份只请求一次网络，剩余天数按截至日期本地计算"""
+    calls = []
+
+    def fake_fetcher(month, cate, exchange):
+        calls.append((month, cate, exchange))
+        return "2025-06-25", 19
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_file = os.path.join(tmp_dir, "expiry.json")
+        cache = ExpiryCache(fake_fetcher, cache_file=cache_file)
+
+        assert cache.get("202506", as_of=datetime.date(2025, 6, 6)) == ("2025-06-25", 19)
+        assert cache.get("202506", as_of=datetime.datetime(2025, 6, 20, 10, 30)) == ("2025-06-25", 5)
+        assert len(calls) == 1
+
+        # 新实例从磁盘加载，不再请求网络
+        reloaded = ExpiryCache(fake_fetcher, cache_file=cache_file)
+        assert reloaded.get("202506", as_of=datetime.date(2025, 6, 24)) == ("2025-06-25", 1)
+        assert len(calls) == 1
+    print("✅ 到期日缓存工作正常")
+
+
+def test_expiry_cache_failure_returns_none():
+    """网络失败且无缓存时返回 (None, None)"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ExpiryCache(lambda m, c, e: (None, None), cache_file=os.path.join(tmp_dir, "expiry.json"))
+        assert cache.get("202507") == (None, None)
+    print("✅ 获取失败时返回空值")
+
+
+def test_expiry_cache_backs_off_after_failure():
+    """请求失败后 retry_interval 内不再请求，使用旧值或本地到期日；间隔过后重新请求"""
+    calls = []
+
+    def failing_fetcher(month, cate, exchange):
+        calls.append(month)
+        return None, None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_file = os.path.join(tmp_dir, "expiry.json")
+        # 没有缓存：使用本地计算的到期日
+        cache = ExpiryCache(failing_fetcher, cache_file=cache_file, local_fn=lambda month: "2025-07-23")
+        for _ in range(5):
+            assert cache.get("202507", as_of=datetime.date(2025, 7, 3)) == ("2025-07-23", 20)
+        assert len(calls) == 1
+
+        # 缓存过期：继续使用旧值
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            f.write('{"202506|50ETF|null": {"expire_day": "2025-06-25", "fetched_at": 0}}')
+        stale = ExpiryCache(failing_fetcher, cache_file=cache_file)
+        for _ in range(5):
+            assert stale.get("202506", as_of=datetime.date(2025, 6, 6)) == ("2025-06-25", 19)
+        assert len(calls) == 2
+
+        # retry_interval 为0时每次都重新请求
+        eager = ExpiryCache(failing_fetcher, cache_file=cache_file, retry_interval=0)
+        eager.get("202506")
+        eager.get("202506")
+        assert len(calls) == 4
+    print("✅ 到期日请求失败后按间隔重试")
+
+
+def test_chain_cache_fetches_only_new_codes():
+    """期权链只为新挂牌的合约请求行权价，重启后完全命中缓存"""
+    requested = []
+    strikes = {"1001": "3.0", "1002": "3.1", "2001": "3.0", "2002": "2.9", "1003": "3.2"}
+
+    def fake_strike_fetcher(codes):
+        requested.append(list(codes))
+        return {code: strikes[code] for code in codes}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_file = os.path.join(tmp_dir, "chain.json")
+        cache = OptionChainCache(fake_strike_fetcher, cache_file=cache_file)
+
+        chain = cache.get_chain("510050", "202506", ["1001", "1002"], ["2001", "2002"])
+        assert chain.strikes(OptionChain.CALL) == [("1001", 3.0), ("1002", 3.1)]
+        assert chain.strike_of("2002") == 2.9
+
+        # 新挂牌合约只请求一次
+        cache.get_chain("510050", "202506", ["1001", "1002", "1003"], ["2001", "2002"])
+        assert requested[-1] == ["1003"]
+
+        # 重启后从磁盘加载，不请求网络
+        reloaded = OptionChainCache(fake_strike_fetcher, cache_file=cache_file)
+        chain = reloaded.get_chain("510050", "202506", ["1001", "1002", "1003"], ["2001", "2002"])
+        assert len(requested) == 2
+        assert chain.strike_map()["1003"] == 3.2
+    print("✅ 期权链缓存工作正常")
+
+
+def test_chain_cache_instances_share_file():
+    """多个缓存实例（多标的模式下每个标的一个）写同一个文件时互不覆盖"""
+    strikes = {"1001": "3.0", "2001": "3.0", "5001": "4.0", "6001": "4.0"}
+
+    def fetcher(codes):
+        return {code: strikes[code] for code in codes}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_file = os.path.join(tmp_dir, "chain.json")
+        fifty = OptionChainCache(fetcher, cache_file=cache_file)
+        hs300 = OptionChainCache(fetcher, cache_file=cache_file)
+        # 两个实例都在对方写入前加载了缓存文件
+        hs300.get_chain("510300", "202506", [], [])
+        fifty.get_chain("510050", "202506", ["1001"], ["2001"])
+        hs300.get_chain("510300", "202506", ["5001"], ["6001"])
+
+        requested = []
+        reloaded = OptionChainCache(lambda codes: requested.extend(codes) or fetcher(codes), cache_file=cache_file)
+        assert reloaded.get_chain("510050", "202506", ["1001"], ["2001"]).strike_of("1001") == 3.0
+        assert reloaded.get_chain("510300", "202506", ["5001"], ["6001"]).strike_of("6001") == 4.0
+        assert requested == []
+    print("✅ 多个期权链缓存实例共用文件")
+
+
+def linear_select(call_strike_prices, put_strike_prices, etf_price, call_level, put_level):
+    """逐个比较的选择方法（与期权链阶梯对照）"""
+    standard_call = [(code, strike) for code, strike in call_strike_prices if is_standard_strike(strike)]
+    standard_put = [(code, strike) for code, strike in put_strike_prices if is_standard_strike(strike)]
+    if len(standard_call) < 5 or len(standard_put) < 5:
+        standard_call, standard_put = call_strike_prices, put_strike_prices
+    ladder = sorted(set([strike for _, strike in standard_call] + [strike for _, strike in standard_put]))
+    atm_index = ladder.index(min(ladder, key=lambda x: abs(x - etf_price)))
+    call = put = None
+    if atm_index + call_level < len(ladder):
+        target = ladder[atm_index + call_level]
+        call = min(sorted(call_strike_prices, key=lambda x: x[1]), key=lambda x: abs(x[1] - target))
+    if atm_index - put_level >= 0:
+        target = ladder[atm_index - put_level]
+        put = min(sorted(put_strike_prices, key=lambda x: x[1]), key=lambda x: abs(x[1] - target))
+    return call, put
+
+
+def test_chain_ladder_selection_matches_linear_and_backtest():
+    """期权链阶梯选出的虚值合约与逐个比较的方法、回测的向量化选择一致"""
+    rng = random.Random(7)
+    for _ in range(300):
+        base = rng.choice([0.9, 2.4, 2.9, 4.6])
+        step = 0.05 if base < 3 else 0.1
+        standard = [round(base + step * i, 2) for i in range(rng.randint(3, 14))]
+        # 部分合约除权调整（行权价不再是0.05的整数倍），部分行权价只挂牌一种类型
+        xd = [round(strike * 0.973, 3) for strike in rng.sample(standard, rng.randint(0, min(4, len(standard))))]
+        calls = [strike for strike in standard + xd if rng.random() > 0.1]
+        puts = [strike for strike in standard + xd if rng.random() > 0.1]
+        call_prices = [(f"C{i}", strike) for i, strike in enumerate(rng.sample(calls, len(calls)))]
+        put_prices = [(f"P{i}", strike) for i, strike in enumerate(rng.sample(puts, len(puts)))]
+        if not call_prices or not put_prices:
+            continue
+        chain = OptionChain("510050", "202506", {
+            **{code: [strike, OptionChain.CALL, 0] for code, strike in call_prices},
+            **{code: [strike, OptionChain.PUT, 0] for code, strike in put_prices}})
+        etf_price = round(rng.uniform(standard[0] - 0.1, standard[-1] + 0.1), 3)
+        level = rng.randint(1, 3)
+
+        selection = chain.select_otm(etf_price, level, level)
+        assert (selection.call, selection.put) == linear_select(call_prices, put_prices, etf_price, level, level)
+
+        # 回测：各行权价一列，未挂牌为NaN
+        strikes = np.array(sorted(set(calls) | set(puts)))
+        call_row = np.array([[1.0 if strike in calls else np.nan for strike in strikes]])
+        put_row = np.array([[1.0 if strike in puts else np.nan for strike in strikes]])
+        data = MarketData(None, None, np.array([etf_price]), strikes, call_row, put_row, None)
+        call_col, put_col, selected = select_strikes(data, np.array([0]), StrategyParams(call_otm_level=level,
+                                                                                          put_otm_level=level))
+        assert bool(selected[0]) == (selection.call is not None and selection.put is not None)
+        if selected[0]:
+            assert (strikes[call_col[0]], strikes[put_col[0]]) == (selection.call[1], selection.put[1])
+    print("✅ 期权链阶梯选择与逐个比较、回测一致")
+
+
+def test_chain_ladder_lookup_and_invalidation():
+    """按行权价查找合约、除权行权价标记，合约变化后阶梯重建"""
+    strikes = {"C1": "2.8", "C2": "2.85", "C3": "2.9", "C4": "2.95", "C5": "3.0", "C6": "2.877",
+               "P1": "2.8", "P2": "2.85", "P3": "2.9", "P4": "2.95", "P5": "3.0", "C7": "3.05"}
+    chain = OptionChain("510050", "202506")
+    calls = ["C5", "C1", "C3", "C2", "C4", "C6"]
+    puts = ["P1", "P2", "P3", "P4", "P5"]
+    chain.update(calls, puts, lambda codes: {code: strikes[code] for code in codes})
+
+    assert chain.ladder(OptionChain.CALL).strikes == [2.8, 2.85, 2.877, 2.9, 2.95, 3.0]
+    assert chain.selection_ladder().strikes == [2.8, 2.85, 2.9, 2.95, 3.0]
+    assert chain.uses_standard_strikes() and chain.xd_strikes() == [2.877]
+    assert chain.find(OptionChain.CALL, 2.90000001) == ("C3", 2.9)
+    assert chain.find(OptionChain.PUT, 2.877) is None
+
+    selection = chain.select_otm(2.874, 2, 2)
+    assert (selection.atm, selection.call, selection.put) == (2.85, ("C4", 2.95), None)
+
+    # 新挂牌3.05的Call后重建阶梯
+    chain.update(calls + ["C7"], puts, lambda codes: {code: strikes[code] for code in codes}, max_age=3600)
+    assert chain.select_otm(2.97, 2, 2).call == ("C7", 3.05)
+    print("✅ 期权链按行权价查找和阶梯重建正常")
+
+
+def test_state_strikes_validated_against_listed_chain():
+    """状态文件的行权价按该月实际挂牌的期权链校验，取不到合约列表时按理论阶梯校验"""
+    strikes = {"C1": "2.877", "C2": "2.926", "C3": "2.975", "C4": "3.024", "C5": "3.073",
+               "P1": "2.877", "P2": "2.926", "P3": "2.975", "P4": "3.024", "P5": "3.073"}
+    chain = OptionChain("510050", "202506")
+    chain.update(["C1", "C2", "C3", "C4", "C5"], ["P1", "P2", "P3", "P4", "P5"],
+                 lambda codes: {code: strikes[code] for code in codes})
+    requested = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        strategy = load_strategy("50ETF")
+        try:
+            strategy.get_option_codes = lambda month, underlying: (
+                requested.append((month, underlying)) or (["C1", "C2", "C3", "C4", "C5"], ["P1", "P2", "P3", "P4", "P5"]))
+            strategy.get_option_chain = lambda month, call_codes, put_codes: chain
+
+            # 除权调整后的行权价不在理论阶梯上，按挂牌的期权链校验通过
+            state = {'start_of_month_etf_price': 2.975, 'selected_call_strike': ["C5", 3.073],
+                     'selected_put_strike': ["P1", 2.877], 'trading_month': "202506"}
+            assert strategy.validate_state(state)
+            assert requested == [("202506", "510050")]
+            assert not strategy.validate_state(dict(state, selected_call_strike=["C4", 3.024]))
+
+            # 取不到合约列表时按理论标准行权价阶梯校验
+            strategy.get_option_codes = lambda month, underlying: ([], [])
+            assert not strategy.validate_state(state)
+            assert strategy.validate_state(dict(state, start_of_month_etf_price=2.8,
+                                                selected_call_strike=["C", 2.9], selected_put_strike=["P", 2.7]))
+        finally:
+            strategy.get_logger().close()
+            os.chdir(cwd)
+    print("✅ 状态文件的行权价按挂牌期权链校验")
+
+
+if __name__ == "__main__":
+    test_expiry_cache_fetches_once_per_month()
+    test_expiry_cache_failure_returns_none()
+    test_expiry_cache_backs_off_after_failure()
+    test_chain_cache_fetches_only_new_codes()
+    test_chain_cache_instances_share_file()
+    test_chain_ladder_selection_matches_linear_and_backtest()
+    test_chain_ladder_lookup_and_invalidation()
+    test_state_strikes_validated_against_listed_chain()
@@ -0,0 +1,91 @@
+"""
+测试到期日的本地计算：第四个星期三遇休市顺延、向量化版本与逐月计算一致，以及到期日缓存的校验和离线兜底
+"""
+import datetime
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from multi_underlying import load_strategy
+from option_cache import ExpiryCache
+from option_expiry import expire_day_for_month, expiry_date, expiry_dates_array, remainder_days_array
+from trading_calendar import TradingCalendar, load_calendar
+
+
+def test_rule_and_vectorized_versions():
+    """2025年实际到期日、休市顺延，以及数组版本与逐月计算一致"""
+    calendar = load_calendar()
+    assert expire_day_for_month("202501", calendar) == "2025-01-22"
+    assert expire_day_for_month("202510", calendar) == "2025-10-22"
+    assert expire_day_for_month("202512", calendar) == "2025-12-24"
+
+    # 第四个星期三休市时顺延到下一个交易日
+    shifted = TradingCalendar(["2025-10-22", "2025-10-23"], years={2025})
+    assert expiry_date(2025, 10, shifted) == datetime.date(2025, 10, 24)
+
+    months = [year * 100 + month for year in range(2020, 2030) for month in range(1, 13)]
+    for cal in (calendar, shifted):
+        expected = [np.datetime64(expiry_date(month // 100, month % 100, cal), 'D') for month in months]
+        assert list(expiry_dates_array(months, cal)) == expected
+
+    times = np.array(['2025-10-09T09:30', '2025-10-22T15:00', '2025-11-03T10:00'], dtype='datetime64[m]')
+    assert list(remainder_days_array(times, [202510, 202510, 202511], calendar)) == [13, 0, 23]
+    assert list(remainder_days_array(times, [202510, 202510, 202511], shifted)) == [15, 2, 23]
+    print("✅ 到期日本地计算正确")
+
+
+def test_expiry_cache_cross_check_and_offline():
+    """接口结果与本地规则不一致时以接口为准并记录；接口不可用或离线时使用本地结果"""
+    calls = []
+
+    def fetcher(month, cate, exchange):
+        calls.append(month)
+        return {"202506": "2025-06-25", "202507": "2025-07-24"}.get(month), None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_file = os.path.join(tmp_dir, "expiry.json")
+        calendar = load_calendar()
+        cache = ExpiryCache(fetcher, cache_file=cache_file, local_fn=lambda month: expire_day_for_month(month, calendar))
+
+        assert cache.get("202506", as_of=datetime.date(2025, 6, 6)) == ("2025-06-25", 19)
+        assert cache.mismatches == {}
+        assert cache.get("202507", as_of=datetime.date(2025, 7, 4)) == ("2025-07-24", 20)
+        assert cache.mismatches == {"202507|50ETF|null": ("2025-07-24", "2025-07-23")}
+
+        # 接口没有返回且没有缓存：使用本地结果，不写入缓存
+        assert cache.get("202508", as_of=datetime.date(2025, 8, 1)) == ("2025-08-27", 26)
+        assert len(calls) == 3
+
+        # 离线：不请求接口，已有缓存的月份仍使用缓存
+        offline = ExpiryCache(fetcher, cache_file=cache_file, local_fn=lambda month: expire_day_for_month(month, calendar))
+        assert offline.get("202509", as_of=datetime.date(2025, 9, 1), offline=True) == ("2025-09-24", 23)
+        assert offline.get("202507", as_of=datetime.date(2025, 7, 4), offline=True) == ("2025-07-24", 20)
+        assert len(calls) == 3
+    print("✅ 到期日缓存校验和离线兜底工作正常")
+
+
+def test_first_record_month_offline():
+    """开始日期在当月到期日之后时从下个月开始记录（离线计算到期日）"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        strategy = load_strategy("50ETF")
+        try:
+            strategy.EXPIRY_OFFLINE = True
+            for start_date, expected in (("20250625", "202506"), ("20250626", "202507"), ("20251229", "202601")):
+                strategy.CSV_START_DATE = start_date
+                assert strategy.calculate_first_record_month() == expected
+        finally:
+            strategy.get_logger().close()
+            os.chdir(cwd)
+    print("✅ 开始记录月份按到期日计算")
+
+
+if __name__ == "__main__":
+    test_rule_and_vectorized_versions()
+    test_expiry_cache_cross_check_and_offline()
+    test_first_record_month_offline()
@@ -0,0 +1,133 @@
+"""
+测试收益列重算：与实时程序的逐行公式一致，只改写有变化的行，并同步总表索引和SQLite记录
+"""
+import csv
+import datetime
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import option_math
+from csv_index import MasterCsvIndex
+from recompute_returns import recompute_csv, recompute_sqlite
+from sqlite_store import TradeStore, MASTER_HEADER, MONTHLY_HEADER
+
+# (日期, Call价格, Put价格)，Call/Put数量和余数成本按月固定
+TICKS = {
+    "202506": [("2025-06-06 09:40:00", 0.0123, 0.0156), ("2025-06-06 10:40:00", 0.0130, 0.0150),
+               ("2025-06-10 09:40:00", 0.0101, 0.0201)],
+    "202507": [("2025-07-04 09:40:00", 0.0110, 0.0140), ("2025-07-08 14:00:00", 0.0250, 0.0061)],
+}
+CONTRACTS = {"202506": (4, 3, 58), "202507": (4, 3, 140)}
+
+
+def make_rows():
+    """按实时程序的逐行计算生成总表和月度分表数据行"""
+    master_rows, monthly_rows = [], {}
+    csv_start = datetime.date(2025, 5, 30)
+    previous_month_final_return = 0
+    for month_index, (month, ticks) in enumerate(TICKS.items()):
+        call_qty, put_qty, remainder = CONTRACTS[month]
+        start_date = datetime.datetime.strptime(ticks[0][0], "%Y-%m-%d %H:%M:%S").date()
+        total_cost = (month_index + 1) * 1000
+        monthly_rows[month] = []
+        for date_str, call_price, put_price in ticks:
+            current_date = datetime.datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").date()
+            value = int(option_math.position_value(call_qty, call_price, put_qty, put_price))
+            monthly_total_return = value + remainder
+            master_total_return = monthly_total_return + previous_month_final_return
+            annual = round(option_math.annualized_return(master_total_return, total_cost,
+                                                         (current_date - csv_start).days + 1), 4)
+            monthly_annual = round(option_math.annualized_return(monthly_total_return, 1000,
+                                                                 (current_date - start_date).days + 1), 4)
+            values = [date_str, 2.9, 3.0, 2.8, call_price, put_price, call_qty, put_qty, remainder]
+            master_rows.append(values + [total_cost, master_total_return, f"{annual}%", month])
+            monthly_rows[month].append(values + [1000, monthly_total_return, f"{monthly_annual}%"])
+        previous_month_final_return = master_total_return
+    return master_rows, monthly_rows
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def test_csv_diff_and_apply():
+    """只报告和改写错误的单元格，未变化的行原样保留，总表索引指向新的位置"""
+    master_rows, monthly_rows = make_rows()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        master_path = os.path.join(tmp_dir, "option_trading_20250530.csv")
+        monthly_paths = {month: os.path.join(tmp_dir, f"option_trading_{month}.csv") for month in monthly_rows}
+        # 7月总收益没有加上6月的最终收益；6月分表年化收益率用错了天数
+        wrong_master = [list(row) for row in master_rows]
+        wrong_master[3][10] = master_rows[3][10] - master_rows[2][10]
+        wrong_monthly = [list(row) for row in monthly_rows["202506"]]
+        wrong_monthly[2][11] = "1.2345%"
+        write_csv(master_path, MASTER_HEADER, wrong_master)
+        write_csv(monthly_paths["202506"], MONTHLY_HEADER, wrong_monthly)
+        write_csv(monthly_paths["202507"], MONTHLY_HEADER, monthly_rows["202507"])
+        index = MasterCsvIndex(master_path, remainder_fn=lambda month, date_str: 5).load()
+        assert len(index.entries) == 5
+        with open(monthly_paths["202507"], 'rb') as f:
+            untouched = f.read()
+
+        changes = recompute_csv(master_path)
+        assert [(os.path.basename(c.path), c.line, c.column) for c in changes] == [
+            ("option_trading_20250530.csv", 5, "Total Return"),
+            ("option_trading_202506.csv", 4, "年化收益率"),
+        ]
+        assert changes[0].new == str(master_rows[3][10])
+        # 只打印差异时不修改文件
+        with open(master_path, newline='', encoding='utf-8') as f:
+            assert list(csv.reader(f))[4][10] == str(wrong_master[3][10])
+
+        assert len(recompute_csv(master_path, apply=True)) == 2
+        assert recompute_csv(master_path) == []
+        with open(master_path, newline='', encoding='utf-8') as f:
+            assert list(csv.reader(f))[1:] == [[str(value) for value in row] for row in master_rows]
+        with open(monthly_paths["202506"], newline='', encoding='utf-8') as f:
+            assert list(csv.reader(f))[3] == [str(value) for value in monthly_rows["202506"][2]]
+        with open(monthly_paths["202507"], 'rb') as f:
+            assert f.read() == untouched
+
+        index = MasterCsvIndex(master_path).load()
+        assert [entry.remainder_days for entry in index.entries] == [5] * 5
+        assert index.last_of_month("202507")['Total Return'] == str(master_rows[-1][10])
+        assert index.first_of_month("202507")['Total Return'] == str(master_rows[3][10])
+    print("✅ CSV收益列重算和写回正确")
+
+
+def test_sqlite_updates_changed_records():
+    """SQLite存储只更新收益列有变化的记录"""
+    master_rows, monthly_rows = make_rows()
+    monthly_list = monthly_rows["202506"] + monthly_rows["202507"]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "option_trading_20250530.db")
+        store = TradeStore(db_path)
+        for i, (master_row, monthly_row) in enumerate(zip(master_rows, monthly_list)):
+            if i == 4:
+                master_row = master_row[:11] + ["0.0%"] + master_row[12:]
+                monthly_row = monthly_row[:10] + [0] + monthly_row[11:]
+            store.record_tick(master_row, monthly_row, 5)
+        store.close()
+
+        changes = recompute_sqlite(db_path, apply=True)
+        assert sorted((c.line, c.column) for c in changes) == [
+            (5, "annual_return"), (5, "monthly_total_return")]
+        assert recompute_sqlite(db_path) == []
+
+        store = TradeStore(db_path)
+        row = store.conn.execute("SELECT annual_return, monthly_total_return, monthly_annual_return "
+                                 "FROM ticks WHERE id = 5").fetchone()
+        assert tuple(row) == (master_rows[4][11], monthly_list[4][10], monthly_list[4][11])
+        store.close()
+    print("✅ SQLite收益列重算正确")
+
+
+if __name__ == "__main__":
+    test_csv_diff_and_apply()
+    test_sqlite_updates_changed_records()
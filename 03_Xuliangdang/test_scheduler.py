@@ -0,0 +1,59 @@
+"""
+测试交易日历调度器的唤醒时间计算
+"""
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scheduler import TradingScheduler
+
+TRADING_HOURS = [(9, 40, 11, 30), (13, 10, 15, 0)]
+HOLIDAYS = {datetime.date(2025, 10, 1)}
+
+
+def is_trading_day(date):
+    return date.weekday() < 5 and date not in HOLIDAYS
+
+
+def test_next_sample_is_aligned():
+    """交易时段内唤醒时间对齐到下一个整分钟"""
+    scheduler = TradingScheduler(TRADING_HOURS, is_trading_day)
+    wakeup, reason = scheduler.next_wakeup(datetime.datetime(2025, 9, 30, 10, 5, 37, 250000))
+    assert (wakeup, reason) == (datetime.datetime(2025, 9, 30, 10, 6), 'sample')
+    print("✅ 采样时刻按整分钟对齐")
+
+
+def test_next_open_skips_lunch_and_holidays():
+    """午休跳到下午开盘，收盘后跳过节假日到下一个交易日开盘"""
+    scheduler = TradingScheduler(TRADING_HOURS, is_trading_day)
+    assert scheduler.next_wakeup(datetime.datetime(2025, 9, 30, 11, 30, 0, 10)) == \
+        (datetime.datetime(2025, 9, 30, 13, 10), 'open')
+    assert scheduler.next_wakeup(datetime.datetime(2025, 9, 30, 15, 0, 1)) == \
+        (datetime.datetime(2025, 10, 2, 9, 40), 'open')
+    print("✅ 开盘时刻计算正确")
+
+
+def test_sleep_until_corrects_drift():
+    """分段休眠按时钟重新计算剩余时间"""
+    current = [datetime.datetime(2025, 9, 30, 10, 0, 0)]
+    slept = []
+
+    def fake_sleep(seconds):
+        slept.append(seconds)
+        # 模拟每次休眠多睡了0.5秒
+        current[0] += datetime.timedelta(seconds=seconds + 0.5)
+
+    scheduler = TradingScheduler(TRADING_HOURS, is_trading_day, clock=lambda: current[0], sleeper=fake_sleep)
+    scheduler.sleep_until(datetime.datetime(2025, 9, 30, 10, 20, 0))
+    # 每段多出的时间在下一段中扣除，总休眠时间少于名义的1200秒
+    assert sum(slept) == 1198.5
+    assert current[0] - datetime.datetime(2025, 9, 30, 10, 20, 0) < datetime.timedelta(seconds=1)
+    print("✅ 休眠时间按目标时刻计算")
+
+
+if __name__ == "__main__":
+    test_next_sample_is_aligned()
+    test_next_open_skips_lunch_and_holidays()
+    test_sleep_until_corrects_drift()
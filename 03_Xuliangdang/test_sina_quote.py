@@ -0,0 +1,52 @@
+"""
+测试新浪批量行情响应解析
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sina_quote import OptionQuote, build_quote_url, parse_quote_response
+
+SAMPLE_RESPONSE = (
+    'var hq_str_CON_OP_10008123="10,0.0095,0.0096,0.0097,5,1234,1.05,3.100";\n'
+    'var hq_str_s_sh510050="50ETF,3.012,0.005,0.17,1234,5678";\n'
+    'var hq_str_CON_SO_10008999="";\n'
+)
+
+
+def test_parse_multiple_symbols():
+    """测试一次响应中包含多个代码"""
+    quotes = parse_quote_response(SAMPLE_RESPONSE)
+    assert set(quotes) == {"CON_OP_10008123", "s_sh510050", "CON_SO_10008999"}
+    assert quotes["CON_OP_10008123"][2] == "0.0096"
+    assert quotes["s_sh510050"][1] == "3.012"
+    # 无数据的代码返回空列表
+    assert quotes["CON_SO_10008999"] == []
+    print("✅ 批量响应解析正确")
+
+
+def test_build_quote_url():
+    """测试批量请求URL"""
+    url = build_quote_url(["CON_OP_10008123", "s_sh510050"])
+    assert url.endswith("/list=CON_OP_10008123,s_sh510050")
+    print("✅ 批量请求URL正确")
+
+
+def test_option_quote_fields():
+    """测试期权行情记录按字段名和类型化属性读取"""
+    quote = OptionQuote(parse_quote_response(SAMPLE_RESPONSE)["CON_OP_10008123"])
+    assert quote.latest_price == 0.0096
+    assert quote.get("最新价") == "0.0096"
+    assert quote.strike_price == 3.1
+    # 缺失字段返回None
+    assert quote.get("Time Value") is None
+    assert quote.get_float("Time Value") is None
+    assert OptionQuote([]).latest_price is None
+    print("✅ 期权行情记录字段读取正确")
+
+
+if __name__ == "__main__":
+    test_parse_multiple_symbols()
+    test_build_quote_url()
+    test_option_quote_fields()
@@ -0,0 +1,90 @@
+"""
+测试本地新浪行情模拟服务器：XuTwo 的查询函数可以直接使用，延迟、错误和限流设置生效
+"""
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from requests import HTTPError
+
+import sina_quote
+import XuTwo
+from sina_stub_server import FaultConfig, QuoteBook, SinaStubServer
+
+
+def start_server(**kwargs):
+    """启动模拟服务器并把行情接口地址指向它
+    Returns:
+        tuple: (服务器, 原接口地址)
+    """
+    server = SinaStubServer(**kwargs).start()
+    original = (sina_quote.HQ_BASE_URL, sina_quote.OPTION_API_BASE_URL)
+    sina_quote.HQ_BASE_URL, sina_quote.OPTION_API_BASE_URL = server.hq_base_url, server.option_api_url
+    return server, original
+
+
+def stop_server(server, original):
+    sina_quote.HQ_BASE_URL, sina_quote.OPTION_API_BASE_URL = original
+    sina_quote.close_session()
+    server.stop()
+
+
+def test_xutwo_queries_against_stub():
+    """合约列表、期权行情、行权价、ETF价格和到期日都能从模拟服务器取得"""
+    book = QuoteBook(clock=lambda: 0, today=lambda: datetime.date(2025, 6, 9))
+    server, original = start_server(book=book)
+    try:
+        calls, puts = XuTwo.get_option_codes("202506", "510050")
+        assert len(calls) == len(puts) == 13
+
+        strikes = XuTwo.get_option_strikes(calls + puts)
+        assert sorted(float(strikes[code]) for code in calls)[6] == 2.9
+        assert XuTwo.get_FitfyETF_price() == "2.900"
+
+        quotes = XuTwo.get_option_quotes(calls)
+        prices = [quotes[code].latest_price for code in sorted(calls, key=lambda code: float(strikes[code]))]
+        assert prices == sorted(prices, reverse=True) and prices[-1] >= 0.0001
+        assert quotes[calls[0]].get('Option Name').startswith("50ETF购6月")
+        assert quotes[calls[0]].strike_price == float(strikes[calls[0]])
+
+        # 2025年6月的第四个星期三是25日
+        assert XuTwo.fetch_option_expire_day("202506") == ("2025-06-25", 16)
+        assert server.stats['requests'] == 5
+    finally:
+        stop_server(server, original)
+    print("✅ XuTwo查询函数可以使用模拟服务器")
+
+
+def test_faults_and_replay():
+    """错误率、限流、延迟和录制数据回放"""
+    recording = {'quotes': {"s_sh510050": ["50ETF,2.901", "50ETF,2.902"]}, 'expire_days': {}}
+    server, original = start_server(book=QuoteBook(recording), faults=FaultConfig(latency=0.05))
+    try:
+        started = time.monotonic()
+        assert sina_quote.fetch_quotes(["s_sh510050"])["s_sh510050"][1] == "2.901"
+        assert time.monotonic() - started >= 0.05
+        assert sina_quote.fetch_quotes(["s_sh510050"])["s_sh510050"][1] == "2.902"
+        assert sina_quote.fetch_quotes(["s_sh510050"])["s_sh510050"][1] == "2.901"
+
+        server.faults = FaultConfig(error_rate=1)
+        try:
+            sina_quote.fetch_quotes(["s_sh510050"])
+            assert False, "应返回HTTP 500"
+        except HTTPError as e:
+            assert e.response.status_code == 500
+
+        server.faults = FaultConfig(throttle=2)
+        statuses = [sina_quote.http_get(sina_quote.build_quote_url(["s_sh510050"])).status_code for _ in range(3)]
+        assert statuses == [200, 200, 403]
+        assert server.stats['throttled'] == 1 and server.stats['errors'] == 1
+    finally:
+        stop_server(server, original)
+    print("✅ 延迟、错误、限流和回放正确")
+
+
+if __name__ == "__main__":
+    test_xutwo_queries_against_stub()
+    test_faults_and_replay()
@@ -0,0 +1,96 @@
+"""
+测试SQLite交易数据存储
+"""
+import csv
+import datetime
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from multi_underlying import load_strategy
+from sqlite_store import TradeStore
+
+
+def make_rows(date_str, month, total_return, monthly_return):
+    values = [date_str, 2.8, 2.9, 2.7, 0.01, 0.012, 5, 4, 52]
+    return (values + [7000, total_return, "1.5%", month],
+            values + [1000, monthly_return, "2.0%"])
+
+
+def test_tick_and_state_in_one_transaction():
+    """数据行和状态一起提交，查询接口与总表索引一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = TradeStore(os.path.join(tmp_dir, "trades.db"))
+        master_row, monthly_row = make_rows("2025-06-06 09:40:00", "202506", 7010, 1010)
+        store.record_tick(master_row, monthly_row, 19, state={'call_contracts': 5}, state_month="202506")
+        master_row, monthly_row = make_rows("2025-06-06 09:41:00", "202506", 7020, 1020)
+        store.record_tick(master_row, monthly_row, 19)
+
+        assert store.load_state("202506") == {'call_contracts': 5}
+        assert store.months() == ["202506"]
+        entries = store.entries_for_remainder("202506", 19)
+        assert [entry.date for entry in entries] == ["2025-06-06 09:40:00", "2025-06-06 09:41:00"]
+        assert store.read_row(entries[0])["Total Return"] == "7010"
+        assert store.last_of_month("202506")["Total Return"] == "7020"
+        assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        store.close()
+    print("✅ 数据行和状态写入正确")
+
+
+def test_export_csv_views():
+    """导出的总表和月度分表与直接写入的CSV格式一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = TradeStore(os.path.join(tmp_dir, "trades.db"))
+        master_row, monthly_row = make_rows("2025-06-06 09:40:00", "202506", 7010, 1010)
+        store.record_tick(master_row, monthly_row, 19)
+
+        master_csv = os.path.join(tmp_dir, "master.csv")
+        monthly_csv = os.path.join(tmp_dir, "monthly.csv")
+        assert store.export_master_csv(master_csv) == 1
+        assert store.export_monthly_csv("202506", monthly_csv) == 1
+        store.close()
+
+        with open(master_csv, encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        assert rows[0][-1] == "Month"
+        assert rows[1] == [str(value) for value in master_row]
+        with open(monthly_csv, encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        assert rows[0][0] == "日期"
+        assert rows[1] == [str(value) for value in monthly_row]
+    print("✅ CSV导出正确")
+
+
+def test_cross_month_startup_recovers_from_database():
+    """SQLite存储时新月份启动从数据库恢复上月收益和总成本，不创建CSV文件"""
+    today = datetime.date.today()
+    previous = (today.replace(day=1) - datetime.timedelta(days=1)).strftime("%Y%m")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        strategy = load_strategy("50ETF")
+        try:
+            strategy.STORAGE_BACKEND = "sqlite"
+            strategy.EXPIRY_OFFLINE = True
+            strategy.CSV_START_DATE = f"{today.year - 1}0101"
+            store = strategy.get_trade_store()
+            master_row, monthly_row = make_rows(f"{previous[:4]}-{previous[4:]}-20 14:59:00", previous, 7010, 1010)
+            store.record_tick(master_row, monthly_row, 1)
+
+            strategy.initialize_strategy()
+            assert strategy.previous_month_final_return == 7010
+            assert strategy.total_cost == 7000 + strategy.MONTHLY_INVESTMENT
+            assert not [name for name in os.listdir(tmp_dir) if name.endswith('.csv')]
+        finally:
+            strategy.get_trade_store().close()
+            strategy.get_logger().close()
+            os.chdir(cwd)
+    print("✅ SQLite存储跨月启动恢复上月收益")
+
+
+if __name__ == "__main__":
+    test_tick_and_state_in_one_transaction()
+    test_export_csv_views()
+    test_cross_month_startup_recovers_from_database()
@@ -0,0 +1,63 @@
+"""
+测试日志式状态存储
+"""
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from state_journal import StateJournal
+
+STATE = {
+    'start_of_month_etf_price': 2.8,
+    'selected_call_strike': ["10008123", 2.9],
+    'call_contracts': 5,
+    'processed_today': False,
+}
+
+
+def test_save_appends_deltas_and_replays():
+    """保存只追加变化的字段，重新加载时重放日志得到最新状态"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal = StateJournal(os.path.join(tmp_dir, "state.json"))
+        journal.save(STATE)
+        journal.save(dict(STATE, processed_today=True))
+        # 没有变化时不追加记录
+        journal.save(dict(STATE, processed_today=True))
+
+        with open(journal.journal_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == 2
+        assert records[1] == {'set': {'processed_today': True}}
+
+        assert StateJournal(journal.snapshot_path).load() == dict(STATE, processed_today=True)
+    print("✅ 状态日志写入和重放正确")
+
+
+def test_compaction_and_torn_write():
+    """累计到阈值后压缩为快照；崩溃时写了一半的记录被忽略"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_path = os.path.join(tmp_dir, "state.json")
+        journal = StateJournal(snapshot_path, compact_every=3)
+        for contracts in range(1, 4):
+            journal.save(dict(STATE, call_contracts=contracts))
+        assert os.path.getsize(journal.journal_path) == 0
+        with open(snapshot_path, encoding='utf-8') as f:
+            assert json.load(f)['call_contracts'] == 3
+
+        journal.save(dict(STATE, call_contracts=4))
+        with open(journal.journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"set":{"call_contracts":')
+        reloaded = StateJournal(snapshot_path)
+        assert reloaded.load()['call_contracts'] == 4
+        # 之后追加的记录不受半条记录影响
+        reloaded.save(dict(STATE, call_contracts=5))
+        assert StateJournal(snapshot_path).load()['call_contracts'] == 5
+    print("✅ 快照压缩和半条记录处理正确")
+
+
+if __name__ == "__main__":
+    test_save_appends_deltas_and_replays()
+    test_compaction_and_torn_write()
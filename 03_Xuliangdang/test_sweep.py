@@ -0,0 +1,66 @@
+"""
+测试策略参数扫描：参数组合生成、共享内存中的行情数据和进程池评估结果
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backtest import StrategyParams, run_backtest, summarize
+from sweep import grid_params, random_params, run_sweep, share_market_data, attach_market_data
+from test_backtest import make_market_data
+
+
+def test_param_generation():
+    """网格组合只保留有效参数，Put投资为月投资的剩余部分；随机抽样不重复"""
+    grid = {
+        'call_otm_level': [1, 2],
+        'days_before_expiry_start': [1, 19],
+        'days_before_expiry_stop': [1, 2],
+        'call_investment': [400, 1000],
+    }
+    params_list = grid_params(grid)
+    # 停止天数大于开始天数、Put投资为0的组合被去掉
+    assert len(params_list) == 2 * 3 * 1
+    assert all(params.call_investment + params.put_investment == 1000 for params in params_list)
+    assert StrategyParams(call_otm_level=2, days_before_expiry_start=19, days_before_expiry_stop=2,
+                          call_investment=400, put_investment=600) in params_list
+
+    sampled = random_params(4, grid, seed=1)
+    assert len(sampled) == len(set(sampled)) == 4
+    assert random_params(4, grid, seed=1) == sampled
+    assert sorted(random_params(100, grid)) == sorted(params_list)
+    print("✅ 参数组合生成正确")
+
+
+def test_sweep_matches_direct_backtest():
+    """共享内存中的行情与原数据一致；进程池结果与直接回测一致并按年化收益率排序"""
+    data = make_market_data()
+    blocks, layout = share_market_data(data)
+    try:
+        attached_blocks, attached = attach_market_data(layout)
+        assert all(np.array_equal(a, b, equal_nan=a.dtype.kind == 'f') for a, b in zip(attached, data))
+        for block in attached_blocks:
+            block.close()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    params_list = grid_params({'call_otm_level': [1, 2, 3], 'put_otm_level': [1, 2],
+                               'call_investment': [300, 500]})
+    results = run_sweep(data, params_list, workers=2, start_date='2025-01-01')
+    assert sorted(params for params, summary in results) == sorted(params_list)
+    annual_returns = [summary['annual_return'] for params, summary in results]
+    assert annual_returns == sorted(annual_returns, reverse=True)
+    for params, summary in results:
+        expected = summarize(run_backtest(data, params, '2025-01-01'), params)
+        assert all(summary[key] == value for key, value in expected.items())
+    print("✅ 并行参数扫描结果正确")
+
+
+if __name__ == "__main__":
+    test_param_generation()
+    test_sweep_matches_direct_backtest()
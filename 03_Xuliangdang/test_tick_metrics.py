@@ -0,0 +1,90 @@
+"""
+测试耗时统计：分阶段计时、分位数、按异常类型的错误计数、未启用时不记录、快照文件格式
+"""
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tick_metrics import TickMetrics
+
+
+def test_stages_and_errors():
+    """stage/timed 计时并按异常类型计数；未启用时不记录任何数据"""
+    metrics = TickMetrics(labels={'underlying': '50ETF'})
+
+    @metrics.timed("fetch")
+    def fetch(fail=False):
+        if fail:
+            raise ValueError("bad quote")
+        return "ok"
+
+    assert fetch() == "ok"
+    with metrics.stage("record"):
+        pass
+    assert metrics.stages == {}
+
+    metrics.configure(enabled=True)
+    for seconds in range(1, 101):
+        metrics.observe("record", seconds / 1000)
+    assert fetch() == "ok"
+    try:
+        fetch(fail=True)
+    except ValueError:
+        pass
+    metrics.record_error("fetch", TimeoutError())
+    with metrics.stage("save_state"):
+        pass
+
+    snapshot = metrics.snapshot()
+    record = snapshot['stages']['record']
+    assert record['count'] == 100
+    assert (record['p50'], record['p95'], record['p99'], record['max']) == (0.05, 0.095, 0.099, 0.1)
+    assert sum(record['buckets'].values()) == 100
+    fetch_stats = snapshot['stages']['fetch']
+    assert fetch_stats['count'] == 2
+    assert fetch_stats['errors'] == {'ValueError': 1, 'TimeoutError': 1}
+    assert fetch_stats['error_count'] == 2
+    assert snapshot['stages']['save_state']['count'] == 1
+    print("✅ 分阶段计时和错误计数正确")
+
+
+def test_snapshot_files():
+    """按间隔写出 Prometheus 文本和 JSON 快照"""
+    now = [0.0]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        prefix = os.path.join(tmp_dir, "option_trading_metrics")
+        metrics = TickMetrics(enabled=True, path_prefix=prefix, interval=60, labels={'underlying': '50ETF'},
+                              clock=lambda: now[0])
+        metrics.observe("tick", 0.002)
+        metrics.record_error("tick", KeyError("x"))
+
+        assert metrics.maybe_write()
+        now[0] = 30
+        assert not metrics.maybe_write()
+        now[0] = 61
+        metrics.observe("tick", 0.2)
+        assert metrics.maybe_write()
+
+        with open(f"{prefix}.json", 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        assert snapshot['labels'] == {'underlying': '50ETF'}
+        assert snapshot['stages']['tick']['count'] == 2
+
+        with open(f"{prefix}.prom", 'r', encoding='utf-8') as f:
+            text = f.read()
+        assert '# TYPE xutwo_stage_seconds histogram' in text
+        assert 'xutwo_stage_seconds_bucket{underlying="50ETF",stage="tick",le="0.0025"} 1' in text
+        assert 'xutwo_stage_seconds_bucket{underlying="50ETF",stage="tick",le="+Inf"} 2' in text
+        assert 'xutwo_stage_seconds_count{underlying="50ETF",stage="tick"} 2' in text
+        assert 'xutwo_stage_recent_seconds{underlying="50ETF",stage="tick",quantile="0.99"} 0.2' in text
+        assert 'xutwo_stage_errors_total{underlying="50ETF",stage="tick",exception="KeyError"} 1' in text
+        assert not [name for name in os.listdir(tmp_dir) if name.endswith('.tmp')]
+    print("✅ 快照文件格式正确")
+
+
+if __name__ == "__main__":
+    test_stages_and_errors()
+    test_snapshot_files()
@@ -0,0 +1,96 @@
+"""
+测试长期打开的CSV交易数据写入器
+"""
+import csv
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tick_writer import TickWriter
+
+MASTER_HEADER = ["Date", "Total Return", "Month"]
+MONTHLY_HEADER = ["日期", "总收益"]
+
+
+def read_rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_batched_flush_and_offsets():
+    """按行数批量写入，回调中的字节位置与文件内容一致"""
+    flushed = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        master_path = os.path.join(tmp_dir, "master.csv")
+        writer = TickWriter(master_path, MASTER_HEADER, MONTHLY_HEADER,
+                            lambda month: os.path.join(tmp_dir, f"{month}.csv"),
+                            flush_rows=2, on_flush=flushed.extend)
+
+        writer.write(["2025-06-06 09:40:00", 1001, "202506"], ["2025-06-06 09:40:00", 1001], "202506", meta=19)
+        assert flushed == []
+        assert read_rows(master_path) == [MASTER_HEADER]
+
+        writer.write(["2025-06-06 09:41:00", 1002, "202506"], ["2025-06-06 09:41:00", 1002], "202506", meta=19)
+        assert [row.meta for row in flushed] == [19, 19]
+        with open(master_path, 'rb') as f:
+            content = f.read()
+        for row in flushed:
+            assert content[row.master_offset:row.master_offset + row.master_length] == \
+                ",".join(str(value) for value in row.master_row).encode('utf-8') + b"\r\n"
+        with open(os.path.join(tmp_dir, "202506.csv"), 'rb') as f:
+            assert f.read()[flushed[1].monthly_offset:] == b"2025-06-06 09:41:00,1002\r\n"
+
+        writer.close()
+        assert read_rows(os.path.join(tmp_dir, "202506.csv"))[0] == MONTHLY_HEADER
+    print("✅ 批量写入和字节位置正确")
+
+
+def test_flush_before_idle():
+    """休眠前：休眠期间会超过 flush_seconds 或长时间休眠时写入缓存的数据行"""
+    now = [0.0]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        master_path = os.path.join(tmp_dir, "master.csv")
+        writer = TickWriter(master_path, MASTER_HEADER, MONTHLY_HEADER,
+                            lambda month: os.path.join(tmp_dir, f"{month}.csv"),
+                            flush_rows=10, flush_seconds=120, clock=lambda: now[0])
+
+        writer.write(["2025-06-06 09:40:00", 1001, "202506"], ["2025-06-06 09:40:00", 1001], "202506")
+        now[0] = 10.0
+        assert not writer.flush_before_idle(50)
+        assert read_rows(master_path) == [MASTER_HEADER]
+        now[0] = 70.0
+        assert writer.flush_before_idle(50)
+        assert len(read_rows(master_path)) == 2
+
+        # 不按时间写入时，午休和收盘后的长时间休眠前仍然写入
+        writer.flush_seconds = None
+        writer.write(["2025-06-06 11:30:00", 1002, "202506"], ["2025-06-06 11:30:00", 1002], "202506")
+        assert not writer.flush_before_idle(60)
+        assert writer.flush_before_idle(90 * 60)
+        assert len(read_rows(master_path)) == 3
+        assert not writer.flush_before_idle(None)
+        writer.close()
+    print("✅ 休眠前写入缓存的数据行")
+
+
+def test_rotates_monthly_file():
+    """月份变化时先写完上月数据再切换月度分表"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        writer = TickWriter(os.path.join(tmp_dir, "master.csv"), MASTER_HEADER, MONTHLY_HEADER,
+                            lambda month: os.path.join(tmp_dir, f"{month}.csv"), flush_rows=10)
+        writer.write(["2025-06-24 14:59:00", 1001, "202506"], ["2025-06-24 14:59:00", 1001], "202506")
+        writer.write(["2025-06-25 09:40:00", 1002, "202507"], ["2025-06-25 09:40:00", 1002], "202507")
+
+        assert read_rows(os.path.join(tmp_dir, "202506.csv")) == [MONTHLY_HEADER, ["2025-06-24 14:59:00", "1001"]]
+        writer.close()
+        assert read_rows(os.path.join(tmp_dir, "202507.csv")) == [MONTHLY_HEADER, ["2025-06-25 09:40:00", "1002"]]
+        assert len(read_rows(os.path.join(tmp_dir, "master.csv"))) == 3
+    print("✅ 月度分表切换正确")
+
+
+if __name__ == "__main__":
+    test_batched_flush_and_offsets()
+    test_flush_before_idle()
+    test_rotates_monthly_file()
@@ -0,0 +1,78 @@
+"""
+测试交易日历：多年休市安排、下一个开盘时刻、区间交易日数，以及向量化版本与逐个查询一致
+"""
+import datetime
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backtest import StrategyParams, run_backtest
+from test_backtest import make_market_data
+from trading_calendar import load_calendar
+
+
+def test_scalar_queries():
+    """交易日、交易时段、下一个开盘时刻和区间交易日数"""
+    calendar = load_calendar()
+    assert calendar.covers(datetime.date(2024, 6, 10)) and calendar.covers(datetime.date(2026, 12, 31))
+    assert not calendar.covers(datetime.date(2027, 1, 1))
+
+    assert not calendar.is_trading_day(datetime.date(2025, 10, 8))      # 国庆中秋休市
+    assert calendar.is_trading_day(datetime.date(2025, 10, 9))
+    assert not calendar.is_trading_day(datetime.date(2025, 10, 11))     # 调休上班日（周六）交易所休市
+    assert not calendar.is_trading_day(datetime.date(2024, 2, 9))
+    assert not calendar.is_trading_day(datetime.date(2026, 2, 23))
+    assert calendar.is_trading_day(datetime.date(2027, 1, 1))           # 数据未覆盖，按工作日判断
+
+    assert calendar.is_session_open(datetime.datetime(2025, 9, 30, 9, 30))
+    assert calendar.is_session_open(datetime.datetime(2025, 9, 30, 15, 0, 59))
+    assert not calendar.is_session_open(datetime.datetime(2025, 9, 30, 12, 0))
+    assert not calendar.is_session_open(datetime.datetime(2025, 10, 1, 10, 0))
+    assert calendar.is_session_time(datetime.datetime(2025, 10, 1, 10, 0))
+
+    assert calendar.next_open(datetime.datetime(2025, 9, 30, 9, 0)) == datetime.datetime(2025, 9, 30, 9, 30)
+    assert calendar.next_open(datetime.datetime(2025, 9, 30, 11, 31)) == datetime.datetime(2025, 9, 30, 13, 0)
+    assert calendar.next_open(datetime.datetime(2025, 9, 30, 15, 1)) == datetime.datetime(2025, 10, 9, 9, 30)
+    assert calendar.next_trading_day(datetime.date(2026, 12, 31)) == datetime.date(2027, 1, 1)
+
+    assert calendar.trading_days_between(datetime.date(2025, 9, 29), datetime.date(2025, 10, 13)) == 4
+    assert calendar.trading_days_between(datetime.date(2025, 10, 13), datetime.date(2025, 9, 29)) == -4
+    # 跨越数据覆盖范围的两端
+    assert calendar.trading_days_between(datetime.date(2023, 12, 25), datetime.date(2024, 1, 8)) == 9
+    assert calendar.trading_days_between(datetime.date(2026, 12, 28), datetime.date(2027, 1, 4)) == 5
+    print("✅ 交易日历逐个查询正确")
+
+
+def test_vectorized_matches_scalar():
+    """向量化版本与逐个查询结果一致；回测按交易日历跳过休市日的行情"""
+    calendar = load_calendar()
+    rng = random.Random(7)
+    base = datetime.datetime(2023, 6, 1)
+    times = [base + datetime.timedelta(days=rng.randrange(1500), minutes=rng.randrange(24 * 60)) for _ in range(2000)]
+    ends = [day + datetime.timedelta(days=rng.randrange(-60, 60)) for day in times]
+    times_np = np.array(times, dtype='datetime64[m]')
+    ends_np = np.array(ends, dtype='datetime64[m]')
+
+    assert calendar.is_trading_day_array(times_np).tolist() == [calendar.is_trading_day(t) for t in times]
+    assert calendar.is_session_open_array(times_np).tolist() == [calendar.is_session_open(t) for t in times]
+    assert calendar.next_trading_day_array(times_np).tolist() == [calendar.next_trading_day(t) for t in times]
+    assert calendar.trading_days_between_array(times_np, ends_np).tolist() == \
+        [calendar.trading_days_between(start, end) for start, end in zip(times, ends)]
+
+    data = make_market_data()
+    times = data.times.copy()
+    times[2] = np.datetime64('2025-01-28T10:00')  # 春节休市
+    data = data._replace(times=times)
+    result = run_backtest(data, StrategyParams(), start_date='2025-01-01', calendar=calendar)
+    assert np.datetime64('2025-01-28T10:00') not in result.rows['time']
+    assert len(result.rows['time']) == 5
+    print("✅ 向量化查询与逐个查询一致")
+
+
+if __name__ == "__main__":
+    test_scalar_queries()
+    test_vectorized_matches_scalar()
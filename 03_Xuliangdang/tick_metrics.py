@@ -0,0 +1,287 @@
+"""
+采样时刻耗时统计
+
+按阶段（主循环的各个步骤、各个行情请求函数、重试等待等）统计耗时：
+- 每个阶段一个直方图：累计次数、总耗时、最大耗时和按 BUCKET_BOUNDS 分桶的次数，
+  另保留最近 WINDOW_SIZE 个样本用于计算 p50/p95/p99
+- 按异常类型统计每个阶段的错误次数（包括被调用方捕获后用 record_error 上报的异常）
+- 每隔 interval 秒把快照写入 <path_prefix>.prom（Prometheus文本格式）和 <path_prefix>.json，
+  先写临时文件再替换，读取方不会看到写了一半的文件
+
+未启用时 stage() 返回一个共享的空上下文管理器，timed() 包装的函数只多一次属性判断，不计时也不加锁。
+"""
+import bisect
+import collections
+import datetime
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+# 直方图桶的上界（秒），覆盖 0.5毫秒 ~ 60秒
+BUCKET_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# 输出的分位数
+QUANTILES = (0.5, 0.95, 0.99)
+
+# 计算分位数使用的最近样本数
+WINDOW_SIZE = 1024
+
+# 快照写入间隔（秒）
+SNAPSHOT_INTERVAL = 60
+
+# Prometheus 指标名
+METRIC_PREFIX = "xutwo"
+
+
+class StageHistogram:
+    """一个阶段的耗时直方图"""
+
+    __slots__ = ('bucket_counts', 'count', 'total', 'max', 'errors', 'recent')
+
+    def __init__(self, window=WINDOW_SIZE):
+        self.bucket_counts = [0] * (len(BUCKET_BOUNDS) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = {}  # 异常类型名 -> 次数
+        self.recent = collections.deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if (seconds > self.max):
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def quantiles(self):
+        """按最近样本计算分位数（最近秩法）
+        Returns:
+            dict: {分位数: 耗时秒数}，没有样本时为空字典
+        """
+        if (not self.recent):
+            return {}
+        samples = sorted(self.recent)
+        last = len(samples) - 1
+        return {q: samples[min(last, max(0, math.ceil(q * len(samples)) - 1))] for q in QUANTILES}
+
+    def to_dict(self):
+        quantiles = self.quantiles()
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'max': self.max,
+            **{f"p{int(q * 100)}": quantiles.get(q) for q in QUANTILES},
+            'errors': dict(self.errors),
+            'error_count': sum(self.errors.values()),
+            'buckets': dict(zip([str(bound) for bound in BUCKET_BOUNDS] + ['+Inf'], self.bucket_counts)),
+        }
+
+
+class _NullStage:
+    """未启用统计时使用的空上下文管理器"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """计时一个阶段；阶段内抛出的异常按类型计入错误次数（不拦截异常）"""
+
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        if (exc_type is not None and issubclass(exc_type, Exception)):
+            self.metrics.record_error(self.name, exc)
+        return False
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+class TickMetrics:
+    """按阶段统计耗时和错误次数，定期写出快照"""
+
+    def __init__(self, enabled=False, path_prefix=None, interval=SNAPSHOT_INTERVAL, labels=None,
+                 window=WINDOW_SIZE, clock=time.monotonic):
+        """
+        Args:
+            enabled: 是否启用统计
+            path_prefix: 快照文件路径前缀，写入 <path_prefix>.prom 和 <path_prefix>.json，None表示不写文件
+            interval: 快照写入间隔（秒）
+            labels: 附加到全部指标上的标签，例如 {'underlying': '50ETF'}
+            window: 计算分位数使用的最近样本数
+            clock: 判断写入间隔使用的时钟
+        """
+        self.enabled = enabled
+        self.path_prefix = path_prefix
+        self.interval = interval
+        self.labels = dict(labels or {})
+        self.window = window
+        self.clock = clock
+        self.stages = {}
+        self.started_at = datetime.datetime.now()
+        self._lock = threading.Lock()
+        self._last_write = None
+
+    def configure(self, enabled=None, path_prefix=None, interval=None, labels=None):
+        """修改设置（未给出的参数保持不变）"""
+        if (enabled is not None):
+            self.enabled = enabled
+        if (path_prefix is not None):
+            self.path_prefix = path_prefix
+        if (interval is not None):
+            self.interval = interval
+        if (labels is not None):
+            self.labels = dict(labels)
+
+    def stage(self, name):
+        """返回计时上下文管理器：with metrics.stage("record"): ..."""
+        if (not self.enabled):
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def timed(self, name):
+        """函数装饰器：每次调用计入 name 阶段，未启用时直接调用原函数"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if (not self.enabled):
+                    return fn(*args, **kwargs)
+                with _Stage(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _histogram(self, name):
+        histogram = self.stages.get(name)
+        if (histogram is None):
+            histogram = self.stages[name] = StageHistogram(self.window)
+        return histogram
+
+    def observe(self, name, seconds):
+        """记录一次耗时（秒）"""
+        if (not self.enabled):
+            return
+        with self._lock:
+            self._histogram(name).observe(seconds)
+
+    def record_error(self, name, exc):
+        """记录一次错误
+        Args:
+            name: 阶段名
+            exc: 异常对象或异常类型名
+        """
+        if (not self.enabled):
+            return
+        error_type = exc if isinstance(exc, str) else type(exc).__name__
+        with self._lock:
+            errors = self._histogram(name).errors
+            errors[error_type] = errors.get(error_type, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.started_at = datetime.datetime.now()
+
+    def snapshot(self):
+        """当前统计结果
+        Returns:
+            dict: {'created_at', 'started_at', 'labels', 'stages': {阶段名: 统计值}}
+        """
+        with self._lock:
+            stages = {name: histogram.to_dict() for name, histogram in sorted(self.stages.items())}
+        return {
+            'created_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'started_at': self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'labels': dict(self.labels),
+            'stages': stages,
+        }
+
+    def to_prometheus(self, snapshot=None):
+        """Prometheus 文本格式：各阶段耗时直方图、最近样本分位数和按异常类型的错误计数"""
+        snapshot = snapshot or self.snapshot()
+        seconds = f"{METRIC_PREFIX}_stage_seconds"
+        recent = f"{METRIC_PREFIX}_stage_recent_seconds"
+        errors = f"{METRIC_PREFIX}_stage_errors_total"
+        lines = [f"# HELP {seconds} 各阶段耗时（秒）", f"# TYPE {seconds} histogram"]
+        for name, stats in snapshot['stages'].items():
+            labels = {**snapshot['labels'], 'stage': name}
+            cumulative = 0
+            for bound, count in stats['buckets'].items():
+                cumulative += count
+                lines.append(f"{seconds}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{seconds}_sum{_format_labels(labels)} {stats['sum']!r}")
+            lines.append(f"{seconds}_count{_format_labels(labels)} {stats['count']}")
+
+        lines += [f"# HELP {recent} 最近{self.window}个样本的耗时分位数（秒）", f"# TYPE {recent} gauge"]
+        for name, stats in snapshot['stages'].items():
+            for q in QUANTILES:
+                value = stats[f"p{int(q * 100)}"]
+                if (value is not None):
+                    labels = {**snapshot['labels'], 'stage': name, 'quantile': q}
+                    lines.append(f"{recent}{_format_labels(labels)} {value!r}")
+
+        lines += [f"# HELP {errors} 各阶段按异常类型的错误次数", f"# TYPE {errors} counter"]
+        for name, stats in snapshot['stages'].items():
+            for error_type, count in sorted(stats['errors'].items()):
+                labels = {**snapshot['labels'], 'stage': name, 'exception': error_type}
+                lines.append(f"{errors}{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path_prefix=None):
+        """写出快照文件
+        Args:
+            path_prefix: 文件路径前缀，默认使用初始化时的设置
+        Returns:
+            tuple: (prom文件路径, json文件路径)
+        """
+        path_prefix = path_prefix or self.path_prefix
+        snapshot = self.snapshot()
+        outputs = ((f"{path_prefix}.prom", self.to_prometheus(snapshot)),
+                   (f"{path_prefix}.json", json.dumps(snapshot, ensure_ascii=False, indent=2)))
+        for path, content in outputs:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        self._last_write = self.clock()
+        return outputs[0][0], outputs[1][0]
+
+    def maybe_write(self, force=False):
+        """距上次写入超过 interval 秒时写出快照（未启用或没有设置路径时不写）
+        Returns:
+            bool: 是否写入了快照
+        """
+        if (not self.enabled or not self.path_prefix):
+            return False
+        if (not force and self._last_write is not None and self.clock() - self._last_write < self.interval):
+            return False
+        self.write()
+        return True
@@ -0,0 +1,206 @@
+"""
+长期打开的CSV交易数据写入器
+
+总表和当月分表的文件句柄在整个运行期间保持打开，数据行先缓存在内存中，
+按刷新策略批量写入：
+- flush_rows=N：累计N行写入一次（N=1即每行立即写入）
+- flush_seconds=T：距上次写入超过T秒时写入
+月份变化时自动切换月度分表；程序退出或收到终止信号时刷新并fsync。
+主循环休眠前调用 flush_before_idle：休眠期间会超过 flush_seconds，或长时间休眠（午休、收盘后）时先写入缓存的数据行。
+"""
+import atexit
+import csv
+import io
+import os
+import signal
+import time
+from collections import namedtuple
+
+# 写入文件后传给回调的数据行信息
+FlushedRow = namedtuple('FlushedRow', ['master_path', 'master_offset', 'master_length', 'master_row',
+                                       'monthly_path', 'monthly_offset', 'monthly_length', 'monthly_row',
+                                       'month', 'meta'])
+
+# 休眠超过该时间（秒）时，不论刷新策略都先写入并fsync缓存的数据行
+IDLE_FLUSH_SECONDS = 300
+
+
+def encode_csv_row(row):
+    """把一行数据编码为CSV字节串，格式与 open(newline='') + csv.writer 写出的一致"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue().encode('utf-8')
+
+
+class AppendOnlyCsvFile:
+    """以追加方式长期打开的CSV文件，记录每行写入的字节位置"""
+
+    def __init__(self, path, header=None):
+        """
+        Args:
+            path: CSV文件路径
+            header: 表头，文件为空时写入
+        """
+        self.path = path
+        self.file = open(path, 'ab')
+        self.position = self.file.tell()
+        self.pending = []
+        if self.position == 0 and header:
+            self.append(header)
+            self.flush()
+
+    def append(self, row):
+        """缓存一行数据
+        Returns:
+            tuple: (该行在文件中的字节偏移, 字节长度)
+        """
+        data = encode_csv_row(row)
+        offset = self.position
+        self.pending.append(data)
+        self.position += len(data)
+        return offset, len(data)
+
+    def flush(self, durable=False):
+        """把缓存的数据行写入文件
+        Args:
+            durable: 是否调用fsync确保写入磁盘
+        """
+        if self.pending:
+            self.file.write(b''.join(self.pending))
+            self.pending = []
+        self.file.flush()
+        if durable:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if not self.file.closed:
+            self.flush(durable=True)
+            self.file.close()
+
+
+class TickWriter:
+    """总表 + 月度分表的批量写入器"""
+
+    def __init__(self, master_path, master_header, monthly_header, monthly_path_fn,
+                 flush_rows=1, flush_seconds=None, on_flush=None, clock=time.monotonic):
+        """
+        Args:
+            master_path: 总表文件路径
+            master_header: 总表表头
+            monthly_header: 月度分表表头
+            monthly_path_fn: 根据月份生成月度分表路径的函数 monthly_path_fn(month) -> str
+            flush_rows: 累计多少行写入一次，1表示每行立即写入
+            flush_seconds: 距上次写入超过多少秒时写入，None表示不按时间写入
+            on_flush: 数据行写入文件后的回调 on_flush([FlushedRow, ...])，用于更新索引和月份清单
+            clock: 计时函数
+        """
+        self.master_path = master_path
+        self.master_header = master_header
+        self.monthly_header = monthly_header
+        self.monthly_path_fn = monthly_path_fn
+        self.flush_rows = max(1, flush_rows)
+        self.flush_seconds = flush_seconds
+        self.on_flush = on_flush
+        self.clock = clock
+        self.master = None
+        self.monthly = None
+        self.month = None
+        self.pending_rows = []
+        self.last_flush = clock()
+        self._hooks_installed = False
+        self._previous_handlers = {}
+
+    def _ensure_files(self, master_path, month):
+        """打开总表，月份变化时切换月度分表"""
+        if self.master is None or self.master.path != master_path:
+            self.flush()
+            if self.master is not None:
+                self.master.close()
+            self.master = AppendOnlyCsvFile(master_path, self.master_header)
+            self.master_path = master_path
+        if self.monthly is None or self.month != month:
+            self.flush()
+            if self.monthly is not None:
+                self.monthly.close()
+            self.monthly = AppendOnlyCsvFile(self.monthly_path_fn(month), self.monthly_header)
+            self.month = month
+
+    def write(self, master_row, monthly_row, month, meta=None, master_path=None):
+        """写入一个采样时刻的数据行
+        Args:
+            master_row: 总表数据行
+            monthly_row: 月度分表数据行
+            month: 数据行所属月份 YYYYMM，决定写入哪个月度分表
+            meta: 附加信息，原样传给 on_flush 回调
+            master_path: 总表文件路径，默认沿用当前总表
+        """
+        self._ensure_files(master_path or self.master_path, month)
+        master_offset, master_length = self.master.append(master_row)
+        monthly_offset, monthly_length = self.monthly.append(monthly_row)
+        self.pending_rows.append(FlushedRow(self.master.path, master_offset, master_length, master_row,
+                                            self.monthly.path, monthly_offset, monthly_length, monthly_row,
+                                            month, meta))
+        if (len(self.pending_rows) >= self.flush_rows or
+                (self.flush_seconds is not None and self.clock() - self.last_flush >= self.flush_seconds)):
+            self.flush()
+
+    def flush(self, durable=False):
+        """把缓存的数据行写入文件
+        Args:
+            durable: 是否调用fsync确保写入磁盘
+        """
+        for csv_file in (self.master, self.monthly):
+            if csv_file is not None:
+                csv_file.flush(durable)
+        self.last_flush = self.clock()
+        if self.pending_rows:
+            flushed, self.pending_rows = self.pending_rows, []
+            if self.on_flush:
+                self.on_flush(flushed)
+
+    def flush_before_idle(self, idle_seconds):
+        """休眠前按刷新策略写入缓存的数据行（write 只在写入新数据行时检查 flush_seconds）
+        Args:
+            idle_seconds: 即将休眠的秒数，None表示未知（按长时间休眠处理）
+        Returns:
+            bool: 是否写入了数据行
+        """
+        if not self.pending_rows:
+            return False
+        if idle_seconds is None or idle_seconds >= IDLE_FLUSH_SECONDS:
+            self.flush(durable=True)
+            return True
+        if self.flush_seconds is not None and self.clock() - self.last_flush + idle_seconds >= self.flush_seconds:
+            self.flush()
+            return True
+        return False
+
+    def close(self):
+        """刷新并关闭文件"""
+        self.flush(durable=True)
+        for csv_file in (self.master, self.monthly):
+            if csv_file is not None:
+                csv_file.close()
+        self.master = None
+        self.monthly = None
+        self.month = None
+
+    def install_shutdown_hooks(self):
+        """注册退出和终止信号处理，确保缓存的数据行写入磁盘"""
+        if self._hooks_installed:
+            return
+        self._hooks_installed = True
+        atexit.register(self.close)
+        for name in ('SIGTERM', 'SIGBREAK'):
+            signum = getattr(signal, name, None)
+            if signum is not None:
+                self._previous_handlers[signum] = signal.signal(signum, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        self.flush(durable=True)
+        previous = self._previous_handlers.get(signum)
+        if callable(previous):
+            # 同一进程中有多个写入器时（多标的模式），依次写入各自缓存的数据行
+            previous(signum, frame)
+        # 以SystemExit退出，主循环的 except Exception 不会拦截，atexit 会关闭文件
+        raise SystemExit(128 + signum)
@@ -0,0 +1,231 @@
+"""
+交易日历
+
+上交所期权的交易日和交易时段查询，休市安排从 sse_holidays.json 读取（可覆盖多个年份）：
+- 加载时把数据覆盖的年份编译为按日期下标的表：每天是否为交易日、截至每天的累计交易日数、
+  每天及之后的第一个交易日；交易时段编译为一天1440分钟的位图
+- is_trading_day / is_session_open / next_trading_day / next_open / trading_days_between 都只查表，
+  与年份数和节假日数量无关
+- 数据未覆盖的日期按"周一到周五且不在休市日中"判断（covers() 可检查是否在覆盖范围内）
+- *_array 为对应的向量化版本，接受 NumPy datetime64 数组（用于回测和历史数据批量处理，NumPy在首次调用时才导入）
+
+用法：
+    calendar = load_calendar()                                  # 读取 sse_holidays.json
+    calendar.is_session_open(datetime.datetime.now())
+    calendar.trading_days_between(date1, date2)                 # [date1, date2) 中的交易日数
+    calendar.is_session_open_array(times)                       # times 为 datetime64 数组
+"""
+import datetime
+import json
+import os
+
+# 休市安排数据文件
+HOLIDAY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sse_holidays.json")
+
+# 上交所期权交易时段 [(start_h, start_m, end_h, end_m), ...]，收盘分钟包含在内
+SSE_SESSIONS = [(9, 30, 11, 30), (13, 0, 15, 0)]
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.datetime.strptime(value[:10], "%Y-%m-%d").date()
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def _weekdays_before(ordinal):
+    """序号小于 ordinal 的日期中周一到周五的天数（公元1年1月1日为星期一，序号为1）"""
+    weeks, days = divmod(ordinal - 1, 7)
+    return weeks * 5 + min(days, 5)
+
+
+class TradingCalendar:
+    """按日期下标预编译的交易日历"""
+
+    def __init__(self, holidays, makeup_workdays=(), sessions=SSE_SESSIONS, years=None):
+        """
+        Args:
+            holidays: 休市日期列表（date 或 "YYYY-MM-DD"），可以包含落在周末的放假日
+            makeup_workdays: 调休上班日（均为周末，交易所照常休市，只记录不参与判断）
+            sessions: 交易时段 [(start_h, start_m, end_h, end_m), ...]，收盘分钟包含在内
+            years: 数据覆盖的年份，默认为休市日所在的年份范围
+        """
+        self.holidays = sorted({_to_date(day) for day in holidays})
+        self.makeup_workdays = sorted({_to_date(day) for day in makeup_workdays})
+        self.sessions = sorted(sessions)
+        if (years is None):
+            years = {day.year for day in self.holidays} or {datetime.date.today().year}
+        self.first_date = datetime.date(min(years), 1, 1)
+        self.last_date = datetime.date(max(years), 12, 31)
+
+        self._holiday_ordinals = {day.toordinal() for day in self.holidays}
+        self._first = self.first_date.toordinal()
+        self._days = self.last_date.toordinal() - self._first + 1
+
+        # 每天是否为交易日；_cumulative[i] 为覆盖范围内第i天之前的交易日数；
+        # _next[i] 为第i天及之后的第一个交易日下标（覆盖范围内没有时为 _days）
+        self._open = bytearray(self._days)
+        self._cumulative = [0] * (self._days + 1)
+        for i in range(self._days):
+            self._open[i] = self._weekday_rule(self._first + i)
+            self._cumulative[i + 1] = self._cumulative[i] + self._open[i]
+        self._next = [self._days] * (self._days + 1)
+        for i in range(self._days - 1, -1, -1):
+            self._next[i] = i if self._open[i] else self._next[i + 1]
+
+        # 一天中每分钟是否在交易时段内，以及各时段的开盘分钟
+        self._minutes = bytearray(MINUTES_PER_DAY)
+        for start_h, start_m, end_h, end_m in self.sessions:
+            self._minutes[start_h * 60 + start_m:end_h * 60 + end_m + 1] = \
+                b'\x01' * (end_h * 60 + end_m + 1 - start_h * 60 - start_m)
+        self._open_minutes = [start_h * 60 + start_m for start_h, start_m, _, _ in self.sessions]
+
+        self._busdaycal = None
+        self._minute_mask = None
+
+    def _weekday_rule(self, ordinal):
+        return (ordinal - 1) % 7 < 5 and ordinal not in self._holiday_ordinals
+
+    def _is_trading_ordinal(self, ordinal):
+        i = ordinal - self._first
+        if (0 <= i < self._days):
+            return self._open[i] == 1
+        return self._weekday_rule(ordinal)
+
+    def _count_before(self, ordinal):
+        """序号小于 ordinal 的交易日数（以覆盖范围的第一天为0点，之前的日期为负数）"""
+        i = ordinal - self._first
+        if (0 <= i <= self._days):
+            return self._cumulative[i]
+        if (i < 0):
+            low, high = ordinal, self._first
+        else:
+            low, high = self._first + self._days, ordinal
+        count = _weekdays_before(high) - _weekdays_before(low)
+        count -= sum(1 for day in self._holiday_ordinals if low <= day < high and (day - 1) % 7 < 5)
+        return -count if i < 0 else self._cumulative[self._days] + count
+
+    def covers(self, date):
+        """日期是否在休市安排数据覆盖的年份内"""
+        return 0 <= date.toordinal() - self._first < self._days
+
+    def is_trading_day(self, date):
+        """是否为交易日
+        Args:
+            date: date 或 datetime
+        """
+        return self._is_trading_ordinal(date.toordinal())
+
+    def is_session_time(self, moment):
+        """时刻是否在交易时段内（只看时间，不判断交易日）"""
+        return self._minutes[moment.hour * 60 + moment.minute] == 1
+
+    def is_session_open(self, moment):
+        """时刻是否为交易日的交易时段"""
+        return self._minutes[moment.hour * 60 + moment.minute] == 1 and self._is_trading_ordinal(moment.toordinal())
+
+    def next_trading_day(self, date, inclusive=False):
+        """下一个交易日
+        Args:
+            date: 起始日期
+            inclusive: 起始日期本身为交易日时是否返回它
+        Returns:
+            date: 交易日
+        """
+        ordinal = date.toordinal() + (0 if inclusive else 1)
+        i = ordinal - self._first
+        if (0 <= i < self._days and self._next[i] < self._days):
+            return datetime.date.fromordinal(self._first + self._next[i])
+        ordinal = max(ordinal, self._first + self._days) if i >= 0 else ordinal
+        while (not self._is_trading_ordinal(ordinal)):
+            ordinal += 1
+        return datetime.date.fromordinal(ordinal)
+
+    def next_open(self, moment):
+        """严格晚于 moment 的下一个开盘时刻
+        Args:
+            moment: datetime
+        Returns:
+            datetime: 开盘时刻
+        """
+        if (self._is_trading_ordinal(moment.toordinal())):
+            day_start = datetime.datetime.combine(moment.date(), datetime.time())
+            for open_minute in self._open_minutes:
+                session_open = day_start + datetime.timedelta(minutes=open_minute)
+                if (session_open > moment):
+                    return session_open
+        day = self.next_trading_day(moment.date())
+        return datetime.datetime.combine(day, datetime.time()) + datetime.timedelta(minutes=self._open_minutes[0])
+
+    def trading_days_between(self, start, end):
+        """[start, end) 中的交易日数，end 早于 start 时为 -trading_days_between(end, start)"""
+        return self._count_before(end.toordinal()) - self._count_before(start.toordinal())
+
+    def _numpy_calendar(self):
+        if (self._busdaycal is None):
+            import numpy as np
+            weekday_holidays = [day for day in self.holidays if day.weekday() < 5]
+            self._busdaycal = np.busdaycalendar(weekmask='1111100',
+                                                holidays=np.array(weekday_holidays, dtype='datetime64[D]'))
+            self._minute_mask = np.frombuffer(bytes(self._minutes), dtype=np.uint8).astype(bool)
+        return self._busdaycal
+
+    def is_trading_day_array(self, dates):
+        """is_trading_day 的向量化版本
+        Args:
+            dates: datetime64 数组（精度高于天时按所在日期判断）
+        Returns:
+            ndarray: bool 数组
+        """
+        import numpy as np
+        return np.is_busday(np.asarray(dates).astype('datetime64[D]'), busdaycal=self._numpy_calendar())
+
+    def is_session_open_array(self, times):
+        """is_session_open 的向量化版本
+        Args:
+            times: datetime64 数组
+        Returns:
+            ndarray: bool 数组
+        """
+        import numpy as np
+        busdaycal = self._numpy_calendar()
+        times = np.asarray(times).astype('datetime64[m]')
+        days = times.astype('datetime64[D]')
+        minutes = (times - days).astype(np.int64)
+        return self._minute_mask[minutes] & np.is_busday(days, busdaycal=busdaycal)
+
+    def next_trading_day_array(self, dates):
+        """next_trading_day 的向量化版本（不含起始日期本身）"""
+        import numpy as np
+        dates = np.asarray(dates).astype('datetime64[D]') + np.timedelta64(1, 'D')
+        return np.busday_offset(dates, 0, roll='forward', busdaycal=self._numpy_calendar())
+
+    def trading_days_between_array(self, starts, ends):
+        """trading_days_between 的向量化版本"""
+        import numpy as np
+        busdaycal = self._numpy_calendar()
+        starts = np.asarray(starts).astype('datetime64[D]')
+        ends = np.asarray(ends).astype('datetime64[D]')
+        # numpy.busday_count 在 end 早于 start 时统计的是 (end, start]，这里统一为 -[end, start)
+        low, high = np.minimum(starts, ends), np.maximum(starts, ends)
+        counts = np.busday_count(low, high, busdaycal=busdaycal)
+        return np.where(ends < starts, -counts, counts)
+
+
+def load_calendar(path=HOLIDAY_FILE, sessions=SSE_SESSIONS):
+    """从休市安排数据文件加载交易日历
+    Args:
+        path: 数据文件路径，格式见 sse_holidays.json
+        sessions: 交易时段
+    Returns:
+        TradingCalendar: 交易日历
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    holidays = [day for days in data.get('holidays', {}).values() for day in days]
+    makeup_workdays = [day for days in data.get('makeup_workdays', {}).values() for day in days]
+    years = {int(year) for year in data.get('holidays', {})}
+    return TradingCalendar(holidays, makeup_workdays, sessions=sessions, years=years or None)